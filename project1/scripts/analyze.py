@@ -1,5 +1,8 @@
+import math
 import random
 import sys
+from functools import lru_cache
+from typing import Iterator
 
 import numpy as np
 from Bio import SeqIO
@@ -17,6 +20,12 @@ def read_sequences(path: str) -> str:
 
 
 def pairwise_alignment(seq1: str, seq2: str) -> None:
+    dp = calc_dp(seq1, seq2)
+    alignments = backtrack(dp, seq1, seq2)
+    return dp, alignments
+
+
+def calc_dp(seq1: str, seq2: str) -> np.ndarray:
     # init dp table based on sequences lengths
     seq1_length, seq2_length = len(seq1) + 1, len(seq2) + 1
     dp = np.zeros((seq1_length, seq2_length))
@@ -39,22 +48,45 @@ def pairwise_alignment(seq1: str, seq2: str) -> None:
                 dp[s1_idx, s2_idx - 1] + GAPCOST,  # insertion
                 dp[s1_idx - 1, s2_idx - 1] + match_cost,  # match/mismatch
             )
-    alignments = backtrack(dp, seq1, seq2)
-    return dp, alignments
+    return dp
 
 
 def backtrack(dp: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
-    s1_idx, s2_idx = len(seq1), len(seq2)
-    align1 = align2 = ""
-    results = []
-
-    def trace_alignments(s1_idx, s2_idx, align1, align2):
-        # check if we have depleted our indexes, save the two alignments
+    return list(iter_alignments(dp, seq1, seq2))
+
+
+def iter_alignments(
+    dp: np.ndarray, seq1: str, seq2: str, limit: int | None = None
+) -> Iterator[tuple[str, str]]:
+    # alignments are built backwards in shared buffers, every stack entry
+    # remembers the buffer depth it branched from
+    align1, align2 = [], []
+    stack = [(len(seq1), len(seq2), 0, "", "")]
+    produced = 0
+
+    while stack:
+        s1_idx, s2_idx, depth, char1, char2 = stack.pop()
+        del align1[depth:], align2[depth:]
+        align1.append(char1)
+        align2.append(char2)
+        depth += 1
+
+        # check if we have depleted our indexes, yield the two alignments
         if s1_idx == s2_idx == 0:
-            results.append((align1, align2))
-            return
-
-        # check if we found a match/mismatch -> add recursive call to stack
+            yield "".join(reversed(align1)), "".join(reversed(align2))
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+            continue
+
+        # moves are pushed in reverse so match/mismatch is explored first
+        # check if we found an insertion
+        if s2_idx > 0 and dp[s1_idx, s2_idx - 1] + GAPCOST == dp[s1_idx, s2_idx]:
+            stack.append((s1_idx, s2_idx - 1, depth, "-", seq2[s2_idx - 1]))
+        # check if we found a deletion
+        if s1_idx > 0 and dp[s1_idx - 1, s2_idx] + GAPCOST == dp[s1_idx, s2_idx]:
+            stack.append((s1_idx - 1, s2_idx, depth, seq1[s1_idx - 1], "-"))
+        # check if we found a match/mismatch
         if (
             s1_idx > 0
             and s2_idx > 0
@@ -62,50 +94,122 @@ def backtrack(dp: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
             == dp[s1_idx - 1, s2_idx - 1]
             + SCORE_MATRIX[BASE_DECODE[seq1[s1_idx - 1]], BASE_DECODE[seq2[s2_idx - 1]]]
         ):
-            trace_alignments(
-                s1_idx - 1,
-                s2_idx - 1,
-                seq1[s1_idx - 1] + align1,
-                seq2[s2_idx - 1] + align2,
-            )
-        # check if we found a deletion -> add recursive call to stack
-        if s1_idx > 0 and dp[s1_idx - 1, s2_idx] + GAPCOST == dp[s1_idx, s2_idx]:
-            trace_alignments(
-                s1_idx - 1, s2_idx, seq1[s1_idx - 1] + align1, "-" + align2
-            )
-        # check if we found an insertion -> add recursive call to stack
-        if s2_idx > 0 and dp[s1_idx, s2_idx - 1] + GAPCOST == dp[s1_idx, s2_idx]:
-            trace_alignments(
-                s1_idx, s2_idx - 1, "-" + align1, seq2[s2_idx - 1] + align2
+            stack.append(
+                (s1_idx - 1, s2_idx - 1, depth, seq1[s1_idx - 1], seq2[s2_idx - 1])
             )
 
-    trace_alignments(s1_idx, s2_idx, align1, align2)
-    return results
 
+def path_counts(dp: np.ndarray, seq1: str, seq2: str) -> list[list[int]]:
+    # number of optimal paths from (0, 0) to every cell, as Python big ints
+    counts = [[0] * dp.shape[1] for _ in range(dp.shape[0])]
+    counts[0][0] = 1
+    for s1_idx, row in enumerate(counts):
+        for s2_idx in range(len(row)):
+            count = row[s2_idx]
+            # add the counts of every predecessor with an optimal move
+            if (
+                s1_idx > 0
+                and s2_idx > 0
+                and dp[s1_idx, s2_idx]
+                == dp[s1_idx - 1, s2_idx - 1]
+                + SCORE_MATRIX[
+                    BASE_DECODE[seq1[s1_idx - 1]], BASE_DECODE[seq2[s2_idx - 1]]
+                ]
+            ):
+                count += counts[s1_idx - 1][s2_idx - 1]
+            if s1_idx > 0 and dp[s1_idx - 1, s2_idx] + GAPCOST == dp[s1_idx, s2_idx]:
+                count += counts[s1_idx - 1][s2_idx]
+            if s2_idx > 0 and dp[s1_idx, s2_idx - 1] + GAPCOST == dp[s1_idx, s2_idx]:
+                count += row[s2_idx - 1]
+            row[s2_idx] = count
+    return counts
+
+
+def sample_alignment(
+    dp: np.ndarray, seq1: str, seq2: str, counts: list[list[int]]
+) -> tuple[str, str]:
+    # walk back from the end, picking every optimal move with probability
+    # proportional to the number of paths through it -> uniform over alignments
+    align1, align2 = [], []
+    s1_idx, s2_idx = len(seq1), len(seq2)
+    while s1_idx or s2_idx:
+        pick = random.randrange(counts[s1_idx][s2_idx])
+        if (
+            s1_idx > 0
+            and s2_idx > 0
+            and dp[s1_idx, s2_idx]
+            == dp[s1_idx - 1, s2_idx - 1]
+            + SCORE_MATRIX[BASE_DECODE[seq1[s1_idx - 1]], BASE_DECODE[seq2[s2_idx - 1]]]
+        ):
+            pick -= counts[s1_idx - 1][s2_idx - 1]
+            if pick < 0:
+                s1_idx, s2_idx = s1_idx - 1, s2_idx - 1
+                align1.append(seq1[s1_idx])
+                align2.append(seq2[s2_idx])
+                continue
+        if s1_idx > 0 and dp[s1_idx - 1, s2_idx] + GAPCOST == dp[s1_idx, s2_idx]:
+            pick -= counts[s1_idx - 1][s2_idx]
+            if pick < 0:
+                s1_idx -= 1
+                align1.append(seq1[s1_idx])
+                align2.append("-")
+                continue
+        s2_idx -= 1
+        align1.append("-")
+        align2.append(seq2[s2_idx])
+    return "".join(reversed(align1)), "".join(reversed(align2))
+
+
+@lru_cache(maxsize=None)
+def count_alignments(n: int, m: int) -> int:
+    # Delannoy number D(n, m), all paths through an (n + 1) x (m + 1) table
+    # with diagonal, vertical and horizontal steps, from the closed form
+    # sum_k C(n, k) * C(m, k) * 2^k where every term follows from the last one
+    n, m = max(n, 0), max(m, 0)
+    if n < m:
+        # symmetric, only one order of the lengths is computed and cached
+        return count_alignments(m, n)
+    term = count = 1
+    for k in range(m):
+        term = term * 2 * (n - k) * (m - k) // ((k + 1) * (k + 1))
+        count += term
+    return count
 
-def count_alignments(n: int, m: int, memo: dict[tuple[int, int] : int]) -> int:
-    key = (n, m)
-    if key in memo:
-        return memo[key]
 
-    # base cases
-    if n <= 0 or m <= 0:
-        return 1
+@lru_cache(maxsize=None)
+def log10_count_alignments(n: int, m: int) -> float:
+    # magnitude of count_alignments, the same terms summed in log space
+    n, m = max(n, 0), max(m, 0)
+    k = np.arange(min(n, m))
+    steps = np.log(2.0 * (n - k) * (m - k)) - 2 * np.log(k + 1.0)
+    log_terms = np.concatenate(([0.0], np.cumsum(steps)))
+    top = log_terms.max()
+    return float((top + np.log(np.exp(log_terms - top).sum())) / np.log(10))
 
-    count = (
-        count_alignments(n - 1, m - 1, memo)  # previous diagonal
-        + count_alignments(n - 1, m, memo)  # previous vertical
-        + count_alignments(n, m - 1, memo)  # previous horizontal
-    )
-    memo[key] = count
-    return count
+
+def format_count(log10_count: float, count: int | None = None) -> str:
+    # exact up to 1e10, above it d.dde+XX from the logarithm since the count
+    # itself may not fit in a float
+    if count is not None and count <= 1e10:
+        return f"{count:,}"
+    exponent = math.floor(log10_count)
+    mantissa = 10 ** (log10_count - exponent)
+    if round(mantissa, 2) >= 10:
+        mantissa, exponent = mantissa / 10, exponent + 1
+    return f"{mantissa:.2f}e+{exponent:02d}"
 
 
 QUESTION2_SEQ = "GGCCTAAAGGCGCCGGTCTTTCGTACCCCAAAATCTCGGCATTTTAAGATAAGTGAGTGTTGCGTTACACTAGCGATCTACCGCGTCTTATACTTAAGCGTATGCCCAGATCTGACTAATCGTGCCCCCGGATTAGACGGGCTTGATGGGAAAGAACAGCTCGTCTGTTTACGTATAAACAGAATCGCCTGGGTTCGC"
 
 
 def format_output(
-    seq1: str, seq2: str, dp: np.ndarray, results: list, upper_bound: int
+    seq1: str,
+    seq2: str,
+    dp: np.ndarray,
+    alignment: tuple[str, str],
+    optimal_count: int,
+    upper_bound: int | None,
+    log10_upper_bound: float,
 ) -> str:
     width, chunk_size = 80, 50
     separator = "-" * width + "\n"
@@ -129,16 +233,15 @@ def format_output(
     output.append(
         f"{'[QUESTION 1] ' if seq1 == 'AATAAT' else '[QUESTION 2] ' if seq1 == QUESTION2_SEQ else ''}Maximum alignment score: {int(dp[len(seq1), len(seq2)])}\n"
     )
-    if upper_bound > 1e10:
-        output.append(f"Total possible alignments: {upper_bound:.2e}\n")
-    else:
-        output.append(f"Total possible alignments: {upper_bound:,}\n")
     output.append(
-        f"{'[QUESTION 4] ' if seq1 == QUESTION2_SEQ else ''}Number of optimal alignments: {len(results):,}\n"
+        f"Total possible alignments: {format_count(log10_upper_bound, upper_bound)}\n"
+    )
+    output.append(
+        f"{'[QUESTION 4] ' if seq1 == QUESTION2_SEQ else ''}Number of optimal alignments: {optimal_count:,}\n"
     )
     output.append(separator)
 
-    align1, align2 = results[random.randint(0, len(results) - 1)]
+    align1, align2 = alignment
     output.append(
         f"{'[QUESTION 3] ' if seq1 == QUESTION2_SEQ else ''} Random Optimal Alignment:\n"
     )
@@ -176,7 +279,15 @@ if __name__ == "__main__":
         print("There was a problem while reading fasta files")
         sys.exit(1)
 
-    dp, results = pairwise_alignment(seq1, seq2)
-    upper_bound = count_alignments(len(seq1), len(seq2), {})
-    formatted_output = format_output(seq1, seq2, dp, results, upper_bound)
+    dp = calc_dp(seq1, seq2)
+    counts = path_counts(dp, seq1, seq2)
+    alignment = sample_alignment(dp, seq1, seq2, counts)
+    # the exact bound is only printed up to 1e10, above it the magnitude is enough
+    log10_upper_bound = log10_count_alignments(len(seq1), len(seq2))
+    upper_bound = None
+    if log10_upper_bound <= 11:
+        upper_bound = count_alignments(len(seq1), len(seq2))
+    formatted_output = format_output(
+        seq1, seq2, dp, alignment, counts[-1][-1], upper_bound, log10_upper_bound
+    )
     print(formatted_output)
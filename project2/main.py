@@ -1,9 +1,43 @@
 import argparse
+import os
+import shutil
 import sys
 
-from scripts.global_affine import pairwise_alignment_affine
-from scripts.global_linear import pairwise_alignment_linear
-from scripts.helpers import format_output, save_result
+from scripts.alignment import output_format
+from scripts.batch import batch_scores
+from scripts.cache import configure_cache
+from scripts.constants import MEMORY_BUDGET
+from scripts.dag import AlignmentDAG
+from scripts.engines import DEFAULT_ENGINE, ENGINE_NAMES, get_engine
+from scripts.global_affine import (
+    iter_alignments_affine,
+    iter_transcripts_affine,
+    path_counts_affine,
+    sample_alignment_affine,
+    traceback_dag_affine,
+)
+from scripts.global_linear import (
+    iter_alignments_linear,
+    iter_transcripts_linear,
+    path_counts_linear,
+    sample_alignment_linear,
+    traceback_dag_linear,
+)
+from scripts.helpers import (
+    estimate_memory,
+    format_output,
+    parse_size,
+    read_sequence,
+    read_sequences,
+    save_result,
+    score_alignment,
+)
+from scripts.hirschberg import hirschberg_affine, hirschberg_linear
+from scripts.profiling import PHASES, PROFILER, configure_profiler
+from scripts.score import align_score
+from scripts.scoring import PARAMETERS_DIR, ScoringScheme
+from scripts.scratch import TraceBlocks
+from scripts.wavefront import wavefront
 
 
 def parse_args():
@@ -19,8 +53,12 @@ def parse_args():
     parser.add_argument(
         "--seq2",
         type=str,
-        required=True,
-        help="Second sequence to pairwise align, it can be either path of the sequence itself (required)",
+        help="Second sequence to pairwise align, it can be either path of the sequence itself (required unless --targets is given)",
+    )
+    parser.add_argument(
+        "--targets",
+        type=str,
+        help="FASTA file of targets, --seq1 is scored against every one of them in batches and a tab separated `id score` line is printed per target (always score-only, with --max-cost targets above it print `>MAX_COST`)",
     )
     parser.add_argument(
         "--gap-model",
@@ -28,32 +66,316 @@ def parse_args():
         default="linear",
         help="Gap penalty model to use, cost parameters can be modified in /parameters/... (default: linear)",
     )
+    parser.add_argument(
+        "--parameters",
+        type=str,
+        default=PARAMETERS_DIR,
+        help="Directory with score_matrix.csv, gapopen and gapextend, the matrix header is the alphabet, e.g. amino acids for BLOSUM/PAM (default: parameters/ of the package)",
+    )
     parser.add_argument(
         "--output-path",
         type=str,
-        help="Output path for the aligned file as a fasta, (e.g.: `--output-path results/alignments/XYZ.fasta`)",
+        help="Output path of the alignments, written as they are found: FASTA, or a tab separated `id start1 start2 cigar` table for .tsv/.cigar, gzip compressed when it ends in .gz, or for .dag the traceback DAG of all of them as a compressed npz (e.g.: `--output-path results/alignments/XYZ.fasta`)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["full", "hirschberg"],
+        default="full",
+        help="full keeps the whole cost matrix and finds all optimal alignments, hirschberg finds a single one in linear memory (default: full)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        default=MEMORY_BUDGET,
+        help="Memory available for the full DP matrices (e.g. 512M, 8G), above it a single alignment is computed in linear memory instead (default: 4G)",
+    )
+    parser.add_argument(
+        "--scratch-dir",
+        type=str,
+        help="Keep the full DP matrices in memory mapped files in this directory, so alignments larger than the memory are limited by the free disk space instead; without --output-path a single optimal alignment is printed",
+    )
+    parser.add_argument(
+        "--score-only",
+        action="store_true",
+        help="Only print the optimal alignment score, uses linear memory since no traceback is needed",
+    )
+    parser.add_argument(
+        "--band",
+        type=parse_band,
+        help="Restrict the score-only DP to a diagonal band, `auto` widens it until the score is provably optimal, an integer fixes the half width (implies --score-only)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINE_NAMES,
+        default=DEFAULT_ENGINE,
+        help=f"Backend of the DP kernels: reference is the plain Python recurrence, numpy the vectorized rows and jit compiles the loops with numba, falling back to numpy when it is not installed (default: {DEFAULT_ENGINE})",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Split a single large alignment into tiles filled by up to this many worker processes along anti-diagonal wavefronts, with the same results as the serial fill; tiles are at least 2048 columns wide, so a shorter seq2 starts fewer workers (numpy engine, default: 1)",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=int,
+        help="Stop the score-only DP as soon as the cost is certain to exceed this cutoff and print `>MAX_COST` instead of the score (implies --score-only)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the on-disk alignment cache, reused across runs (default: in-memory only)",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="PATH",
+        help="Print the time of every phase and counters of the work done as JSON to stderr, or to PATH",
+    )
+    parser.add_argument(
+        "--cprofile",
+        choices=PHASES,
+        help="Run cProfile on one phase and print its most expensive functions to stderr (implies --profile)",
+    )
+    args = parser.parse_args()
+    if args.seq2 is None and args.targets is None:
+        parser.error("one of the arguments --seq2 --targets is required")
+    if args.targets:
+        # the batches are score-only with the full matrix rows, so anything
+        # about bands, alignments or their matrices does not apply
+        ignored = {
+            "--band": args.band is not None,
+            "--mode hirschberg": args.mode != "full",
+            "--output-path": args.output_path is not None,
+            "--scratch-dir": args.scratch_dir is not None,
+            "--threads": args.threads != 1,
+        }
+        for option, given in ignored.items():
+            if given:
+                parser.error(f"{option} cannot be used with --targets")
+    if args.threads < 1:
+        parser.error("--threads must be at least 1")
+    if args.threads > 1 and args.engine != DEFAULT_ENGINE:
+        parser.error(f"--threads uses the kernels of the {DEFAULT_ENGINE} engine")
+    return args
+
+
+def parse_band(value: str) -> int | str:
+    if value == "auto":
+        return value
+    try:
+        width = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid band: {value}")
+    if width < 0:
+        raise argparse.ArgumentTypeError(f"Band width must be non-negative: {value}")
+    return width
 
 
 def main():
+    # subcommands are dispatched before the pairwise arguments are parsed,
+    # their modules (process pools, sockets) are only imported when used
+    if sys.argv[1:2] == ["search"]:
+        from scripts.search import main as search_main
+
+        return search_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        from scripts.server import main as serve_main
+
+        return serve_main(sys.argv[2:])
+    if sys.argv[1:2] == ["client"]:
+        from scripts.server import client_main
+
+        return client_main(sys.argv[2:])
+
     args = parse_args()
 
     try:
-        if args.gap_model == "linear":
-            costs, results = pairwise_alignment_linear(args.seq1, args.seq2)
+        configure_cache(args.cache_dir)
+        configure_profiler(args.profile is not None, args.cprofile)
+        scheme = ScoringScheme.load(args.parameters)
+        if args.targets:
+            with PROFILER.phase("read"):
+                seq1 = str(read_sequence(args.seq1))
+                targets = read_sequences(args.targets)
+            with PROFILER.phase("fill"):
+                scores = batch_scores(
+                    seq1, list(targets.values()), args.gap_model, scheme
+                )
+            PROFILER.count("cells", len(seq1) * sum(map(len, targets.values())))
+            with PROFILER.phase("write"):
+                # targets above --max-cost are reported like a single pair
+                output = "".join(
+                    (
+                        f"{target_id}\t>{args.max_cost}\n"
+                        if args.max_cost is not None and score > args.max_cost
+                        else f"{target_id}\t{score}\n"
+                    )
+                    for target_id, score in zip(targets, scores)
+                )
+                sys.stdout.write(output)
+            PROFILER.count("bytes_written", len(output.encode()))
+            return
+
+        with PROFILER.phase("read"):
+            seq1, seq2 = str(read_sequence(args.seq1)), str(read_sequence(args.seq2))
+        PROFILER.count("cells", len(seq1) * len(seq2))
+
+        if args.score_only or args.band is not None or args.max_cost is not None:
+            with PROFILER.phase("fill"):
+                if args.threads > 1 and args.band is None and args.max_cost is None:
+                    score, _ = wavefront(
+                        seq1, seq2, args.gap_model, scheme, args.threads
+                    )
+                else:
+                    score = align_score(
+                        seq1,
+                        seq2,
+                        args.gap_model,
+                        args.band,
+                        scheme,
+                        args.engine,
+                        args.max_cost,
+                    )
+            print(f">{args.max_cost}" if score is None else int(score))
+            return
+
+        # plan the full matrix memory before allocating anything
+        required = estimate_memory(len(seq1), len(seq2), args.gap_model, scheme)
+        if args.threads > 1:
+            # the tiles keep their costs, only the traceback bits are collected
+            required = (len(seq1) + 1) * (len(seq2) + 1)
+        if args.scratch_dir is not None:
+            os.makedirs(args.scratch_dir, exist_ok=True)
+            free = shutil.disk_usage(args.scratch_dir).free
+            if args.mode == "full" and required > free:
+                raise MemoryError(
+                    f"Full matrices need ~{required / 1024**2:.0f} MiB, more "
+                    f"than is free in {args.scratch_dir}"
+                )
+        elif args.mode == "full" and required > args.memory_budget:
+            if args.output_path:
+                raise MemoryError(
+                    f"Full matrices need ~{required / 1024**2:.0f} MiB, over the "
+                    f"memory budget, use --mode hirschberg for a single alignment"
+                )
+            print(
+                f"Warning: full matrices need ~{required / 1024**2:.0f} MiB, "
+                "falling back to --mode hirschberg",
+                file=sys.stderr,
+            )
+            args.mode = "hirschberg"
+
+        engine = get_engine(args.engine)
+        optimal_count = None
+        if args.mode == "hirschberg":
+            # the traceback is interleaved with the fill
+            with PROFILER.phase("fill"):
+                if args.gap_model == "linear":
+                    alignment = hirschberg_linear(seq1, seq2, scheme)
+                else:
+                    alignment = hirschberg_affine(seq1, seq2, scheme)
+                score = score_alignment(*alignment, args.gap_model, scheme)
+            results = [alignment]
         else:
-            costs, results = pairwise_alignment_affine(args.seq1, args.seq2)
+            # only the traceback bits are needed after the fill
+            with PROFILER.phase("fill"):
+                if args.threads > 1:
+                    score, (T,) = wavefront(
+                        seq1,
+                        seq2,
+                        args.gap_model,
+                        scheme,
+                        args.threads,
+                        ("T",),
+                        args.scratch_dir,
+                    )
+                else:
+                    *costs, T = engine.cost(
+                        seq1,
+                        seq2,
+                        args.gap_model,
+                        traceback=True,
+                        scheme=scheme,
+                        scratch_dir=args.scratch_dir,
+                    )
+                    score = costs[0][-1, -1]
+                    del costs
+            if args.scratch_dir is not None:
+                # the walks read T back in blocks rather than a page per cell
+                T = TraceBlocks(T)
+            if args.gap_model == "linear":
+                (
+                    iter_alignments,
+                    iter_transcripts,
+                    path_counts,
+                    sample_alignment,
+                    traceback_dag,
+                ) = (
+                    iter_alignments_linear,
+                    iter_transcripts_linear,
+                    path_counts_linear,
+                    sample_alignment_linear,
+                    traceback_dag_linear,
+                )
+            else:
+                (
+                    iter_alignments,
+                    iter_transcripts,
+                    path_counts,
+                    sample_alignment,
+                    traceback_dag,
+                ) = (
+                    iter_alignments_affine,
+                    iter_transcripts_affine,
+                    path_counts_affine,
+                    sample_alignment_affine,
+                    traceback_dag_affine,
+                )
+            if args.output_path and output_format(args.output_path) == "dag":
+                # the whole set at once, the shared parts are stored a single time
+                with PROFILER.phase("traceback"):
+                    results = traceback_dag(T, seq1, seq2)
+                PROFILER.count("alignments", results.count())
+            elif args.output_path:
+                # enumerated lazily as compact transcripts, each one is only
+                # rendered by the writer, so its time is part of the write phase
+                results = iter_transcripts(T, seq1, seq2)
+            elif args.scratch_dir is not None:
+                # the path counts would keep a Python int per cell in memory
+                with PROFILER.phase("traceback"):
+                    results = list(iter_alignments(T, seq1, seq2, limit=1))
+            else:
+                with PROFILER.phase("traceback"):
+                    counts = path_counts(T)
+                    # affine counts are kept per state, alignments end in S
+                    S_counts = counts[0] if args.gap_model == "affine" else counts
+                    optimal_count = S_counts[-1][-1]
+                    results = [sample_alignment(T, seq1, seq2, counts)]
+                PROFILER.count("traceback_nodes", T.size)
 
+        if not isinstance(results, AlignmentDAG):
+            results = PROFILER.counted("alignments", results)
         if args.output_path:
-            save_result(results, args.output_path)
+            with PROFILER.phase("write"):
+                save_result(results, args.output_path)
+            PROFILER.count("bytes_written", os.path.getsize(args.output_path))
         else:
-            formatted_result = format_output(args.seq1, args.seq2, costs, results)
-            print(formatted_result)
+            with PROFILER.phase("format"):
+                formatted_result = format_output(
+                    seq1, seq2, score, results, optimal_count, scheme
+                )
+            with PROFILER.phase("write"):
+                print(formatted_result)
+            PROFILER.count("bytes_written", len(formatted_result.encode()) + 1)
 
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if PROFILER.enabled:
+            PROFILER.dump(args.profile)
 
 
 if __name__ == "__main__":
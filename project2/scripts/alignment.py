@@ -0,0 +1,153 @@
+import gzip
+import os
+import re
+from typing import Iterable, Iterator, TextIO
+
+# CIGAR operations: both sequences advance (M), only seq2 does, a gap in
+# seq1 (I), or only seq1 does, a gap in seq2 (D); seq1 is the reference
+CIGAR_OPS = re.compile(r"(\d+)([MID])")
+OP_RUNS = re.compile(r"M+|I+|D+")
+GAP = "-"
+FASTA_WIDTH = 60  # residues per line, as Biopython writes them
+OUTPUT_FORMATS = {
+    ".fasta": "fasta",
+    ".fa": "fasta",
+    ".tsv": "cigar",
+    ".cigar": "cigar",
+    ".dag": "dag",
+}
+
+
+class Alignment:
+    # one alignment as a CIGAR string of run-length encoded operations and
+    # the offsets where it starts in both sequences; the sequences are shared
+    # by all alignments of a pair, the gapped strings are only built by
+    # render(), iterating yields them so `align1, align2 = alignment` works
+    __slots__ = ("seq1", "seq2", "cigar", "start1", "start2")
+
+    def __init__(
+        self, seq1: str, seq2: str, cigar: str, start1: int = 0, start2: int = 0
+    ):
+        self.seq1 = seq1
+        self.seq2 = seq2
+        self.cigar = cigar
+        self.start1 = start1
+        self.start2 = start2
+
+    @classmethod
+    def from_ops(
+        cls, seq1: str, seq2: str, ops: Iterable[str], start1: int = 0, start2: int = 0
+    ) -> "Alignment":
+        # one operation per column, empty ones (state changes) are skipped
+        return cls(seq1, seq2, encode_cigar(ops), start1, start2)
+
+    @classmethod
+    def from_gapped(cls, align1: str, align2: str) -> "Alignment":
+        ops = (
+            "I" if char1 == GAP else "D" if char2 == GAP else "M"
+            for char1, char2 in zip(align1, align2)
+        )
+        return cls.from_ops(align1.replace(GAP, ""), align2.replace(GAP, ""), ops)
+
+    def __repr__(self) -> str:
+        return (
+            f"Alignment(cigar={self.cigar!r}, start1={self.start1}, "
+            f"start2={self.start2})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Alignment):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.render())
+
+    def _key(self) -> tuple:
+        return self.seq1, self.seq2, self.cigar, self.start1, self.start2
+
+    def ops(self) -> Iterator[tuple[int, str]]:
+        for match in CIGAR_OPS.finditer(self.cigar):
+            yield int(match.group(1)), match.group(2)
+
+    def render(self) -> tuple[str, str]:
+        # the gapped strings, slices of the shared sequences joined with gaps
+        align1, align2 = [], []
+        i, j = self.start1, self.start2
+        for length, op in self.ops():
+            if op == "M":
+                align1.append(self.seq1[i : i + length])
+                align2.append(self.seq2[j : j + length])
+                i, j = i + length, j + length
+            elif op == "I":
+                align1.append(GAP * length)
+                align2.append(self.seq2[j : j + length])
+                j += length
+            else:
+                align1.append(self.seq1[i : i + length])
+                align2.append(GAP * length)
+                i += length
+        return "".join(align1), "".join(align2)
+
+
+def encode_cigar(ops: Iterable[str]) -> str:
+    # empty operations vanish in the join, so they never split a run
+    return "".join(f"{len(run)}{run[0]}" for run in OP_RUNS.findall("".join(ops)))
+
+
+def open_output(path: str) -> TextIO:
+    # a trailing .gz compresses the stream while it is written
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt")
+    return open(path, "w")
+
+
+def output_format(path: str) -> str:
+    # fasta unless the extension (before any .gz) names another format
+    root = path[:-3] if path.endswith(".gz") else path
+    return OUTPUT_FORMATS.get(os.path.splitext(root)[1].lower(), "fasta")
+
+
+def write_fasta(
+    output: TextIO, alignments: Iterable["Alignment | tuple[str, str]"]
+) -> int:
+    # both gapped rows of every alignment as records, rendered one at a time
+    written = 0
+    for idx, alignment in enumerate(alignments, 1):
+        align1, align2 = alignment
+        _write_record(output, f"alignment_{idx}_seq1 First sequence", align1)
+        _write_record(output, f"alignment_{idx}_seq2 Second sequence", align2)
+        written = idx
+    return written
+
+
+def write_cigar(
+    output: TextIO, alignments: Iterable["Alignment | tuple[str, str]"]
+) -> int:
+    # `id start1 start2 cigar` per alignment, tab separated and without header
+    written = 0
+    for idx, alignment in enumerate(alignments, 1):
+        if not isinstance(alignment, Alignment):
+            alignment = Alignment.from_gapped(*alignment)
+        output.write(
+            f"alignment_{idx}\t{alignment.start1}\t{alignment.start2}\t"
+            f"{alignment.cigar}\n"
+        )
+        written = idx
+    return written
+
+
+def _write_record(output: TextIO, title: str, sequence: str) -> None:
+    lines = [title]
+    lines.extend(
+        sequence[start : start + FASTA_WIDTH]
+        for start in range(0, len(sequence), FASTA_WIDTH)
+    )
+    output.write(">" + "\n".join(lines) + "\n")
+
+
+WRITERS = {"fasta": write_fasta, "cigar": write_cigar}
@@ -0,0 +1,236 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .banded import banded_score_codes
+from .cache import CACHE, cache_key
+from .engines import DEFAULT_ENGINE, get_engine
+from .global_affine import fill_row_affine
+from .global_linear import fill_row_linear
+from .helpers import cost_cutoff, select_dtype, sentinel
+from .profiling import PROFILER
+from .scoring import ScoringScheme, default_scheme
+
+GAP_MODELS = ("linear", "affine")
+
+# encoded sequences of the pool, attached once per worker process
+_shared = {}
+
+
+def score_both(
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+    band: int | str | None = None,
+) -> tuple[int | None, int | None]:
+    # linear and affine scores in a single pass over seq1, sharing the
+    # encoding, the substitution profile and the row loop, other engines
+    # score the pair once per gap model; a gap model whose cost is certain
+    # to exceed max_cost stops being filled and scores None. With a band
+    # every gap model is filled in its own diagonal band instead, which
+    # band="auto" widens until the score is optimal
+    if band is not None:
+        return tuple(
+            _within(
+                banded_score_codes(seq1_codes, seq2_codes, gap_model, band, scheme),
+                max_cost,
+            )
+            for gap_model in GAP_MODELS
+        )
+    if engine != DEFAULT_ENGINE:
+        seq1, seq2 = scheme.decode(seq1_codes), scheme.decode(seq2_codes)
+        return tuple(
+            get_engine(engine).score(seq1, seq2, gap_model, scheme, max_cost)
+            for gap_model in GAP_MODELS
+        )
+
+    if len(seq2_codes) > len(seq1_codes):
+        seq1_codes, seq2_codes = seq2_codes, seq1_codes
+        scheme = scheme.transposed()
+
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    m = len(seq2_codes)
+    dtype = select_dtype(len(seq1_codes) + 1, m + 1, scheme)
+    profile = scheme.profile(seq2_codes, dtype)
+    linear_steps = np.arange(m + 1, dtype=dtype) * gap_open
+    affine_steps = np.arange(m + 1, dtype=dtype) * gap_extend
+
+    prev_row, row = linear_steps.copy(), np.empty_like(linear_steps)
+    prev_S = gap_open + affine_steps
+    prev_D = np.full(m + 1, sentinel(dtype), dtype=dtype)
+    prev_S[0], prev_D[0] = 0, gap_open
+    S, D, I = (np.empty_like(affine_steps) for _ in range(3))
+    linear_above = affine_above = None
+    if max_cost is not None:
+        n = len(seq1_codes)
+        linear_above = cost_cutoff(n, m, gap_open, max_cost, scheme, dtype)
+        affine_above = cost_cutoff(n, m, gap_extend, max_cost, scheme, dtype)
+    linear = affine = True  # gap models still being filled
+    for s1_idx, code in enumerate(seq1_codes, 1):
+        if linear:
+            row[0] = s1_idx * gap_open
+            fill_row_linear(prev_row, row, profile[code], linear_steps, gap_open)
+            prev_row, row = row, prev_row
+            linear = linear_above is None or not linear_above(prev_row, s1_idx)
+        if affine:
+            fill_row_affine(
+                prev_S,
+                prev_D,
+                S,
+                D,
+                I,
+                profile[code],
+                affine_steps,
+                gap_open,
+                gap_extend,
+            )
+            prev_S, S = S, prev_S
+            prev_D, D = D, prev_D
+            affine = affine_above is None or not affine_above(prev_S, s1_idx)
+        if not linear and not affine:
+            break
+    return (
+        _within(prev_row[-1], max_cost) if linear else None,
+        _within(prev_S[-1], max_cost) if affine else None,
+    )
+
+
+def _within(score: int, max_cost: int | None) -> int | None:
+    if max_cost is not None and score > max_cost:
+        return None
+    return int(score)
+
+
+def all_vs_all(
+    sequences: list[str],
+    workers: int | None = None,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+    band: int | str | None = None,
+) -> dict[str, np.ndarray]:
+    # symmetric score matrices of every pair for both gap models, the pairs
+    # are spread across a process pool reading the sequences from shared memory,
+    # pairs costing more than max_cost are NaN and mostly left unfilled, a band
+    # is passed on to score_both
+    scheme = scheme or default_scheme()
+    # resolved once, so a missing backend is reported once and not per pair
+    engine = get_engine(engine).name
+    codes = [scheme.encode(seq) for seq in sequences]
+    offsets = np.cumsum([0] + [len(seq_codes) for seq_codes in codes])
+    pairs = list(combinations(range(len(codes)), 2))
+    # the most expensive pairs go first so the pool drains evenly
+    pairs.sort(key=lambda pair: -len(codes[pair[0]]) * len(codes[pair[1]]))
+
+    matrices = {
+        gap_model: np.zeros((len(codes), len(codes))) for gap_model in GAP_MODELS
+    }
+    # only the pairs missing from the cache go to the pool
+    keys = {
+        (i, j): cache_key(
+            "score_both", sequences[i], sequences[j], scheme, max_cost, band
+        )
+        for i, j in pairs
+    }
+    results, missing = [], []
+    for i, j in pairs:
+        scores = CACHE.get(keys[i, j])
+        if scores is None:
+            missing.append((i, j))
+        else:
+            results.append((i, j, *scores))
+
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers <= 1:
+        computed = [
+            (i, j, *score_both(codes[i], codes[j], scheme, engine, max_cost, band))
+            for i, j in missing
+        ]
+    else:
+        computed = _score_pairs_parallel(
+            codes, offsets, missing, workers, scheme, engine, max_cost, band
+        )
+    # cells of both gap models, the cached pairs were not filled, an upper
+    # bound with max_cost or a band
+    PROFILER.count("cells", sum(2 * len(codes[i]) * len(codes[j]) for i, j in missing))
+    CACHE.put_many(
+        [(keys[i, j], (linear, affine)) for i, j, linear, affine in computed]
+    )
+
+    for i, j, linear, affine in results + computed:
+        for gap_model, score in (("linear", linear), ("affine", affine)):
+            score = np.nan if score is None else score
+            matrices[gap_model][i, j] = matrices[gap_model][j, i] = score
+    return matrices
+
+
+def _score_pairs_parallel(
+    codes: list[np.ndarray],
+    offsets: np.ndarray,
+    pairs: list,
+    workers: int,
+    scheme: ScoringScheme,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+    band: int | str | None = None,
+) -> list[tuple[int, int, int | None, int | None]]:
+    buffer = shared_memory.SharedMemory(create=True, size=max(int(offsets[-1]), 1))
+    try:
+        np.ndarray(offsets[-1], dtype=np.uint8, buffer=buffer.buf)[:] = np.concatenate(
+            codes
+        )
+        # a few chunks per worker keeps the pool balanced without paying
+        # the task overhead for every single pair
+        chunk_size = max(1, len(pairs) // (workers * 4))
+        chunks = [pairs[k : k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_attach,
+            initargs=(buffer.name, offsets, scheme, engine, max_cost, band),
+        ) as pool:
+            return [
+                result for chunk in pool.map(_score_chunk, chunks) for result in chunk
+            ]
+    finally:
+        buffer.close()
+        buffer.unlink()
+
+
+def _attach(
+    name: str,
+    offsets: np.ndarray,
+    scheme: ScoringScheme,
+    engine: str,
+    max_cost: int | None,
+    band: int | str | None,
+) -> None:
+    buffer = shared_memory.SharedMemory(name=name)
+    _shared["buffer"] = buffer
+    _shared["codes"] = np.ndarray(offsets[-1], dtype=np.uint8, buffer=buffer.buf)
+    _shared["offsets"] = offsets
+    _shared["scheme"] = scheme
+    _shared["engine"] = engine
+    _shared["max_cost"] = max_cost
+    _shared["band"] = band
+
+
+def _score_chunk(pairs: list) -> list[tuple[int, int, int, int]]:
+    codes, offsets, scheme = _shared["codes"], _shared["offsets"], _shared["scheme"]
+    engine, max_cost, band = _shared["engine"], _shared["max_cost"], _shared["band"]
+    results = []
+    for i, j in pairs:
+        seq1_codes = codes[offsets[i] : offsets[i + 1]]
+        seq2_codes = codes[offsets[j] : offsets[j + 1]]
+        results.append(
+            (
+                i,
+                j,
+                *score_both(seq1_codes, seq2_codes, scheme, engine, max_cost, band),
+            )
+        )
+    return results
@@ -1,37 +1,86 @@
 import argparse
 import sys
-from itertools import combinations
 from pathlib import Path
 
-import numpy as np
 import pandas as pd
 
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-from scripts.constants import GAPEXTEND, GAPOPEN
-from scripts.global_affine import pairwise_alignment_affine
-from scripts.global_linear import pairwise_alignment_linear
+from scripts.all_vs_all import GAP_MODELS, all_vs_all
+from scripts.cache import CACHE, configure_cache
+from scripts.engines import DEFAULT_ENGINE, ENGINE_NAMES
 from scripts.helpers import format_seq, read_sequences
+from scripts.profiling import PHASES, PROFILER, configure_profiler
+from scripts.score import optimal_alignment
+from scripts.scoring import PARAMETERS_DIR, ScoringScheme, default_scheme
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Generate alignment analysis report")
     parser.add_argument("sequences", help="Path to input FASTA file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes for the all-vs-all score matrices (default: all cores)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the on-disk alignment cache, reused across runs (default: in-memory only)",
+    )
+    parser.add_argument(
+        "--parameters",
+        type=str,
+        default=PARAMETERS_DIR,
+        help="Directory with score_matrix.csv, gapopen and gapextend (default: parameters/ of the package)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINE_NAMES,
+        default=DEFAULT_ENGINE,
+        help=f"Backend of the DP kernels, jit needs numba (default: {DEFAULT_ENGINE})",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=int,
+        help="Leave pairs costing more than this empty (<NA>) in the score matrices, most of their DP is skipped",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="PATH",
+        help="Print the time of every phase and counters of the work done as JSON to stderr, or to PATH",
+    )
+    parser.add_argument(
+        "--cprofile",
+        choices=PHASES,
+        help="Run cProfile on one phase and print its most expensive functions to stderr (implies --profile)",
+    )
     return parser.parse_args()
 
 
-def format_questions(sequences: dict) -> str:
+def format_questions(
+    sequences: dict,
+    workers: int | None = None,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+    band: int | str | None = "auto",
+) -> str:
+    scheme = scheme or default_scheme()
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
     seq1, seq2 = sequences["seq1"], sequences["seq2"]
-    linear_cost, linear_alignments = pairwise_alignment_linear(seq1, seq2)
-    affine_cost, affine_alignments = pairwise_alignment_affine(seq1, seq2)
+    linear_cost, (align1, align2) = optimal_alignment(
+        seq1, seq2, "linear", scheme, engine
+    )
 
     output = []
     output.append("### Question 1\n")
-    output.append(f"Linear gap cost alignment (g(k)={GAPOPEN}*k):\n")
-    output.append(f"Optimal score: {linear_cost[-1, -1]}\n")
+    output.append(f"Linear gap cost alignment (g(k)={gap_open}*k):\n")
+    output.append(f"Optimal score: {linear_cost}\n")
     output.append("Optimal alignment:\n")
-    align1, align2 = linear_alignments[0]
     output.append(
         f"```\nAligned sequence 1 ({len(align1)} bp):\n{format_seq(align1)}\n```"
     )
@@ -40,10 +89,12 @@ def format_questions(sequences: dict) -> str:
     )
 
     output.append("### Question 2\n")
-    output.append(f"Affine gap cost alignment (g(k)={GAPOPEN}+{GAPEXTEND}k):\n")
-    output.append(f"Optimal score: {affine_cost[-1, -1]}\n")
+    output.append(f"Affine gap cost alignment (g(k)={gap_open}+{gap_extend}k):\n")
+    affine_cost, (align1, align2) = optimal_alignment(
+        seq1, seq2, "affine", scheme, engine
+    )
+    output.append(f"Optimal score: {affine_cost}\n")
     output.append("Optimal alignment:\n")
-    align1, align2 = affine_alignments[0]
     output.append(
         f"```\nAligned sequence 1 ({len(align1)} bp):\n{format_seq(align1)}\n```"
     )
@@ -52,44 +103,77 @@ def format_questions(sequences: dict) -> str:
     )
 
     output.append("### Question 3\n")
-    output.append(f"Score matrix for linear gap cost (g(k)={GAPOPEN}k):\n")
-    linear_matrix = create_score_matrix(sequences, "linear")
-    output.append(f"```\n{linear_matrix}\n```\n")
+    output.append(f"Score matrix for linear gap cost (g(k)={gap_open}k):\n")
+    score_matrices = create_score_matrices(
+        sequences, workers, scheme, engine, max_cost, band
+    )
+    output.append(f"```\n{score_matrices['linear']}\n```\n")
 
     output.append("### Question 4\n")
-    output.append(f"Score matrix for affine gap cost (g(k)={GAPOPEN}+{GAPEXTEND}k):\n")
-    affine_matrix = create_score_matrix(sequences, "affine")
-    output.append(f"```\n{affine_matrix}\n```\n")
-    return "\n".join(output)
-
-
-def create_score_matrix(sequences: dict, gap_model: str) -> pd.DataFrame:
-    n = len(sequences)
-    matrix = np.zeros((n, n))
-
-    for (i, seq1), (j, seq2) in combinations(enumerate(sequences.values()), 2):
-        if gap_model == "linear":
-            score, _ = pairwise_alignment_linear(seq1, seq2)
-        else:
-            score, _ = pairwise_alignment_affine(seq1, seq2)
-        matrix[i, j] = matrix[j, i] = score[-1, -1]
-
-    return pd.DataFrame(
-        matrix, index=sequences.keys(), columns=sequences.keys(), dtype=int
+    output.append(
+        f"Score matrix for affine gap cost (g(k)={gap_open}+{gap_extend}k):\n"
     )
+    output.append(f"```\n{score_matrices['affine']}\n```\n")
+    return "\n".join(output)
 
 
-def get_formatted_output(sequences_path: str) -> str:
-    sequences = read_sequences(sequences_path)
+def create_score_matrices(
+    sequences: dict,
+    workers: int | None = None,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+    band: int | str | None = "auto",
+) -> dict[str, pd.DataFrame]:
+    # every pair is scored once for both gap models in the adaptive band,
+    # which stays exact, pairs above max_cost are missing values
+    with PROFILER.phase("score_matrices"):
+        matrices = all_vs_all(
+            list(sequences.values()), workers, scheme, engine, max_cost, band
+        )
+    return {
+        gap_model: pd.DataFrame(
+            matrices[gap_model],
+            index=sequences.keys(),
+            columns=sequences.keys(),
+            dtype=int if max_cost is None else "Int64",
+        )
+        for gap_model in GAP_MODELS
+    }
+
+
+def get_formatted_output(
+    sequences_path: str,
+    workers: int | None = None,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+) -> str:
+    with PROFILER.phase("read"):
+        sequences = read_sequences(sequences_path)
 
     output = []
     output.append("## Sequence Alignment Analysiss\n")
-    output.append(format_questions(sequences))
+    output.append(format_questions(sequences, workers, scheme, engine, max_cost))
 
     return "".join(output)
 
 
 if __name__ == "__main__":
     args = parse_args()
-    formatted_output = get_formatted_output(args.sequences)
-    print(formatted_output)
+    configure_cache(args.cache_dir)
+    configure_profiler(args.profile is not None, args.cprofile)
+    formatted_output = get_formatted_output(
+        args.sequences,
+        args.workers,
+        ScoringScheme.load(args.parameters),
+        args.engine,
+        args.max_cost,
+    )
+    with PROFILER.phase("write"):
+        print(formatted_output)
+    PROFILER.count("bytes_written", len(formatted_output.encode()) + 1)
+    if args.cache_dir:
+        print(f"Alignment cache: {CACHE.stats()}", file=sys.stderr)
+    if PROFILER.enabled:
+        PROFILER.dump(args.profile)
@@ -0,0 +1,175 @@
+import numpy as np
+
+from .helpers import select_dtype, sentinel
+from .scoring import ScoringScheme, default_scheme
+
+BAND_START = 16  # initial half width of the adaptive band
+
+
+def banded_score(
+    seq1: str,
+    seq2: str,
+    gap_model: str = "linear",
+    band: int | str = "auto",
+    scheme: ScoringScheme | None = None,
+) -> int:
+    # band="auto" doubles the band until the score is provably optimal,
+    # an integer keeps a fixed half width (only an upper bound if too narrow)
+    scheme = scheme or default_scheme()
+    return banded_score_codes(
+        scheme.encode(seq1), scheme.encode(seq2), gap_model, band, scheme
+    )
+
+
+def banded_score_codes(
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    gap_model: str,
+    band: int | str,
+    scheme: ScoringScheme,
+) -> int:
+    # banded_score of sequences that are already encoded
+    if gap_model == "linear":
+        fill_band = banded_score_linear
+    elif gap_model == "affine":
+        fill_band = banded_score_affine
+    else:
+        raise ValueError(f"Unknown gap model: {gap_model}")
+
+    if band != "auto":
+        return fill_band(seq1_codes, seq2_codes, int(band), scheme)
+
+    n, m = len(seq1_codes), len(seq2_codes)
+    width = BAND_START
+    while True:
+        score = fill_band(seq1_codes, seq2_codes, width, scheme)
+        # a band covering the whole matrix is exact, otherwise any path
+        # leaving it costs at least the Fickett/Ukkonen bound
+        if width >= max(n, m) or score <= band_bound(n, m, width, gap_model, scheme):
+            return score
+        width *= 2
+
+
+def band_bound(
+    n: int,
+    m: int,
+    width: int,
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+) -> int:
+    # a path leaving the band uses at least |n - m| + 2 * (width + 1) indels,
+    # going out and coming back needs both an insertion and a deletion gap
+    scheme = scheme or default_scheme()
+    indels = abs(n - m) + 2 * (width + 1)
+    if gap_model == "linear":
+        bound = indels * scheme.gap_open
+    else:
+        bound = 2 * scheme.gap_open + indels * scheme.gap_extend
+    # negative substitution costs can pay for part of the detour
+    return bound + min(0, int(scheme.matrix.min())) * min(n, m)
+
+
+def _band_limits(n: int, m: int, width: int) -> tuple[int, int]:
+    # diagonals j - i kept in the band, always including the end cell
+    return min(0, m - n) - width, max(0, m - n) + width
+
+
+def banded_score_linear(
+    seq1_codes: np.ndarray, seq2_codes: np.ndarray, width: int, scheme: ScoringScheme
+) -> int:
+    gap_open = scheme.gap_open
+    n, m = len(seq1_codes), len(seq2_codes)
+    if n == 0 or m == 0:
+        return (n + m) * gap_open
+
+    # rows are stored in band coordinates k = j - i - lo, so the diagonal
+    # predecessor keeps k, the one above is k + 1 and the one left is k - 1,
+    # one extra sentinel cell at the end stands for the cell above the band
+    lo, hi = _band_limits(n, m, width)
+    dtype = select_dtype(n + 1, m + 1, scheme)
+    inf = sentinel(dtype)
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(hi - lo + 2, dtype=dtype) * gap_open
+
+    prev_row = np.full(hi - lo + 2, inf, dtype=dtype)
+    k0, k1 = _valid_range(0, lo, hi, m)
+    prev_row[k0 : k1 + 1] = (np.arange(k0, k1 + 1) + lo) * gap_open
+    row = np.full_like(prev_row, inf)
+    for s1_idx in range(1, n + 1):
+        k0, k1 = _valid_range(s1_idx, lo, hi, m)
+        # the first column has no diagonal predecessor
+        d0 = k0 + (k0 + lo + s1_idx == 0)
+        cols = slice(d0 + lo + s1_idx - 1, k1 + lo + s1_idx)
+
+        row[:] = inf
+        # match/mismatch
+        row[d0 : k1 + 1] = prev_row[d0 : k1 + 1] + profile[seq1_codes[s1_idx - 1], cols]
+        # deletion
+        band = row[k0 : k1 + 1]
+        np.minimum(band, prev_row[k0 + 1 : k1 + 2] + gap_open, out=band)
+        # insertion with a prefix minimum along the band
+        band[:] = np.minimum.accumulate(band - steps[: len(band)]) + steps[: len(band)]
+        prev_row, row = row, prev_row
+    return int(prev_row[m - n - lo])
+
+
+def banded_score_affine(
+    seq1_codes: np.ndarray, seq2_codes: np.ndarray, width: int, scheme: ScoringScheme
+) -> int:
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    n, m = len(seq1_codes), len(seq2_codes)
+    if n == 0 or m == 0:
+        return gap_open + (n + m) * gap_extend if n + m else 0
+
+    # rows are stored in band coordinates k = j - i - lo, so the diagonal
+    # predecessor keeps k, the one above is k + 1 and the one left is k - 1,
+    # one extra sentinel cell at the end stands for the cell above the band
+    lo, hi = _band_limits(n, m, width)
+    dtype = select_dtype(n + 1, m + 1, scheme)
+    inf = sentinel(dtype)
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(hi - lo + 2, dtype=dtype) * gap_extend
+
+    # first row can only be reached by insertions
+    prev_S = np.full(hi - lo + 2, inf, dtype=dtype)
+    k0, k1 = _valid_range(0, lo, hi, m)
+    prev_S[k0 : k1 + 1] = gap_open + (np.arange(k0, k1 + 1) + lo) * gap_extend
+    prev_S[-lo] = 0
+    prev_D = np.full_like(prev_S, inf)
+    S, D = np.full_like(prev_S, inf), np.full_like(prev_S, inf)
+    for s1_idx in range(1, n + 1):
+        k0, k1 = _valid_range(s1_idx, lo, hi, m)
+        # the first column has no diagonal predecessor
+        d0 = k0 + (k0 + lo + s1_idx == 0)
+        cols = slice(d0 + lo + s1_idx - 1, k1 + lo + s1_idx)
+
+        # calc D from the cell above, k + 1 in the previous row
+        D[:] = inf
+        D[k0 : k1 + 1] = np.minimum(
+            prev_S[k0 + 1 : k1 + 2] + gap_open + gap_extend,
+            prev_D[k0 + 1 : k1 + 2] + gap_extend,
+        )
+
+        # best score without ending in an insertion
+        S[:] = inf
+        S[d0 : k1 + 1] = prev_S[d0 : k1 + 1] + profile[seq1_codes[s1_idx - 1], cols]
+        band = S[k0 : k1 + 1]
+        np.minimum(band, D[k0 : k1 + 1], out=band)
+
+        # calc I with a running minimum along the band, then take it into S
+        if len(band) > 1:
+            I = (
+                np.minimum.accumulate(band[:-1] - steps[: len(band) - 1])
+                + gap_open
+                + steps[1 : len(band)]
+            )
+            np.minimum(band[1:], I, out=band[1:])
+
+        prev_S, S = S, prev_S
+        prev_D, D = D, prev_D
+    return int(prev_S[m - n - lo])
+
+
+def _valid_range(row: int, lo: int, hi: int, m: int) -> tuple[int, int]:
+    # band coordinates of the cells of a row that lie inside the matrix
+    return max(0, -lo - row), min(hi - lo, m - lo - row)
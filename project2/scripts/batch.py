@@ -0,0 +1,110 @@
+import numpy as np
+
+from .global_affine import fill_row_affine
+from .global_linear import fill_row_linear
+from .helpers import select_dtype, sentinel
+from .scoring import ScoringScheme, default_scheme
+
+BATCH_CELLS = 2**20  # cells of one DP row across a whole batch of targets
+BATCH_PADDING = 1.25  # padded / used cells allowed once a bucket is full enough
+BATCH_MIN_TARGETS = 32  # buckets are not split for padding below this size
+
+
+def batch_scores(
+    query: str,
+    targets: list[str],
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+    batch_cells: int = BATCH_CELLS,
+) -> np.ndarray:
+    # optimal costs of the query against every target, the targets are
+    # sorted by length and cut into buckets that are padded and stacked,
+    # so every row of the DP is filled for a whole bucket at once
+    scheme = scheme or default_scheme()
+    if gap_model == "linear":
+        fill_batch = batch_scores_linear
+    elif gap_model == "affine":
+        fill_batch = batch_scores_affine
+    else:
+        raise ValueError(f"Unknown gap model: {gap_model}")
+
+    query_codes = scheme.encode(query)
+    target_codes = [scheme.encode(target) for target in targets]
+    scores = np.zeros(len(targets), dtype=np.int64)
+    for bucket in length_buckets([len(codes) for codes in target_codes], batch_cells):
+        lengths = np.array([len(target_codes[idx]) for idx in bucket])
+        # padding only ever sits right of a target's last column,
+        # so it never influences the cells that are read back
+        stacked = np.zeros((len(bucket), lengths.max()), dtype=np.uint8)
+        for row, idx in enumerate(bucket):
+            stacked[row, : lengths[row]] = target_codes[idx]
+        scores[bucket] = fill_batch(query_codes, stacked, lengths, scheme)
+    return scores
+
+
+def length_buckets(
+    lengths: list[int], batch_cells: int = BATCH_CELLS
+) -> list[list[int]]:
+    # indices grouped by similar length, a bucket is closed when its padded
+    # row (targets x longest target) would exceed batch_cells or, once it
+    # is big enough to vectorize well, waste too much of it on padding
+    buckets, bucket, used = [], [], 0
+    for idx in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # sorted, so the current target is the longest of its bucket
+        padded = (len(bucket) + 1) * (lengths[idx] + 1)
+        if bucket and (
+            padded > batch_cells
+            or len(bucket) >= BATCH_MIN_TARGETS
+            and padded > BATCH_PADDING * (used + lengths[idx] + 1)
+        ):
+            buckets.append(bucket)
+            bucket, used = [], 0
+        bucket.append(idx)
+        used += lengths[idx] + 1
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def batch_scores_linear(
+    query_codes: np.ndarray,
+    target_codes: np.ndarray,
+    lengths: np.ndarray,
+    scheme: ScoringScheme,
+) -> np.ndarray:
+    # C rows of all targets stacked, the query runs along the rows
+    gap_open = scheme.gap_open
+    dtype = select_dtype(len(query_codes) + 1, target_codes.shape[1] + 1, scheme)
+    profile = scheme.score_matrix(dtype)[:, target_codes]
+    steps = np.arange(target_codes.shape[1] + 1, dtype=dtype) * gap_open
+    prev_row = np.tile(steps, (len(target_codes), 1))
+    row = np.empty_like(prev_row)
+    for s1_idx, code in enumerate(query_codes, 1):
+        row[:, 0] = s1_idx * gap_open
+        fill_row_linear(prev_row, row, profile[code], steps, gap_open)
+        prev_row, row = row, prev_row
+    return prev_row[np.arange(len(lengths)), lengths]
+
+
+def batch_scores_affine(
+    query_codes: np.ndarray,
+    target_codes: np.ndarray,
+    lengths: np.ndarray,
+    scheme: ScoringScheme,
+) -> np.ndarray:
+    # S and D rows of all targets stacked, the query runs along the rows
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    dtype = select_dtype(len(query_codes) + 1, target_codes.shape[1] + 1, scheme)
+    profile = scheme.score_matrix(dtype)[:, target_codes]
+    steps = np.arange(target_codes.shape[1] + 1, dtype=dtype) * gap_extend
+    prev_S = np.tile(gap_open + steps, (len(target_codes), 1))
+    prev_D = np.full_like(prev_S, sentinel(dtype))
+    prev_S[:, 0], prev_D[:, 0] = 0, gap_open
+    S, D, I = np.empty_like(prev_S), np.empty_like(prev_S), np.empty_like(prev_S)
+    for code in query_codes:
+        fill_row_affine(
+            prev_S, prev_D, S, D, I, profile[code], steps, gap_open, gap_extend
+        )
+        prev_S, S = S, prev_S
+        prev_D, D = D, prev_D
+    return prev_S[np.arange(len(lengths)), lengths]
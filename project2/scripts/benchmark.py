@@ -1,82 +1,470 @@
 import argparse
-import functools
+import json
+import multiprocessing
+import os
+import platform
 import random
-import timeit
-from typing import Tuple
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
 
-import matplotlib.pyplot as plt
 import numpy as np
 
-from scripts.global_affine import calc_cost_affine
-from scripts.global_linear import calc_cost_linear
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
 
-plt.rcParams["figure.figsize"] = [12, 8]
+from scripts.all_vs_all import GAP_MODELS, all_vs_all
+from scripts.cache import CACHE
+from scripts.engines import DEFAULT_ENGINE, ENGINE_NAMES, Engine, get_engine
+from scripts.global_affine import iter_alignments_affine
+from scripts.global_linear import iter_alignments_linear
+from scripts.helpers import read_sequences, save_result
 
+BENCH_LENGTHS = (100, 250, 500, 1000)
+BENCH_REPEATS = 5  # timed runs per case, after one warm-up run
+BENCH_SEED = 0
+BENCH_SEQUENCES = 8  # sequences of the all-vs-all and I/O cases
+BENCH_THRESHOLD = 0.1  # relative slowdown of the median flagged as regression
+PATHS = ("fill", "traceback", "score", "all_vs_all", "io")
 
-def parse_args():
-    parser = argparse.ArgumentParser(description="Generate benchmark figure")
-    parser.add_argument("--output-path", help="Output path for the figure")
-    return parser.parse_args()
 
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the alignment kernels and compare against a baseline"
+    )
+    parser.add_argument(
+        "--output-path", help="Write the results as JSON, the baseline of later runs"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINE_NAMES,
+        default=DEFAULT_ENGINE,
+        help=f"Backend of the DP kernels to time (default: {DEFAULT_ENGINE})",
+    )
+    parser.add_argument(
+        "--lengths",
+        type=int,
+        nargs="+",
+        default=BENCH_LENGTHS,
+        help=f"Sequence lengths to benchmark (default: {' '.join(map(str, BENCH_LENGTHS))})",
+    )
+    parser.add_argument(
+        "--paths",
+        choices=PATHS,
+        nargs="+",
+        default=PATHS,
+        help="Code paths to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=BENCH_REPEATS,
+        help=f"Timed runs per case (default: {BENCH_REPEATS})",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=BENCH_SEED,
+        help=f"Seed of the random sequences (default: {BENCH_SEED})",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Baseline JSON to compare against, exits with 1 if a case regressed",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCH_THRESHOLD,
+        help=f"Relative slowdown of the median time reported as regression (default: {BENCH_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--report",
+        help="Instead of running, print a markdown section of this results JSON",
+    )
+    parser.add_argument(
+        "--figure", help="With --report, also plot the median times to this path"
+    )
+    return parser.parse_args(argv)
 
-def generate_random_sequence(length: int) -> str:
-    return "".join(random.choice("ATGC") for _ in range(length))
 
+def generate_random_sequence(length: int, rng: random.Random) -> str:
+    return "".join(rng.choices("acgt", k=length))
 
-def run_benchmark(seq_lengths: np.ndarray) -> Tuple[list, list]:
-    linear_times, affine_times = [], []
 
-    for n in seq_lengths:
-        seq1 = generate_random_sequence(n)
-        seq2 = generate_random_sequence(n)
+def measure(
+    func: Callable, repeats: int = BENCH_REPEATS, setup: Callable | None = None
+) -> dict:
+    # wall times of repeated runs, the peak of the traced allocations and
+    # the peak resident memory of a run of its own, setup (e.g. emptying
+    # the cache) runs before every call, untimed
+    if setup:
+        setup()
+    func()  # warm-up: imports, JIT compilation, first touch of the pages
+
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # a separate run, tracing slows down the allocations it records
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p90 = np.percentile(times, [50, 90])
+    return {
+        "repeats": repeats,
+        "times": times,
+        "min": min(times),
+        "p50": float(p50),
+        "p90": float(p90),
+        "max": max(times),
+        "peak_bytes": peak,
+        "peak_rss_bytes": peak_rss(func, setup),
+    }
+
+
+def peak_rss(func: Callable, setup: Callable | None = None) -> int | None:
+    # resident memory high-water mark of one more run in a forked child:
+    # ru_maxrss of this process never goes down, so after the largest case
+    # it would be the same for every case; the child starts from the current
+    # resident size of this process, its peak adds what the run itself
+    # touches (None where processes cannot be forked)
+    if not hasattr(os, "fork"):
+        return None
+    context = multiprocessing.get_context("fork")
+    reader, writer = context.Pipe(duplex=False)
+    process = context.Process(target=_child_rss, args=(func, setup, writer))
+    process.start()
+    writer.close()
+    try:
+        rss = reader.recv()
+    except EOFError:
+        rss = None
+    process.join()
+    return rss
+
+
+def _child_rss(func: Callable, setup: Callable | None, writer) -> None:
+    if setup:
+        setup()
+    func()
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    writer.send(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+
+
+def benchmark_cases(
+    engine: Engine,
+    lengths: list[int],
+    paths: list[str],
+    seed: int,
+    workdir: str,
+) -> list[dict]:
+    # (name, path, variant, length, work, unit, function, setup) per case, the
+    # variant is the gap model or the I/O direction, work is the number of DP
+    # cells, or of bytes for the I/O cases
+    cases = []
+    for length in lengths:
+        rng = random.Random(f"{seed}:{length}")
+        seq1 = generate_random_sequence(length, rng)
+        seq2 = generate_random_sequence(length, rng)
+        sequences = [
+            generate_random_sequence(length, rng) for _ in range(BENCH_SEQUENCES)
+        ]
+        cells = length * length
+        pairs = BENCH_SEQUENCES * (BENCH_SEQUENCES - 1) // 2
+
+        for gap_model in GAP_MODELS:
+            if "fill" in paths:
+                cases.append(
+                    _case(
+                        "fill",
+                        gap_model,
+                        length,
+                        cells,
+                        "cells",
+                        lambda gm=gap_model, s1=seq1, s2=seq2: engine.cost(s1, s2, gm),
+                    )
+                )
+            if "traceback" in paths:
+                cases.append(
+                    _case(
+                        "traceback",
+                        gap_model,
+                        length,
+                        cells,
+                        "cells",
+                        lambda gm=gap_model, s1=seq1, s2=seq2: _first_alignment(
+                            engine, s1, s2, gm
+                        ),
+                    )
+                )
+            if "score" in paths:
+                cases.append(
+                    _case(
+                        "score",
+                        gap_model,
+                        length,
+                        cells,
+                        "cells",
+                        lambda gm=gap_model, s1=seq1, s2=seq2: engine.score(s1, s2, gm),
+                    )
+                )
+
+        if "all_vs_all" in paths:
+            # both gap models in one pass, the cache is emptied before each run
+            cases.append(
+                _case(
+                    "all_vs_all",
+                    "both",
+                    length,
+                    2 * pairs * cells,
+                    "cells",
+                    lambda seqs=sequences: all_vs_all(seqs, 1, engine=engine.name),
+                    CACHE.clear,
+                )
+            )
+        if "io" in paths:
+            fasta_path = os.path.join(workdir, f"sequences_{length}.fasta")
+            records = "".join(
+                f">seq{idx}\n{seq}\n" for idx, seq in enumerate(sequences)
+            )
+            with open(fasta_path, "w") as f:
+                f.write(records)
+            alignments = list(zip(sequences[::2], sequences[1::2]))
+            output_path = os.path.join(workdir, f"alignments_{length}.fasta")
+            cases.append(
+                _case(
+                    "io",
+                    "read",
+                    length,
+                    len(records),
+                    "bytes",
+                    lambda path=fasta_path: read_sequences(path),
+                )
+            )
+            cases.append(
+                _case(
+                    "io",
+                    "write",
+                    length,
+                    len(records),
+                    "bytes",
+                    lambda results=alignments, path=output_path: save_result(
+                        results, path
+                    ),
+                )
+            )
+    return cases
+
+
+def _case(
+    path: str,
+    variant: str,
+    length: int,
+    work: int,
+    unit: str,
+    func: Callable,
+    setup: Callable | None = None,
+) -> dict:
+    return {
+        "name": f"{path}/{variant}/{length}",
+        "path": path,
+        "variant": variant,
+        "length": length,
+        "work": work,
+        "unit": unit,
+        "func": func,
+        "setup": setup,
+    }
 
-        linear_time = timeit.timeit(
-            functools.partial(calc_cost_linear, seq1, seq2),
-            number=5,
-        )
-        linear_times.append(linear_time)
 
-        affine_time = timeit.timeit(
-            functools.partial(calc_cost_affine, seq1, seq2),
-            number=1,
+def _first_alignment(engine: Engine, seq1: str, seq2: str, gap_model: str) -> tuple:
+    *_, T = engine.cost(seq1, seq2, gap_model, traceback=True)
+    if gap_model == "linear":
+        return next(iter_alignments_linear(T, seq1, seq2, limit=1))
+    return next(iter_alignments_affine(T, seq1, seq2, limit=1))
+
+
+def run_benchmark(
+    engine: Engine,
+    lengths: list[int] = BENCH_LENGTHS,
+    paths: list[str] = PATHS,
+    repeats: int = BENCH_REPEATS,
+    seed: int = BENCH_SEED,
+) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for case in benchmark_cases(engine, lengths, paths, seed, workdir):
+            func, setup = case.pop("func"), case.pop("setup")
+            stats = measure(func, repeats, setup)
+            # throughput of the median run, GCUPS for the DP, MB/s for I/O
+            rate = case["work"] / stats["p50"] if stats["p50"] else float("inf")
+            if case["unit"] == "cells":
+                stats["gcups"] = rate / 1e9
+            else:
+                stats["mb_per_s"] = rate / 1e6
+            results.append({**case, **stats})
+            print(f"Completed {case['name']}", file=sys.stderr)
+    return {"metadata": _metadata(engine, repeats, seed), "results": results}
+
+
+def _metadata(engine: Engine, repeats: int, seed: int) -> dict:
+    return {
+        "engine": engine.name,
+        "repeats": repeats,
+        "seed": seed,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare_results(
+    current: dict, baseline: dict, threshold: float = BENCH_THRESHOLD
+) -> list[dict]:
+    # cases of both runs matched by name, the median time is compared
+    # since it is the least sensitive to a single noisy run
+    baseline_cases = {case["name"]: case for case in baseline["results"]}
+    comparison = []
+    for case in current["results"]:
+        if case["name"] not in baseline_cases:
+            continue
+        before, after = baseline_cases[case["name"]]["p50"], case["p50"]
+        change = after / before - 1 if before else 0.0
+        comparison.append(
+            {
+                "name": case["name"],
+                "baseline": before,
+                "current": after,
+                "change": change,
+                "regression": change > threshold,
+            }
         )
-        affine_times.append(affine_time)
-        print(f"Completed length {n}")
+    return comparison
 
-    return linear_times, affine_times
 
+def format_comparison(comparison: list[dict]) -> str:
+    lines = [f"{'case':<28}{'baseline':>12}{'current':>12}{'change':>10}"]
+    for row in comparison:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['name']:<28}{row['baseline']:>11.4f}s{row['current']:>11.4f}s"
+            f"{row['change']:>+10.1%}{flag}"
+        )
+    return "\n".join(lines)
 
-def plot_results(
-    seq_lengths: np.ndarray, linear_times: list, affine_times: list, output_path: str
-) -> None:
-    plt.figure(figsize=(12, 8))
 
-    plt.plot(seq_lengths, linear_times, "bo-", label="Linear Gap", alpha=0.5)
-    plt.plot(seq_lengths, affine_times, "ro-", label="Affine Gap", alpha=0.5)
+def format_report(results: dict, figure_path: str | None = None) -> str:
+    metadata = results["metadata"]
+    output = []
+    output.append("## Benchmark\n")
+    output.append(
+        f"Engine `{metadata['engine']}`, median of {metadata['repeats']} runs "
+        f"(seed {metadata['seed']}) on {metadata['processor']}, "
+        f"Python {metadata['python']}, NumPy {metadata['numpy']}.\n"
+    )
+    if figure_path:
+        output.append(f"![Benchmark Results]({figure_path})\n")
+    output.append(
+        "| case | median (s) | p90 (s) | throughput | peak allocated (MiB) "
+        "| peak RSS (MiB) |"
+    )
+    output.append("|---|---:|---:|---:|---:|---:|")
+    for case in results["results"]:
+        if "gcups" in case:
+            throughput = f"{case['gcups']:.4f} GCUPS"
+        else:
+            throughput = f"{case['mb_per_s']:.1f} MB/s"
+        # the resident peak includes the interpreter and everything imported
+        rss = case.get("peak_rss_bytes")
+        rss = "n/a" if rss is None else f"{rss / 1024**2:.1f}"
+        output.append(
+            f"| {case['name']} | {case['p50']:.4f} | {case['p90']:.4f} "
+            f"| {throughput} | {case['peak_bytes'] / 1024**2:.1f} | {rss} |"
+        )
+    return "\n".join(output) + "\n"
 
-    degree = 2  # expected O(n²) complexity
-    linear_coeffs = np.polyfit(seq_lengths, linear_times, degree)
-    affine_coeffs = np.polyfit(seq_lengths, affine_times, degree)
 
-    linear_fit = np.poly1d(linear_coeffs)
-    affine_fit = np.poly1d(affine_coeffs)
+def plot_results(results: dict, output_path: str) -> None:
+    # only needed for the report, so matplotlib is not required to benchmark
+    import matplotlib.pyplot as plt
 
-    plt.plot(seq_lengths, [linear_fit(n) for n in seq_lengths], "b--", alpha=0.3)
-    plt.plot(seq_lengths, [affine_fit(n) for n in seq_lengths], "r--", alpha=0.3)
+    plt.figure(figsize=(12, 8))
+    colors = {"linear": "b", "affine": "r", "both": "g"}
+    for path in ("fill", "traceback", "score", "all_vs_all"):
+        for variant, color in colors.items():
+            cases = [
+                case
+                for case in results["results"]
+                if case["path"] == path and case["variant"] == variant
+            ]
+            if not cases:
+                continue
+            lengths = [case["length"] for case in cases]
+            plt.plot(
+                lengths,
+                [case["p50"] for case in cases],
+                f"{color}{'os^d'[PATHS.index(path)]}-",
+                label=f"{path} ({variant})",
+                alpha=0.5,
+            )
     plt.xscale("log")
     plt.yscale("log")
     plt.xlabel("Sequence Length")
-    plt.ylabel("Time (seconds)")
-    plt.title("Performance Comparison: Linear vs Affine Gap Penalties")
+    plt.ylabel("Median time (seconds)")
+    plt.title(f"Alignment performance, {results['metadata']['engine']} engine")
     plt.legend()
     plt.grid(True, alpha=0.3)
 
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     plt.savefig(output_path)
 
 
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.report:
+        with open(args.report) as f:
+            results = json.load(f)
+        if args.figure:
+            plot_results(results, args.figure)
+        print(format_report(results, args.figure))
+        return 0
+
+    results = run_benchmark(
+        get_engine(args.engine), args.lengths, args.paths, args.repeats, args.seed
+    )
+    if args.output_path:
+        os.makedirs(os.path.dirname(args.output_path) or ".", exist_ok=True)
+        with open(args.output_path, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        comparison = compare_results(results, baseline, args.threshold)
+        print(format_comparison(comparison), file=sys.stderr)
+        if any(row["regression"] for row in comparison):
+            return 1
+    return 0
+
+
 if __name__ == "__main__":
-    seq_lengths = np.linspace(0, 1000, 8, dtype=int)
-    linear_times, affine_times = run_benchmark(seq_lengths)
-    args = parse_args()
-    print(args.output_path)
-    plot_results(seq_lengths, linear_times, affine_times, args.output_path)
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+import numpy as np
+
+from .scoring import ScoringScheme, default_scheme
+
+CACHE_VERSION = 1  # bump when the layout of cached results changes
+CACHE_ENTRIES = 4096  # results kept in the in-process LRU
+CACHE_MEMORY_BUDGET = 256 * 1024**2  # bytes kept in the in-process LRU
+CACHE_TOUCHES = 256  # disk hits whose access time is written in one transaction
+CACHE_DISK_BUDGET = 1024**3  # bytes kept in the on-disk store
+
+
+def cache_key(kind: str, seq1: str, seq2: str, *args: Any) -> str:
+    # results are only valid for the scoring scheme they were computed with,
+    # so a scheme argument contributes its content digest
+    digest = hashlib.sha256(f"{CACHE_VERSION}".encode())
+    args = [arg.digest if isinstance(arg, ScoringScheme) else repr(arg) for arg in args]
+    # lengths are included so the sequence boundary is unambiguous
+    for part in (kind, str(seq1), str(seq2), *args):
+        digest.update(f"{len(part)}:".encode())
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+class AlignmentCache:
+    def __init__(
+        self,
+        max_entries: int = CACHE_ENTRIES,
+        cache_dir: str | None = None,
+        disk_budget: int = CACHE_DISK_BUDGET,
+        memory_budget: int = CACHE_MEMORY_BUDGET,
+    ):
+        self.max_entries = max_entries
+        self.disk_budget = disk_budget
+        self.memory_budget = memory_budget
+        # results with their estimated size, the sizes are summed in memory_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        # access times of disk hits not written back yet
+        self.touched = {}
+        self.db = None
+        self.cache_dir = None
+        # the threads of the socket server share the cache and its connection
+        self.lock = threading.RLock()
+        self.hits = self.disk_hits = self.misses = 0
+        if cache_dir:
+            self.open(cache_dir)
+
+    def open(self, cache_dir: str) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # several snakemake jobs may share the store, wait for their writes;
+        # the connection is used from any thread, always under the lock
+        with self.lock:
+            self.db = sqlite3.connect(
+                os.path.join(cache_dir, "alignments.sqlite"),
+                timeout=60,
+                check_same_thread=False,
+            )
+            self.cache_dir = cache_dir
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)"
+            )
+            self.db.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self.flush()
+                self.db.close()
+                self.db = None
+            self.cache_dir = None
+
+    def reopen_after_fork(self) -> None:
+        # a SQLite connection must not be used on both sides of a fork, the
+        # child leaves the inherited one alone and opens its own; access
+        # times of the parent's hits are written by the parent
+        self.lock = threading.RLock()
+        self.db = None
+        self.touched = {}
+        if self.cache_dir:
+            self.open(self.cache_dir)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            return self._get(key, default)
+
+    def _get(self, key: str, default: Any) -> Any:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key][0]
+
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                # reads stay reads, the access times are written in batches
+                self.touched[key] = time.time()
+                if len(self.touched) >= CACHE_TOUCHES:
+                    self.flush()
+                value = pickle.loads(row[0])
+                self._remember(key, value)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return default
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, items: list[tuple[str, Any]]) -> None:
+        with self.lock:
+            self._put_many(items)
+
+    def _put_many(self, items: list[tuple[str, Any]]) -> None:
+        # a single transaction for the whole batch
+        for key, value in items:
+            self._remember(key, value)
+        if self.db is None:
+            return
+
+        rows = []
+        for key, value in items:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(blob) <= self.disk_budget:
+                rows.append((key, blob, len(blob), time.time()))
+                self.touched.pop(key, None)
+        self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+        # pending access times first, so eviction sees the recent hits
+        self._write_touched()
+        self._evict()
+        self.db.commit()
+
+    def flush(self) -> None:
+        # write the access times of the disk hits since the last write
+        with self.lock:
+            if self.db is not None and self.touched:
+                self._write_touched()
+                self.db.commit()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        # computed outside the lock, threads only wait for each other's lookups
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.memory),
+                "bytes": self.memory_bytes,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+            self.touched.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self.db is not None:
+                self.db.execute("DELETE FROM results")
+                self.db.commit()
+
+    def _remember(self, key: str, value: Any) -> None:
+        # bounded by bytes as well as entries, a full cost matrix may be
+        # larger than the whole budget and is then only kept on disk
+        self._forget(key)
+        size = result_size(value)
+        if size > self.memory_budget:
+            return
+        self.memory[key] = value, size
+        self.memory_bytes += size
+        while (
+            len(self.memory) > self.max_entries
+            or self.memory_bytes > self.memory_budget
+        ):
+            self._forget(next(iter(self.memory)))
+
+    def _forget(self, key: str) -> None:
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key)[1]
+
+    def _write_touched(self) -> None:
+        self.db.executemany(
+            "UPDATE results SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self.touched.items()],
+        )
+        self.touched.clear()
+
+    def _evict(self) -> None:
+        # drop the least recently used results until the store fits the budget
+        (total,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        if total <= self.disk_budget:
+            return
+        for key, size in self.db.execute(
+            "SELECT key, size FROM results ORDER BY accessed"
+        ).fetchall():
+            self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.disk_budget:
+                break
+
+
+def result_size(value: Any) -> int:
+    # approximate bytes held by a result, arrays count their buffers
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(map(result_size, value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            result_size(key) + result_size(item) for key, item in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+CACHE = AlignmentCache()
+if hasattr(os, "register_at_fork"):
+    # forked pool workers (search, all-vs-all, serve) get their own connection
+    os.register_at_fork(after_in_child=lambda: CACHE.reopen_after_fork())
+
+
+def configure_cache(
+    cache_dir: str | None, disk_budget: int = CACHE_DISK_BUDGET
+) -> None:
+    # enable the on-disk store of the process wide cache
+    with CACHE.lock:
+        CACHE.close()
+        CACHE.disk_budget = disk_budget
+        if cache_dir:
+            CACHE.open(cache_dir)
+
+
+def cached(kind: str) -> Callable:
+    # memoize f(seq1, seq2, ...) by content, the callers must not mutate results
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # defaults are filled in so equivalent calls share one key
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if bound.arguments.get("scheme", False) is None:
+                bound.arguments["scheme"] = default_scheme()
+            key = cache_key(kind, *bound.arguments.values())
+            return CACHE.get_or_compute(key, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
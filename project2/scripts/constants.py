@@ -1,27 +1,14 @@
-import numpy as np
-import pandas as pd
-
-
-def read_gapcost(path):
-    with open(path) as f:
-        gapcost = f.read()
-    return int(gapcost)
-
-
-def read_score_matrix(path):
-    df = pd.read_csv(path)
-    return np.array(df.values)
-
-
-BASE_DECODE = {"A": 0, "C": 1, "G": 2, "T": 3}
-SCORE_MATRIX_PATH = "parameters/score_matrix.csv"
-GAPOPEN_PATH = "parameters/gapopen"
-GAPEXTEND_PATH = "parameters/gapextend"
-
-SCORE_MATRIX = read_score_matrix(SCORE_MATRIX_PATH)
-GAPOPEN = read_gapcost(GAPOPEN_PATH)  # 5
-GAPEXTEND = read_gapcost(GAPEXTEND_PATH)  # 5
 DEF_VAL = float("inf")
+MEMORY_BUDGET = 4 * 1024**3  # bytes available for full DP matrices
+
+# traceback bits, one per optimal predecessor of a cell
+TRACE_DIAG = 1  # match/mismatch (S from S for affine)
+TRACE_UP = 2  # deletion (S from D for affine)
+TRACE_LEFT = 4  # insertion (S from I for affine)
+TRACE_D_OPEN = 8  # D from S
+TRACE_D_EXTEND = 16  # D from D
+TRACE_I_OPEN = 32  # I from S
+TRACE_I_EXTEND = 64  # I from I
 
 CHUNK_SIZE = 50
 WIDTH = 80
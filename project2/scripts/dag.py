@@ -0,0 +1,193 @@
+from typing import Callable, Iterator
+
+import numpy as np
+
+from .alignment import Alignment
+
+STATES = "SDI"  # S ends in match/mismatch, D and I in a gap (affine only)
+
+# a traceback vertex is (s1_idx, s2_idx, state), its moves are the optimal
+# predecessors in exploration order with the operation of the column they add
+# ("" for a change of state within the same cell)
+Vertex = tuple[int, int, str]
+Moves = Callable[[Vertex], list[tuple[Vertex, str]]]
+
+
+class AlignmentDAG:
+    # every optimal alignment of a pair as paths through the traceback from
+    # the last cell (node 0) to the first one (the last node): nodes are only
+    # kept where paths branch or merge, the cells in between are collapsed
+    # into the operations of the edge, so the storage grows with the branch
+    # points rather than with the number of alignments times their length
+    def __init__(
+        self,
+        seq1: str,
+        seq2: str,
+        nodes: np.ndarray,
+        edge_index: np.ndarray,
+        targets: np.ndarray,
+        ops_index: np.ndarray,
+        ops: np.ndarray,
+    ):
+        self.seq1 = seq1
+        self.seq2 = seq2
+        self.nodes = nodes  # (s1_idx, s2_idx, state) per node, topological
+        self.edge_index = edge_index  # edges of node k are [index[k], index[k+1])
+        self.targets = targets  # node every edge leads to
+        self.ops_index = ops_index  # operations of edge e are [index[e], index[e+1])
+        self.ops = ops  # ASCII operations of all edges, in alignment order
+        self._counts = None
+
+    @classmethod
+    def load(cls, path: str) -> "AlignmentDAG":
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        seq1, seq2 = (arrays.pop(name).tobytes().decode() for name in ("seq1", "seq2"))
+        return cls(seq1, seq2, **arrays)
+
+    def save(self, path: str) -> None:
+        # a compressed npz, written through a handle so no suffix is added
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                seq1=np.frombuffer(self.seq1.encode(), dtype=np.uint8),
+                seq2=np.frombuffer(self.seq2.encode(), dtype=np.uint8),
+                nodes=self.nodes,
+                edge_index=self.edge_index,
+                targets=self.targets,
+                ops_index=self.ops_index,
+                ops=self.ops,
+            )
+
+    def __iter__(self) -> Iterator[Alignment]:
+        return self.transcripts()
+
+    def counts(self) -> list[int]:
+        # number of alignments from every node to the first cell, as Python
+        # big ints, the nodes are in topological order so one reverse pass
+        if self._counts is None:
+            counts = [0] * len(self.nodes)
+            counts[-1] = 1
+            for node in range(len(self.nodes) - 2, -1, -1):
+                counts[node] = sum(counts[target] for target in self._targets(node))
+            self._counts = counts
+        return self._counts
+
+    def count(self) -> int:
+        return self.counts()[0]
+
+    def alignment(self, index: int) -> Alignment:
+        # the index-th alignment in iteration order, expanded without
+        # enumerating the ones before it
+        counts = self.counts()
+        if not 0 <= index < counts[0]:
+            raise IndexError(f"Alignment index out of range: {index}")
+        segments, node = [], 0
+        while node != len(self.nodes) - 1:
+            for edge in range(self.edge_index[node], self.edge_index[node + 1]):
+                target = int(self.targets[edge])
+                if index < counts[target]:
+                    break
+                index -= counts[target]
+            segments.append(self._segment(edge))
+            node = target
+        return Alignment.from_ops(self.seq1, self.seq2, reversed(segments))
+
+    def transcripts(self, limit: int | None = None) -> Iterator[Alignment]:
+        # depth first over the edges, in the order of the traceback walks
+        sink = len(self.nodes) - 1
+        if sink == 0:
+            # both sequences are empty, the single alignment has no columns
+            yield Alignment(self.seq1, self.seq2, "")
+            return
+        segments = self._segments()
+        edge_index, targets = self.edge_index.tolist(), self.targets.tolist()
+        # the path holds the segments walked so far, every stack entry is an
+        # edge still to take and the path depth it branches from
+        path = []
+        stack = [(edge, 0) for edge in range(edge_index[1] - 1, -1, -1)]
+        produced = 0
+        while stack:
+            edge, depth = stack.pop()
+            del path[depth:]
+            path.append(segments[edge])
+            node = targets[edge]
+            if node == sink:
+                yield Alignment.from_ops(self.seq1, self.seq2, reversed(path))
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+                continue
+            stack.extend(
+                (next_edge, depth + 1)
+                for next_edge in range(
+                    edge_index[node + 1] - 1, edge_index[node] - 1, -1
+                )
+            )
+
+    def _targets(self, node: int) -> list[int]:
+        return self.targets[self.edge_index[node] : self.edge_index[node + 1]].tolist()
+
+    def _segment(self, edge: int) -> str:
+        return (
+            self.ops[self.ops_index[edge] : self.ops_index[edge + 1]].tobytes().decode()
+        )
+
+    def _segments(self) -> list[str]:
+        ops = self.ops.tobytes().decode()
+        bounds = self.ops_index.tolist()
+        return [ops[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def build_dag(moves: Moves, seq1: str, seq2: str) -> AlignmentDAG:
+    seq1, seq2 = str(seq1), str(seq2)
+    end, origin = (len(seq1), len(seq2), "S"), (0, 0, "S")
+
+    # optimal predecessors reachable from the last cell, with their in-degree
+    indegree = {end: 0}
+    stack = [end]
+    while stack:
+        for vertex, _ in moves(stack.pop()):
+            if vertex in indegree:
+                indegree[vertex] += 1
+            else:
+                indegree[vertex] = 1
+                stack.append(vertex)
+
+    # branches, merges and both ends are nodes, the rest only lies on edges;
+    # ordered by anti-diagonal from the end with S before the gap states of
+    # its cell, every move then leads to a later node
+    node_ids = {
+        vertex: None
+        for vertex, degree in indegree.items()
+        if degree != 1 or vertex in (end, origin) or len(moves(vertex)) != 1
+    }
+    order = sorted(node_ids, key=lambda v: (-v[0] - v[1], v[2] != "S"))
+    for node, vertex in enumerate(order):
+        node_ids[vertex] = node
+
+    edge_index, targets, ops_index, ops = [0], [], [0], []
+    for vertex in order:
+        for target, op in moves(vertex):
+            # the walk goes backwards, each edge stores its run reversed
+            run = [op]
+            while target not in node_ids:
+                ((target, op),) = moves(target)
+                run.append(op)
+            segment = "".join(reversed(run))
+            ops.append(segment)
+            ops_index.append(ops_index[-1] + len(segment))
+            targets.append(node_ids[target])
+        edge_index.append(len(targets))
+
+    return AlignmentDAG(
+        seq1,
+        seq2,
+        np.array(
+            [(i, j, STATES.index(state)) for i, j, state in order], dtype=np.int64
+        ).reshape(-1, 3),
+        np.array(edge_index, dtype=np.int64),
+        np.array(targets, dtype=np.int64),
+        np.array(ops_index, dtype=np.int64),
+        np.frombuffer("".join(ops).encode(), dtype=np.uint8).copy(),
+    )
@@ -0,0 +1,170 @@
+import sys
+from typing import Callable
+
+import numpy as np
+
+from .global_affine import (
+    calc_cost_affine,
+    calc_cost_affine_reference,
+    score_affine,
+    trace_affine,
+)
+from .global_linear import (
+    calc_cost_linear,
+    calc_cost_linear_reference,
+    score_linear,
+    trace_linear,
+)
+from .scoring import ScoringScheme
+
+DEFAULT_ENGINE = "numpy"
+
+
+class Engine:
+    # one backend: score-only and full-matrix kernels for both gap models,
+    # engines without their own traceback derive it from the full matrices
+    def __init__(
+        self,
+        name: str,
+        score: dict[str, Callable],
+        cost: dict[str, Callable],
+        trace: dict[str, Callable] | None = None,
+        scratch: bool = False,
+    ):
+        self.name = name
+        self.score_kernels = score
+        self.cost_kernels = cost
+        self.trace_kernels = trace
+        self.scratch = scratch  # cost kernels accept a scratch_dir
+
+    def __repr__(self) -> str:
+        return f"Engine({self.name!r})"
+
+    def score(
+        self,
+        seq1: str,
+        seq2: str,
+        gap_model: str = "linear",
+        scheme: ScoringScheme | None = None,
+        max_cost: int | None = None,
+    ) -> int | None:
+        # None when the cost exceeds max_cost, the kernels may stop early then
+        score = self._kernel(self.score_kernels, gap_model)(
+            seq1, seq2, scheme, max_cost
+        )
+        return None if score is None else int(score)
+
+    def cost(
+        self,
+        seq1: str,
+        seq2: str,
+        gap_model: str = "linear",
+        traceback: bool = False,
+        scheme: ScoringScheme | None = None,
+        scratch_dir: str | None = None,
+    ) -> np.ndarray | tuple[np.ndarray, ...]:
+        # same results as calc_cost_linear / calc_cost_affine, with scratch_dir
+        # the matrices are memory mapped files in it
+        fill = self._kernel(self.cost_kernels, gap_model)
+        if scratch_dir is not None:
+            if not self.scratch:
+                raise ValueError(
+                    f"The {self.name} engine keeps its matrices in memory, "
+                    "use the numpy engine with a scratch directory"
+                )
+            return fill(seq1, seq2, traceback, scheme, scratch_dir)
+        if self.trace_kernels is None:
+            return fill(seq1, seq2, traceback=traceback, scheme=scheme)
+
+        costs = fill(seq1, seq2, scheme=scheme)
+        if not traceback:
+            return costs
+        matrices = costs if isinstance(costs, tuple) else (costs,)
+        T = self._kernel(self.trace_kernels, gap_model)(*matrices, seq1, seq2, scheme)
+        return (*matrices, T)
+
+    def _kernel(self, kernels: dict[str, Callable], gap_model: str) -> Callable:
+        if gap_model not in kernels:
+            raise ValueError(f"Unknown gap model: {gap_model}")
+        return kernels[gap_model]
+
+
+ENGINES = {}
+
+
+def register_engine(engine: Engine) -> Engine:
+    ENGINES[engine.name] = engine
+    return engine
+
+
+def get_engine(name: str = DEFAULT_ENGINE) -> Engine:
+    if name == "jit" and name not in ENGINES and not _register_jit():
+        print(
+            "Warning: numba is not installed, using the numpy engine instead",
+            file=sys.stderr,
+        )
+        name = DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name}")
+    return ENGINES[name]
+
+
+def _register_jit() -> bool:
+    # importing numba takes longer than most alignments, so the jit engine
+    # is only registered once it is asked for
+    from . import jit
+
+    if jit.numba is None:
+        return False
+    register_engine(
+        Engine(
+            "jit",
+            score={"linear": jit.score_linear_jit, "affine": jit.score_affine_jit},
+            cost={
+                "linear": jit.calc_cost_linear_jit,
+                "affine": jit.calc_cost_affine_jit,
+            },
+            trace={"linear": trace_linear, "affine": trace_affine},
+        )
+    )
+    return True
+
+
+def _reference_score(kernel: Callable) -> Callable:
+    # the full matrix is always filled, max_cost only filters the result
+    def score(
+        seq1: str,
+        seq2: str,
+        scheme: ScoringScheme | None = None,
+        max_cost: int | None = None,
+    ) -> int | None:
+        costs = kernel(seq1, seq2, scheme)
+        score = (costs[0] if isinstance(costs, tuple) else costs)[-1, -1]
+        return None if max_cost is not None and score > max_cost else score
+
+    return score
+
+
+register_engine(
+    Engine(
+        "reference",
+        score={
+            "linear": _reference_score(calc_cost_linear_reference),
+            "affine": _reference_score(calc_cost_affine_reference),
+        },
+        cost={
+            "linear": calc_cost_linear_reference,
+            "affine": calc_cost_affine_reference,
+        },
+        trace={"linear": trace_linear, "affine": trace_affine},
+    )
+)
+register_engine(
+    Engine(
+        "numpy",
+        score={"linear": score_linear, "affine": score_affine},
+        cost={"linear": calc_cost_linear, "affine": calc_cost_affine},
+        scratch=True,
+    )
+)
+ENGINE_NAMES = ("reference", "numpy", "jit")
@@ -1,22 +1,201 @@
+import random
+from typing import Iterator
+
 import numpy as np
 
-from .constants import BASE_DECODE, GAPEXTEND, GAPOPEN, SCORE_MATRIX
+from .alignment import Alignment
+from .cache import cached
+from .constants import (
+    TRACE_D_EXTEND,
+    TRACE_D_OPEN,
+    TRACE_DIAG,
+    TRACE_I_EXTEND,
+    TRACE_I_OPEN,
+    TRACE_LEFT,
+    TRACE_UP,
+)
+from .dag import AlignmentDAG, build_dag
+from .helpers import cost_cutoff, select_dtype, sentinel
+from .profiling import PROFILER
+from .scoring import ScoringScheme, default_scheme
+from .scratch import allocate_matrix
 
 
+@cached("pairwise_affine")
 def pairwise_alignment_affine(
-    seq1: str, seq2: str
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
 ) -> tuple[np.ndarray, list[tuple[str, str]]]:
-    S = calc_cost_affine(seq1, seq2)
-    alignments = backtrack_affine(S, seq1, seq2)
+    S, _, _, T = calc_cost_affine(seq1, seq2, traceback=True, scheme=scheme)
+    alignments = backtrack_affine(T, seq1, seq2)
     return S, alignments
 
 
-def calc_cost_affine(seq1: str, seq2: str) -> np.ndarray:
+def calc_cost_affine(
+    seq1: str,
+    seq2: str,
+    traceback: bool = False,
+    scheme: ScoringScheme | None = None,
+    scratch_dir: str | None = None,
+) -> tuple[np.ndarray, ...]:
+    # encode both sequences once, each row of the score matrix is a single gather
+    scheme = scheme or default_scheme()
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
     seq1_length, seq2_length = len(seq1) + 1, len(seq2) + 1
 
-    S = np.full((seq1_length, seq2_length), float("inf"))
-    D = np.full((seq1_length, seq2_length), float("inf"))
-    I = np.full((seq1_length, seq2_length), float("inf"))
+    # with scratch_dir the matrices are memory mapped files, every row is
+    # written once and in order so they stream to disk sequentially
+    dtype = select_dtype(seq1_length, seq2_length, scheme)
+    shape = (seq1_length, seq2_length)
+    S, D, I = (allocate_matrix(shape, dtype, scratch_dir) for _ in range(3))
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(seq2_length, dtype=dtype) * gap_extend
+
+    # first row can only be reached by insertions
+    D[0] = sentinel(dtype)
+    I[0, 0] = sentinel(dtype)
+    I[0, 1:] = gap_open + steps[1:]
+    S[0, 0] = 0
+    S[0, 1:] = I[0, 1:]
+
+    # optionally record the optimal transitions of every cell as bits
+    T = None
+    if traceback:
+        T = allocate_matrix(shape, np.uint8, scratch_dir)
+        T[0, 0] = 0
+        T[0, 1:] = (
+            TRACE_LEFT
+            | (I[0, 1:] == S[0, :-1] + gap_open + gap_extend) * TRACE_I_OPEN
+            | (I[0, 1:] == I[0, :-1] + gap_extend) * TRACE_I_EXTEND
+        )
+
+    # fill S, D, I row by row
+    for i in range(1, seq1_length):
+        fill_row_affine(
+            S[i - 1],
+            D[i - 1],
+            S[i],
+            D[i],
+            I[i],
+            profile[seq1_codes[i - 1]],
+            steps,
+            gap_open,
+            gap_extend,
+            None if T is None else T[i],
+        )
+    return (S, D, I) if T is None else (S, D, I, T)
+
+
+def fill_row_affine(
+    prev_S: np.ndarray,
+    prev_D: np.ndarray,
+    S: np.ndarray,
+    D: np.ndarray,
+    I: np.ndarray,
+    match_costs: np.ndarray,
+    steps: np.ndarray,
+    gap_open: int,
+    gap_extend: int,
+    trace_row: np.ndarray | None = None,
+) -> None:
+    # calc D(i, :) from the previous row
+    D[:] = np.minimum(prev_S + gap_open + gap_extend, prev_D + gap_extend)
+
+    # best score without ending in an insertion, rows may also be stacked
+    # along a leading axis to fill a batch of matrices at once
+    V = D.copy()
+    V[..., 1:] = np.minimum(V[..., 1:], prev_S[..., :-1] + match_costs)
+
+    # calc I(i, :) with a running minimum, opening a gap after an insertion
+    # is never better than extending it as long as gap_open >= 0
+    I[..., 0] = sentinel(I.dtype)
+    I[..., 1:] = (
+        np.minimum.accumulate(V[..., :-1] - steps[:-1], axis=-1) + gap_open + steps[1:]
+    )
+    S[:] = np.minimum(V, I)
+
+    if trace_row is not None:
+        trace_row[:] = (
+            (S == D) * TRACE_UP
+            | (S == I) * TRACE_LEFT
+            | (D == prev_S + gap_open + gap_extend) * TRACE_D_OPEN
+            | (D == prev_D + gap_extend) * TRACE_D_EXTEND
+        )
+        trace_row[1:] = (
+            trace_row[1:]
+            | (S[1:] == prev_S[:-1] + match_costs) * TRACE_DIAG
+            | (I[1:] == S[:-1] + gap_open + gap_extend) * TRACE_I_OPEN
+            | (I[1:] == I[:-1] + gap_extend) * TRACE_I_EXTEND
+        )
+
+
+def score_affine(
+    seq1: str,
+    seq2: str,
+    scheme: ScoringScheme | None = None,
+    max_cost: int | None = None,
+) -> float | None:
+    # None once the cost is certain to exceed max_cost
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    # run along the shorter sequence so only a few short rows are kept in memory
+    if len(seq2_codes) > len(seq1_codes):
+        seq1_codes, seq2_codes = seq2_codes, seq1_codes
+        scheme = scheme.transposed()
+
+    last_rows = last_rows_affine(seq1_codes, seq2_codes, scheme, max_cost=max_cost)
+    if last_rows is None or max_cost is not None and last_rows[0][-1] > max_cost:
+        return None
+    return last_rows[0][-1]
+
+
+def last_rows_affine(
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    gap_start: int | None = None,
+    max_cost: int | None = None,
+) -> tuple[np.ndarray, np.ndarray] | None:
+    # last rows of S and D, gap_start is the opening cost of a deletion
+    # in the first column (0 when it continues a gap from a previous block),
+    # with max_cost the fill stops early (None) once no path can stay within it
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    dtype = select_dtype(len(seq1_codes) + 1, len(seq2_codes) + 1, scheme)
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(len(seq2_codes) + 1, dtype=dtype) * gap_extend
+    prev_S, prev_D = gap_open + steps, np.full(len(steps), sentinel(dtype), dtype=dtype)
+    prev_S[0], prev_D[0] = 0, gap_open if gap_start is None else gap_start
+    S, D, I = np.empty_like(steps), np.empty_like(steps), np.empty_like(steps)
+    # S is the minimum over all states, a gap left open in D may continue
+    # without paying gap_open again, so only gap_extend is assumed per step
+    above = None
+    if max_cost is not None:
+        above = cost_cutoff(
+            len(seq1_codes), len(seq2_codes), gap_extend, max_cost, scheme, dtype
+        )
+    for s1_idx, code in enumerate(seq1_codes, 1):
+        fill_row_affine(
+            prev_S, prev_D, S, D, I, profile[code], steps, gap_open, gap_extend
+        )
+        prev_S, S = S, prev_S
+        prev_D, D = D, prev_D
+        if above is not None and above(prev_S, s1_idx):
+            return None
+    return prev_S, prev_D
+
+
+def calc_cost_affine_reference(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    scheme = scheme or default_scheme()
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    seq1_length, seq2_length = len(seq1) + 1, len(seq2) + 1
+
+    dtype = select_dtype(seq1_length, seq2_length, scheme)
+    S = np.full((seq1_length, seq2_length), sentinel(dtype), dtype=dtype)
+    D = np.full((seq1_length, seq2_length), sentinel(dtype), dtype=dtype)
+    I = np.full((seq1_length, seq2_length), sentinel(dtype), dtype=dtype)
     S[0, 0] = 0
 
     # fill S, D, I row by row
@@ -26,9 +205,7 @@ def calc_cost_affine(seq1: str, seq2: str) -> np.ndarray:
                 continue
 
             if i > 0 and j > 0:
-                match_score = SCORE_MATRIX[
-                    BASE_DECODE[seq1[i - 1].upper()], BASE_DECODE[seq2[j - 1].upper()]
-                ]
+                match_score = scheme.matrix[seq1_codes[i - 1], seq2_codes[j - 1]]
                 s_match = S[i - 1, j - 1] + match_score
 
             # calc D(i,j)
@@ -36,7 +213,7 @@ def calc_cost_affine(seq1: str, seq2: str) -> np.ndarray:
                 d_scores = []
                 if j >= 0:
                     d_scores.extend(
-                        [S[i - 1, j] + GAPOPEN + GAPEXTEND, D[i - 1, j] + GAPEXTEND]
+                        [S[i - 1, j] + gap_open + gap_extend, D[i - 1, j] + gap_extend]
                     )
                 if d_scores:
                     D[i, j] = min(d_scores)
@@ -46,7 +223,7 @@ def calc_cost_affine(seq1: str, seq2: str) -> np.ndarray:
                 i_scores = []
                 if i >= 0:
                     i_scores.extend(
-                        [S[i, j - 1] + GAPOPEN + GAPEXTEND, I[i, j - 1] + GAPEXTEND]
+                        [S[i, j - 1] + gap_open + gap_extend, I[i, j - 1] + gap_extend]
                     )
                 if i_scores:
                     I[i, j] = min(i_scores)
@@ -61,65 +238,210 @@ def calc_cost_affine(seq1: str, seq2: str) -> np.ndarray:
                 s_scores.append(I[i, j])
             if s_scores:
                 S[i, j] = min(s_scores)
-    return S
-
-
-def backtrack_affine(S: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
-    s1_idx, s2_idx = len(seq1), len(seq2)
-    align1 = align2 = ""
-    results = []
-
-    def trace_alignments(s1_idx, s2_idx, align1, align2):
-        # check if we have depleted our indexes, save the two alignments
-        if s1_idx == s2_idx == 0:
-            results.append((align1, align2))
-            return
-
-        curr_score = S[s1_idx, s2_idx]
-        # check if we found a match/mismatch -> add recursive call to stack
-        if (
-            s1_idx > 0
-            and s2_idx > 0
-            and curr_score
-            == S[s1_idx - 1, s2_idx - 1]
-            + SCORE_MATRIX[
-                BASE_DECODE[seq1[s1_idx - 1].upper()],
-                BASE_DECODE[seq2[s2_idx - 1].upper()],
-            ]
-        ):
-            trace_alignments(
-                s1_idx - 1,
-                s2_idx - 1,
-                seq1[s1_idx - 1] + align1,
-                seq2[s2_idx - 1] + align2,
-            )
-
-        # try deletion(s) and insertion(s)
-        k = 1
-        while s1_idx >= k or s2_idx >= k:
-            # check if we found deletion(s) -> add recursive call to stack
-            if s1_idx >= k and curr_score == S[s1_idx - k, s2_idx] + GAPOPEN + (
-                k * GAPEXTEND
-            ):
-                trace_alignments(
-                    s1_idx - k,
-                    s2_idx,
-                    seq1[s1_idx - k : s1_idx] + align1,
-                    "-" * k + align2,
-                )
-
-            # check if we found insertion(s) -> add recursive call to stack
-            if s2_idx >= k and curr_score == S[s1_idx, s2_idx - k] + GAPOPEN + (
-                k * GAPEXTEND
-            ):
-                trace_alignments(
-                    s1_idx,
-                    s2_idx - k,
-                    "-" * k + align1,
-                    seq2[s2_idx - k : s2_idx] + align2,
-                )
-
-            k += 1
-
-    trace_alignments(s1_idx, s2_idx, align1, align2)
-    return results
+    return S, D, I
+
+
+def trace_affine(
+    S: np.ndarray,
+    D: np.ndarray,
+    I: np.ndarray,
+    seq1: str,
+    seq2: str,
+    scheme: ScoringScheme | None = None,
+) -> np.ndarray:
+    # traceback bits of filled S, D and I matrices, the same bits the fill records
+    scheme = scheme or default_scheme()
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    match_costs = scheme.matrix[scheme.encode(seq1)[:, None], scheme.encode(seq2)]
+    T = np.zeros(S.shape, dtype=np.uint8)
+    T[0, 1:] = (
+        TRACE_LEFT
+        | (I[0, 1:] == S[0, :-1] + gap_open + gap_extend) * TRACE_I_OPEN
+        | (I[0, 1:] == I[0, :-1] + gap_extend) * TRACE_I_EXTEND
+    )
+    T[1:] = (
+        (S[1:] == D[1:]) * TRACE_UP
+        | (S[1:] == I[1:]) * TRACE_LEFT
+        | (D[1:] == S[:-1] + gap_open + gap_extend) * TRACE_D_OPEN
+        | (D[1:] == D[:-1] + gap_extend) * TRACE_D_EXTEND
+    )
+    T[1:, 1:] = (
+        T[1:, 1:]
+        | (S[1:, 1:] == S[:-1, :-1] + match_costs) * TRACE_DIAG
+        | (I[1:, 1:] == S[1:, :-1] + gap_open + gap_extend) * TRACE_I_OPEN
+        | (I[1:, 1:] == I[1:, :-1] + gap_extend) * TRACE_I_EXTEND
+    )
+    return T
+
+
+def backtrack_affine(T: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
+    return list(iter_alignments_affine(T, seq1, seq2))
+
+
+def iter_alignments_affine(
+    T: np.ndarray, seq1: str, seq2: str, limit: int | None = None
+) -> Iterator[tuple[str, str]]:
+    # the gapped strings of every optimal alignment
+    for alignment in iter_transcripts_affine(T, seq1, seq2, limit):
+        yield alignment.render()
+
+
+def iter_transcripts_affine(
+    T: np.ndarray, seq1: str, seq2: str, limit: int | None = None
+) -> Iterator[Alignment]:
+    seq1, seq2 = str(seq1), str(seq2)
+    # alignments are built backwards as one operation per column in a shared
+    # buffer, every stack entry remembers the buffer depth it branched from
+    # and the S/D/I state it is in, state changes add an empty operation
+    ops = []
+    stack = [(len(seq1), len(seq2), "S", 0, "")]
+    produced = visited = 0
+
+    try:
+        while stack:
+            s1_idx, s2_idx, state, depth, op = stack.pop()
+            visited += 1
+            del ops[depth:]
+            ops.append(op)
+            depth += 1
+
+            # check if we have depleted our indexes, yield the alignment
+            if s1_idx == s2_idx == 0:
+                yield Alignment.from_ops(seq1, seq2, reversed(ops))
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+                continue
+
+            # moves are pushed in reverse so match/mismatch and gap openings
+            # are explored first
+            trace = T[s1_idx, s2_idx]
+            if state == "S":
+                if trace & TRACE_LEFT:
+                    stack.append((s1_idx, s2_idx, "I", depth, ""))
+                if trace & TRACE_UP:
+                    stack.append((s1_idx, s2_idx, "D", depth, ""))
+                if trace & TRACE_DIAG:
+                    stack.append((s1_idx - 1, s2_idx - 1, "S", depth, "M"))
+            elif state == "D":
+                if trace & TRACE_D_EXTEND:
+                    stack.append((s1_idx - 1, s2_idx, "D", depth, "D"))
+                if trace & TRACE_D_OPEN:
+                    stack.append((s1_idx - 1, s2_idx, "S", depth, "D"))
+            else:
+                if trace & TRACE_I_EXTEND:
+                    stack.append((s1_idx, s2_idx - 1, "I", depth, "I"))
+                if trace & TRACE_I_OPEN:
+                    stack.append((s1_idx, s2_idx - 1, "S", depth, "I"))
+    finally:
+        # counted once, the loop itself stays free of profiler calls
+        PROFILER.count("traceback_nodes", visited)
+
+
+def traceback_dag_affine(T: np.ndarray, seq1: str, seq2: str) -> AlignmentDAG:
+    # every optimal alignment at once, the S/D/I states of a cell are
+    # separate vertices joined by moves without an operation
+    def moves(vertex):
+        s1_idx, s2_idx, state = vertex
+        trace = T[s1_idx, s2_idx]
+        predecessors = []
+        if state == "S":
+            if trace & TRACE_DIAG:
+                predecessors.append(((s1_idx - 1, s2_idx - 1, "S"), "M"))
+            if trace & TRACE_UP:
+                predecessors.append(((s1_idx, s2_idx, "D"), ""))
+            if trace & TRACE_LEFT:
+                predecessors.append(((s1_idx, s2_idx, "I"), ""))
+        elif state == "D":
+            if trace & TRACE_D_OPEN:
+                predecessors.append(((s1_idx - 1, s2_idx, "S"), "D"))
+            if trace & TRACE_D_EXTEND:
+                predecessors.append(((s1_idx - 1, s2_idx, "D"), "D"))
+        else:
+            if trace & TRACE_I_OPEN:
+                predecessors.append(((s1_idx, s2_idx - 1, "S"), "I"))
+            if trace & TRACE_I_EXTEND:
+                predecessors.append(((s1_idx, s2_idx - 1, "I"), "I"))
+        return predecessors
+
+    return build_dag(moves, seq1, seq2)
+
+
+def path_counts_affine(
+    T: np.ndarray,
+) -> tuple[list[list[int]], list[list[int]], list[list[int]]]:
+    # number of optimal paths from (0, 0) ending in each state of every cell
+    S_counts, D_counts, I_counts = (
+        [[0] * T.shape[1] for _ in range(T.shape[0])] for _ in range(3)
+    )
+    S_counts[0][0] = 1
+    for i, trace_row in enumerate(T.tolist()):
+        for j, trace in enumerate(trace_row):
+            if trace & TRACE_D_OPEN:
+                D_counts[i][j] += S_counts[i - 1][j]
+            if trace & TRACE_D_EXTEND:
+                D_counts[i][j] += D_counts[i - 1][j]
+            if trace & TRACE_I_OPEN:
+                I_counts[i][j] += S_counts[i][j - 1]
+            if trace & TRACE_I_EXTEND:
+                I_counts[i][j] += I_counts[i][j - 1]
+            if trace & TRACE_DIAG:
+                S_counts[i][j] += S_counts[i - 1][j - 1]
+            if trace & TRACE_UP:
+                S_counts[i][j] += D_counts[i][j]
+            if trace & TRACE_LEFT:
+                S_counts[i][j] += I_counts[i][j]
+    return S_counts, D_counts, I_counts
+
+
+def count_alignments_affine(T: np.ndarray) -> int:
+    return path_counts_affine(T)[0][-1][-1]
+
+
+def sample_alignment_affine(
+    T: np.ndarray,
+    seq1: str,
+    seq2: str,
+    counts: tuple[list[list[int]], ...] | None = None,
+    rng: random.Random = random,
+) -> tuple[str, str]:
+    # walk back from the end through the S/D/I states, picking every optimal
+    # transition proportional to its path count -> uniform over alignments
+    seq1, seq2 = str(seq1), str(seq2)
+    if counts is None:
+        counts = path_counts_affine(T)
+    S_counts, D_counts, I_counts = counts
+
+    align1, align2 = [], []
+    s1_idx, s2_idx, state = len(seq1), len(seq2), "S"
+    while s1_idx or s2_idx:
+        trace = T[s1_idx, s2_idx]
+        if state == "S":
+            pick = rng.randrange(S_counts[s1_idx][s2_idx])
+            if trace & TRACE_DIAG:
+                pick -= S_counts[s1_idx - 1][s2_idx - 1]
+                if pick < 0:
+                    s1_idx, s2_idx = s1_idx - 1, s2_idx - 1
+                    align1.append(seq1[s1_idx])
+                    align2.append(seq2[s2_idx])
+                    continue
+            if trace & TRACE_UP:
+                pick -= D_counts[s1_idx][s2_idx]
+            state = "D" if pick < 0 else "I"
+        elif state == "D":
+            pick = rng.randrange(D_counts[s1_idx][s2_idx])
+            if trace & TRACE_D_OPEN:
+                pick -= S_counts[s1_idx - 1][s2_idx]
+            state = "S" if pick < 0 else "D"
+            s1_idx -= 1
+            align1.append(seq1[s1_idx])
+            align2.append("-")
+        else:
+            pick = rng.randrange(I_counts[s1_idx][s2_idx])
+            if trace & TRACE_I_OPEN:
+                pick -= S_counts[s1_idx][s2_idx - 1]
+            state = "S" if pick < 0 else "I"
+            s2_idx -= 1
+            align1.append("-")
+            align2.append(seq2[s2_idx])
+    return "".join(reversed(align1)), "".join(reversed(align2))
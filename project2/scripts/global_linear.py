@@ -1,76 +1,303 @@
+import random
+from typing import Iterator
+
 import numpy as np
 
-from .constants import BASE_DECODE, GAPOPEN, SCORE_MATRIX
-from .helpers import init_C
+from .alignment import Alignment
+from .cache import cached
+from .constants import TRACE_DIAG, TRACE_LEFT, TRACE_UP
+from .dag import AlignmentDAG, build_dag
+from .helpers import cost_cutoff, init_C, select_dtype
+from .profiling import PROFILER
+from .scoring import ScoringScheme, default_scheme
+from .scratch import allocate_matrix
 
 
+@cached("pairwise_linear")
 def pairwise_alignment_linear(
-    seq1: str, seq2: str
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
 ) -> tuple[np.ndarray, list[tuple[str, str]]]:
-    C = calc_cost_linear(seq1, seq2)
-    alignments = backtrack_linear(C, seq1, seq2)
+    C, T = calc_cost_linear(seq1, seq2, traceback=True, scheme=scheme)
+    alignments = backtrack_linear(T, seq1, seq2)
     return C, alignments
 
 
-def calc_cost_linear(seq1: str, seq2: str) -> np.ndarray:
+def calc_cost_linear(
+    seq1: str,
+    seq2: str,
+    traceback: bool = False,
+    scheme: ScoringScheme | None = None,
+    scratch_dir: str | None = None,
+) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+    # encode both sequences once, each row of the score matrix is a single gather
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    seq1_length, seq2_length = len(seq1) + 1, len(seq2) + 1
+    dtype = select_dtype(seq1_length, seq2_length, scheme)
+    # with scratch_dir the matrices are memory mapped files, every row is
+    # written once and in order so they stream to disk sequentially
+    C = allocate_matrix((seq1_length, seq2_length), dtype, scratch_dir)
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(seq2_length, dtype=dtype) * scheme.gap_open
+    C[0] = steps
+
+    # optionally record the optimal moves of every cell as bits
+    T = None
+    if traceback:
+        T = allocate_matrix((seq1_length, seq2_length), np.uint8, scratch_dir)
+        T[0] = TRACE_LEFT
+        T[0, 0] = 0
+
+    # fill C row by row
+    for s1_idx in range(1, seq1_length):
+        C[s1_idx, 0] = s1_idx * scheme.gap_open
+        fill_row_linear(
+            C[s1_idx - 1],
+            C[s1_idx],
+            profile[seq1_codes[s1_idx - 1]],
+            steps,
+            scheme.gap_open,
+            None if T is None else T[s1_idx],
+        )
+    return C if T is None else (C, T)
+
+
+def fill_row_linear(
+    prev_row: np.ndarray,
+    row: np.ndarray,
+    match_costs: np.ndarray,
+    steps: np.ndarray,
+    gap_open: int,
+    trace_row: np.ndarray | None = None,
+) -> None:
+    # row[0] is expected to hold the first column value already, rows may
+    # also be stacked along a leading axis to fill a batch of matrices at once
+    row[..., 1:] = np.minimum(
+        prev_row[..., 1:] + gap_open,  # deletion
+        prev_row[..., :-1] + match_costs,  # match/mismatch
+    )
+    # insertion is resolved with a prefix minimum:
+    # C[i, j] = min_k(C'[i, k] + (j - k) * gap_open)
+    row[:] = np.minimum.accumulate(row - steps, axis=-1) + steps
+
+    if trace_row is not None:
+        trace_row[:] = (row == prev_row + gap_open) * TRACE_UP
+        trace_row[1:] = (
+            trace_row[1:]
+            | (row[1:] == prev_row[:-1] + match_costs) * TRACE_DIAG
+            | (row[1:] == row[:-1] + gap_open) * TRACE_LEFT
+        )
+
+
+def score_linear(
+    seq1: str,
+    seq2: str,
+    scheme: ScoringScheme | None = None,
+    max_cost: int | None = None,
+) -> float | None:
+    # None once the cost is certain to exceed max_cost
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    # run along the shorter sequence so only two short rows are kept in memory
+    if len(seq2_codes) > len(seq1_codes):
+        seq1_codes, seq2_codes = seq2_codes, seq1_codes
+        scheme = scheme.transposed()
+
+    last_row = last_row_linear(seq1_codes, seq2_codes, scheme, max_cost)
+    if last_row is None or max_cost is not None and last_row[-1] > max_cost:
+        return None
+    return last_row[-1]
+
+
+def last_row_linear(
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    max_cost: int | None = None,
+) -> np.ndarray | None:
+    # last row of C, only two rows are kept in memory, with max_cost the
+    # fill stops early (None) once no path can stay within it
+    dtype = select_dtype(len(seq1_codes) + 1, len(seq2_codes) + 1, scheme)
+    profile = scheme.profile(seq2_codes, dtype)
+    steps = np.arange(len(seq2_codes) + 1, dtype=dtype) * scheme.gap_open
+    prev_row, row = steps.copy(), np.empty_like(steps)
+    above = None
+    if max_cost is not None:
+        above = cost_cutoff(
+            len(seq1_codes), len(seq2_codes), scheme.gap_open, max_cost, scheme, dtype
+        )
+    for s1_idx, code in enumerate(seq1_codes, 1):
+        row[0] = s1_idx * scheme.gap_open
+        fill_row_linear(prev_row, row, profile[code], steps, scheme.gap_open)
+        prev_row, row = row, prev_row
+        if above is not None and above(prev_row, s1_idx):
+            return None
+    return prev_row
+
+
+def calc_cost_linear_reference(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> np.ndarray:
     # init C table based on sequences lengths
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
     seq1_length, seq2_length = len(seq1) + 1, len(seq2) + 1
-    C = init_C(seq1_length, seq2_length)
+    C = init_C(seq1_length, seq2_length, scheme)
 
     # fill C row by row
     for s1_idx in range(1, seq1_length):
         for s2_idx in range(1, seq2_length):
-            match_cost = SCORE_MATRIX[
-                BASE_DECODE[seq1[s1_idx - 1].upper()],
-                BASE_DECODE[seq2[s2_idx - 1].upper()],
-            ]
+            match_cost = scheme.matrix[seq1_codes[s1_idx - 1], seq2_codes[s2_idx - 1]]
             # chosse minimum cost for the three cases
             C[s1_idx, s2_idx] = min(
-                C[s1_idx - 1, s2_idx] + GAPOPEN,  # deletion
-                C[s1_idx, s2_idx - 1] + GAPOPEN,  # insertion
+                C[s1_idx - 1, s2_idx] + scheme.gap_open,  # deletion
+                C[s1_idx, s2_idx - 1] + scheme.gap_open,  # insertion
                 C[s1_idx - 1, s2_idx - 1] + match_cost,  # match/mismatch
             )
     return C
 
 
-def backtrack_linear(C: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
-    s1_idx, s2_idx = len(seq1), len(seq2)
-    align1 = align2 = ""
-    results = []
-
-    def trace_alignments(s1_idx, s2_idx, align1, align2):
-        # check if we have depleted our indexes, save the two alignments
-        if s1_idx == s2_idx == 0:
-            results.append((align1, align2))
-            return
-
-        # check if we found a match/mismatch -> add recursive call to stack
-        if (
-            s1_idx > 0
-            and s2_idx > 0
-            and C[s1_idx, s2_idx]
-            == C[s1_idx - 1, s2_idx - 1]
-            + SCORE_MATRIX[
-                BASE_DECODE[seq1[s1_idx - 1].upper()],
-                BASE_DECODE[seq2[s2_idx - 1].upper()],
-            ]
-        ):
-            trace_alignments(
-                s1_idx - 1,
-                s2_idx - 1,
-                seq1[s1_idx - 1] + align1,
-                seq2[s2_idx - 1] + align2,
-            )
-        # check if we found a deletion -> add recursive call to stack
-        if s1_idx > 0 and C[s1_idx - 1, s2_idx] + GAPOPEN == C[s1_idx, s2_idx]:
-            trace_alignments(
-                s1_idx - 1, s2_idx, seq1[s1_idx - 1] + align1, "-" + align2
-            )
-        # check if we found an insertion -> add recursive call to stack
-        if s2_idx > 0 and C[s1_idx, s2_idx - 1] + GAPOPEN == C[s1_idx, s2_idx]:
-            trace_alignments(
-                s1_idx, s2_idx - 1, "-" + align1, seq2[s2_idx - 1] + align2
-            )
+def trace_linear(
+    C: np.ndarray, seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> np.ndarray:
+    # traceback bits of a filled cost matrix, the same bits the fill records
+    scheme = scheme or default_scheme()
+    gap_open = scheme.gap_open
+    match_costs = scheme.matrix[scheme.encode(seq1)[:, None], scheme.encode(seq2)]
+    T = np.zeros(C.shape, dtype=np.uint8)
+    T[0, 1:] = TRACE_LEFT
+    T[1:] = (C[1:] == C[:-1] + gap_open) * TRACE_UP
+    T[1:, 1:] = (
+        T[1:, 1:]
+        | (C[1:, 1:] == C[:-1, :-1] + match_costs) * TRACE_DIAG
+        | (C[1:, 1:] == C[1:, :-1] + gap_open) * TRACE_LEFT
+    )
+    return T
 
-    trace_alignments(s1_idx, s2_idx, align1, align2)
-    return results
+
+def backtrack_linear(T: np.ndarray, seq1: str, seq2: str) -> list[tuple[str, str]]:
+    return list(iter_alignments_linear(T, seq1, seq2))
+
+
+def iter_alignments_linear(
+    T: np.ndarray, seq1: str, seq2: str, limit: int | None = None
+) -> Iterator[tuple[str, str]]:
+    # the gapped strings of every optimal alignment
+    for alignment in iter_transcripts_linear(T, seq1, seq2, limit):
+        yield alignment.render()
+
+
+def iter_transcripts_linear(
+    T: np.ndarray, seq1: str, seq2: str, limit: int | None = None
+) -> Iterator[Alignment]:
+    seq1, seq2 = str(seq1), str(seq2)
+    # alignments are built backwards as one operation per column in a shared
+    # buffer, every stack entry remembers the buffer depth it branched from
+    ops = []
+    stack = [(len(seq1), len(seq2), 0, "")]
+    produced = visited = 0
+
+    try:
+        while stack:
+            s1_idx, s2_idx, depth, op = stack.pop()
+            visited += 1
+            del ops[depth:]
+            ops.append(op)
+            depth += 1
+
+            # check if we have depleted our indexes, yield the alignment
+            if s1_idx == s2_idx == 0:
+                yield Alignment.from_ops(seq1, seq2, reversed(ops))
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+                continue
+
+            # moves are pushed in reverse so match/mismatch is explored first
+            trace = T[s1_idx, s2_idx]
+            if trace & TRACE_LEFT:
+                stack.append((s1_idx, s2_idx - 1, depth, "I"))
+            if trace & TRACE_UP:
+                stack.append((s1_idx - 1, s2_idx, depth, "D"))
+            if trace & TRACE_DIAG:
+                stack.append((s1_idx - 1, s2_idx - 1, depth, "M"))
+    finally:
+        # counted once, the loop itself stays free of profiler calls
+        PROFILER.count("traceback_nodes", visited)
+
+
+def traceback_dag_linear(T: np.ndarray, seq1: str, seq2: str) -> AlignmentDAG:
+    # every optimal alignment at once, sharing what they have in common
+    def moves(vertex):
+        s1_idx, s2_idx, _ = vertex
+        trace = T[s1_idx, s2_idx]
+        predecessors = []
+        if trace & TRACE_DIAG:
+            predecessors.append(((s1_idx - 1, s2_idx - 1, "S"), "M"))
+        if trace & TRACE_UP:
+            predecessors.append(((s1_idx - 1, s2_idx, "S"), "D"))
+        if trace & TRACE_LEFT:
+            predecessors.append(((s1_idx, s2_idx - 1, "S"), "I"))
+        return predecessors
+
+    return build_dag(moves, seq1, seq2)
+
+
+def path_counts_linear(T: np.ndarray) -> list[list[int]]:
+    # number of optimal paths from (0, 0) to every cell, as Python big ints
+    counts = [[0] * T.shape[1] for _ in range(T.shape[0])]
+    counts[0][0] = 1
+    for i, (row, trace_row) in enumerate(zip(counts, T.tolist())):
+        prev_row = counts[i - 1]
+        for j, trace in enumerate(trace_row):
+            count = row[j]
+            if trace & TRACE_DIAG:
+                count += prev_row[j - 1]
+            if trace & TRACE_UP:
+                count += prev_row[j]
+            if trace & TRACE_LEFT:
+                count += row[j - 1]
+            row[j] = count
+    return counts
+
+
+def count_alignments_linear(T: np.ndarray) -> int:
+    return path_counts_linear(T)[-1][-1]
+
+
+def sample_alignment_linear(
+    T: np.ndarray,
+    seq1: str,
+    seq2: str,
+    counts: list[list[int]] | None = None,
+    rng: random.Random = random,
+) -> tuple[str, str]:
+    # walk back from the end, picking every optimal move with probability
+    # proportional to the number of paths through it -> uniform over alignments
+    seq1, seq2 = str(seq1), str(seq2)
+    if counts is None:
+        counts = path_counts_linear(T)
+
+    align1, align2 = [], []
+    s1_idx, s2_idx = len(seq1), len(seq2)
+    while s1_idx or s2_idx:
+        pick = rng.randrange(counts[s1_idx][s2_idx])
+        trace = T[s1_idx, s2_idx]
+        if trace & TRACE_DIAG:
+            pick -= counts[s1_idx - 1][s2_idx - 1]
+            if pick < 0:
+                s1_idx, s2_idx = s1_idx - 1, s2_idx - 1
+                align1.append(seq1[s1_idx])
+                align2.append(seq2[s2_idx])
+                continue
+        if trace & TRACE_UP:
+            pick -= counts[s1_idx - 1][s2_idx]
+            if pick < 0:
+                s1_idx -= 1
+                align1.append(seq1[s1_idx])
+                align2.append("-")
+                continue
+        s2_idx -= 1
+        align1.append("-")
+        align2.append(seq2[s2_idx])
+    return "".join(reversed(align1)), "".join(reversed(align2))
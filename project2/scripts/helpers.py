@@ -1,28 +1,91 @@
 import os
-import random
+from typing import Callable, Iterable
 
 import numpy as np
-import pandas as pd
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
-
-from .constants import (
-    BASE_DECODE,
-    CHUNK_SIZE,
-    GAPEXTEND,
-    GAPOPEN,
-    SCORE_MATRIX_PATH,
-    WIDTH,
-)
-
-
-def init_C(seq1_length: int, seq2_length: int) -> np.ndarray:
-    C = np.zeros((seq1_length, seq2_length))
+
+from .alignment import WRITERS, Alignment, open_output, output_format
+from .constants import CHUNK_SIZE, WIDTH
+from .dag import AlignmentDAG
+from .scoring import ScoringScheme, default_scheme
+
+
+def select_dtype(
+    seq1_length: int, seq2_length: int, scheme: ScoringScheme | None = None
+) -> np.dtype:
+    # narrowest integer type that holds any alignment cost between the two
+    # sequences, with plenty of headroom left for the sentinel
+    scheme = scheme or default_scheme()
+    bound = (seq1_length + seq2_length) * scheme.max_step() + abs(scheme.gap_open)
+    for dtype in (np.int16, np.int32, np.int64):
+        if bound <= np.iinfo(dtype).max // 4:
+            return np.dtype(dtype)
+    raise OverflowError("Sequences are too long for 64 bit alignment costs")
+
+
+def sentinel(dtype: np.dtype) -> int:
+    # large but finite "infinity", adding a few costs to it cannot overflow
+    return int(np.iinfo(dtype).max // 2)
+
+
+def estimate_memory(
+    seq1_length: int,
+    seq2_length: int,
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+) -> int:
+    # peak bytes of the full matrices: C (or S, D, I) plus the traceback bits
+    cells = (seq1_length + 1) * (seq2_length + 1)
+    itemsize = select_dtype(seq1_length + 1, seq2_length + 1, scheme).itemsize
+    matrices = 1 if gap_model == "linear" else 3
+    return cells * (matrices * itemsize + np.dtype(np.uint8).itemsize)
+
+
+def cost_cutoff(
+    seq1_length: int,
+    seq2_length: int,
+    gap_step: int,
+    max_cost: int,
+    scheme: ScoringScheme,
+    dtype: np.dtype,
+) -> Callable[[np.ndarray, int], bool]:
+    # tells whether every cell of row i already exceeds max_cost once a lower
+    # bound on the rest of its path is added: the remaining lengths differ by
+    # |d|, which costs at least |d| gap steps, and substitutions can lower
+    # the cost by at most the most negative matrix entry per remaining row
+    n, m = seq1_length, seq2_length
+    # |d| of cell (i, j) is bounds[2n - i + j], so every row reads a slice
+    bounds = np.abs(np.arange(-(n + m), n + m + 1)).astype(dtype) * gap_step
+    reward = min(int(scheme.matrix.min()), 0)
+
+    def above(row: np.ndarray, i: int) -> bool:
+        start = 2 * n - i
+        lowest = int((row + bounds[start : start + m + 1]).min())
+        return lowest + reward * (n - i) > max_cost
+
+    return above
+
+
+def parse_size(size: str) -> int:
+    # "512M", "4G" or a plain number of bytes
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    size = size.strip().upper().removesuffix("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def init_C(
+    seq1_length: int, seq2_length: int, scheme: ScoringScheme | None = None
+) -> np.ndarray:
+    scheme = scheme or default_scheme()
+    C = np.zeros(
+        (seq1_length, seq2_length),
+        dtype=select_dtype(seq1_length, seq2_length, scheme),
+    )
     C[0, :] = range(seq2_length)
     C[:, 0] = range(seq1_length)
-    C[0, :] = C[0, :] * GAPOPEN
-    C[:, 0] = C[:, 0] * GAPOPEN
+    C[0, :] = C[0, :] * scheme.gap_open
+    C[:, 0] = C[:, 0] * scheme.gap_open
     return C
 
 
@@ -33,7 +96,37 @@ def format_seq(seq_str: str) -> str:
     return "".join(formatted_output)
 
 
-def format_output(seq1: str, seq2: str, costs: np.ndarray, results: list) -> str:
+def score_alignment(
+    align1: str,
+    align2: str,
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+) -> int:
+    scheme = scheme or default_scheme()
+    score, prev_gap = 0, None
+    for char1, char2 in zip(align1, align2):
+        # track which sequence the current gap is in to charge gap openings
+        gap = "insertion" if char1 == "-" else "deletion" if char2 == "-" else None
+        if gap is None:
+            code1, code2 = scheme.encode(char1 + char2)
+            score += scheme.matrix[code1, code2]
+        elif gap_model == "linear":
+            score += scheme.gap_open
+        else:
+            score += scheme.gap_extend + (scheme.gap_open if gap != prev_gap else 0)
+        prev_gap = gap
+    return int(score)
+
+
+def format_output(
+    seq1: str,
+    seq2: str,
+    score: float,
+    results: Iterable[tuple[str, str]],
+    optimal_count: int | None = None,
+    scheme: ScoringScheme | None = None,
+) -> str:
+    scheme = scheme or default_scheme()
     separator = "-" * WIDTH + "\n"
     output = []
     output.append("```\n")
@@ -46,16 +139,21 @@ def format_output(seq1: str, seq2: str, costs: np.ndarray, results: list) -> str
     output.append(separator)
 
     output.append("Alignment Statistics:\n\n")
-    output.append(f"Gap open cost: {GAPOPEN}\n")
-    output.append(f"Gap extend cost: {GAPEXTEND}\n")
-    df = pd.read_csv(SCORE_MATRIX_PATH)
-    df.index = BASE_DECODE.keys()
-    output.append(f"Score matrix:\n{df}\n")
-    output.append(f"Maximum alignment score: {int(costs[len(seq1), len(seq2)])}\n")
+    output.append(f"Gap open cost: {scheme.gap_open}\n")
+    output.append(f"Gap extend cost: {scheme.gap_extend}\n")
+    output.append(f"Score matrix:\n{format_matrix(scheme.matrix, scheme.alphabet)}\n")
+    output.append(f"Maximum alignment score: {int(score)}\n")
+    if optimal_count is not None:
+        output.append(f"Number of optimal alignments: {optimal_count:,}\n")
     output.append(separator)
 
-    align1, align2 = results[random.randint(0, len(results) - 1)]
-    output.append("Random Optimal Alignment:\n\n")
+    # only the first alignment is taken, so a lazy iterator is never exhausted,
+    # with a known count it is a uniformly sampled one
+    align1, align2 = next(iter(results))
+    if optimal_count is not None:
+        output.append("Random Optimal Alignment:\n\n")
+    else:
+        output.append("Optimal Alignment:\n\n")
     output.append(f"Aligned sequence 1 ({len(seq1)} bp):\n{format_seq(align1)}\n")
     output.append(f"Aligned sequence 2 ({len(seq2)} bp):\n{format_seq(align2)}\n")
     output.append(separator)
@@ -63,27 +161,54 @@ def format_output(seq1: str, seq2: str, costs: np.ndarray, results: list) -> str
     return "".join(output)
 
 
+def format_matrix(matrix: np.ndarray, labels: str) -> str:
+    # same layout as printing a labelled pandas DataFrame, without importing
+    # pandas on every run: integers keep a column for the sign, row labels
+    # are left aligned and the columns right aligned
+    cells = [[f"{value: d}" for value in row] for row in matrix.tolist()]
+    widths = [
+        max(len(label), *(len(row[col]) for row in cells))
+        for col, label in enumerate(labels)
+    ]
+    label_width = max(map(len, labels))
+    lines = [
+        " " * label_width
+        + "".join(f" {label:>{width}}" for label, width in zip(labels, widths))
+    ]
+    for label, row in zip(labels, cells):
+        lines.append(
+            f"{label:<{label_width}}"
+            + "".join(f" {cell:>{width}}" for cell, width in zip(row, widths))
+        )
+    return "\n".join(lines)
+
+
 def read_sequence(path: str) -> str:
-    try:
-        return getattr(SeqIO.read(path, "fasta"), "seq", "")
-    except FileNotFoundError:
+    # a sequence given on the command line never imports Biopython
+    if not os.path.exists(path):
         return path
+    from Bio import SeqIO
+
+    return getattr(SeqIO.read(path, "fasta"), "seq", "")
 
 
 def read_sequences(fasta_path: str) -> dict:
-    return {record.id: str(record.seq) for record in SeqIO.parse(fasta_path, "fasta")}
+    from Bio import SeqIO
 
+    return {record.id: str(record.seq) for record in SeqIO.parse(fasta_path, "fasta")}
 
-def save_result(results: list[tuple[str, str]], output_path: str) -> None:
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    records = []
-    for idx, (seq1, seq2) in enumerate(results, 1):
-        record1 = SeqRecord(
-            Seq(seq1), id=f"alignment_{idx}_seq1", description="First sequence"
-        )
-        record2 = SeqRecord(
-            Seq(seq2), id=f"alignment_{idx}_seq2", description="Second sequence"
-        )
-        records.extend([record1, record2])
-    SeqIO.write(records, output_path, "fasta")
+def save_result(
+    results: "AlignmentDAG | Iterable[Alignment | tuple[str, str]]", output_path: str
+) -> int:
+    # alignments are written as they are produced, as FASTA records or a
+    # CIGAR table picked by the extension, gzip compressed for a trailing .gz;
+    # a .dag file keeps the traceback DAG of the whole set instead
+    if output_format(output_path) == "dag":
+        if not isinstance(results, AlignmentDAG):
+            raise ValueError("A .dag output needs the full traceback, not alignments")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        results.save(output_path)
+        return results.count()
+    with open_output(output_path) as output:
+        return WRITERS[output_format(output_path)](output, results)
@@ -0,0 +1,179 @@
+import numpy as np
+
+from .global_affine import last_rows_affine
+from .global_linear import last_row_linear
+from .scoring import ScoringScheme, default_scheme
+
+
+def hirschberg_linear(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> tuple[str, str]:
+    scheme = scheme or default_scheme()
+    seq1, seq2 = str(seq1), str(seq2)
+    align1, align2 = [], []
+    _hirschberg_linear(
+        seq1, seq2, scheme.encode(seq1), scheme.encode(seq2), scheme, align1, align2
+    )
+    return "".join(align1), "".join(align2)
+
+
+def _hirschberg_linear(
+    seq1: str,
+    seq2: str,
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    align1: list,
+    align2: list,
+) -> None:
+    n, m = len(seq1), len(seq2)
+    # only insertions or deletions are left
+    if n == 0 or m == 0:
+        align1.append(seq1 + "-" * m)
+        align2.append("-" * n + seq2)
+        return
+
+    # a single character is either deleted or aligned to one of seq2
+    if n == 1:
+        match_costs = scheme.matrix[seq1_codes[0], seq2_codes]
+        j = int(np.argmin(match_costs))
+        if match_costs[j] + (m - 1) * scheme.gap_open <= (m + 1) * scheme.gap_open:
+            align1.append("-" * j + seq1 + "-" * (m - j - 1))
+            align2.append(seq2)
+        else:
+            align1.append(seq1 + "-" * m)
+            align2.append("-" + seq2)
+        return
+
+    # split seq1 in half, find where the optimal path crosses the middle row
+    mid = n // 2
+    forward = last_row_linear(seq1_codes[:mid], seq2_codes, scheme)
+    backward = last_row_linear(seq1_codes[: mid - 1 : -1], seq2_codes[::-1], scheme)
+    j = int(np.argmin(forward + backward[::-1]))
+
+    _hirschberg_linear(
+        seq1[:mid], seq2[:j], seq1_codes[:mid], seq2_codes[:j], scheme, align1, align2
+    )
+    _hirschberg_linear(
+        seq1[mid:], seq2[j:], seq1_codes[mid:], seq2_codes[j:], scheme, align1, align2
+    )
+
+
+def hirschberg_affine(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> tuple[str, str]:
+    scheme = scheme or default_scheme()
+    seq1, seq2 = str(seq1), str(seq2)
+    align1, align2 = [], []
+    _myers_miller(
+        seq1,
+        seq2,
+        scheme.encode(seq1),
+        scheme.encode(seq2),
+        scheme,
+        scheme.gap_open,
+        scheme.gap_open,
+        align1,
+        align2,
+    )
+    return "".join(align1), "".join(align2)
+
+
+def _myers_miller(
+    seq1: str,
+    seq2: str,
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    gap_start: int,
+    gap_end: int,
+    align1: list,
+    align2: list,
+) -> None:
+    # gap_start/gap_end are the opening costs of a deletion touching the
+    # top/bottom of this block, 0 if it continues a deletion of a neighbour
+    n, m = len(seq1), len(seq2)
+    if n == 0 or m == 0:
+        align1.append(seq1 + "-" * m)
+        align2.append("-" * n + seq2)
+        return
+
+    if n == 1:
+        # either align the character to one of seq2 or delete it next to
+        # a single insertion gap, on the side where the deletion is cheaper
+        match_costs = scheme.matrix[seq1_codes[0], seq2_codes]
+        gap_costs = [scheme.gap_cost(j) + scheme.gap_cost(m - j - 1) for j in range(m)]
+        j = int(np.argmin(match_costs + gap_costs))
+        delete_cost = min(gap_start, gap_end) + scheme.gap_extend + scheme.gap_cost(m)
+        if match_costs[j] + gap_costs[j] <= delete_cost:
+            align1.append("-" * j + seq1 + "-" * (m - j - 1))
+            align2.append(seq2)
+        elif gap_start <= gap_end:
+            align1.append(seq1 + "-" * m)
+            align2.append("-" + seq2)
+        else:
+            align1.append("-" * m + seq1)
+            align2.append(seq2 + "-")
+        return
+
+    # split seq1 in half, the optimal path either crosses the middle in S
+    # (type 1) or inside a deletion spanning rows mid and mid + 1 (type 2)
+    mid = n // 2
+    forward_S, forward_D = last_rows_affine(
+        seq1_codes[:mid], seq2_codes, scheme, gap_start
+    )
+    backward_S, backward_D = last_rows_affine(
+        seq1_codes[: mid - 1 : -1], seq2_codes[::-1], scheme, gap_end
+    )
+    type1 = forward_S + backward_S[::-1]
+    type2 = forward_D + backward_D[::-1] - scheme.gap_open
+    j1, j2 = int(np.argmin(type1)), int(np.argmin(type2))
+
+    if type1[j1] <= type2[j2]:
+        _myers_miller(
+            seq1[:mid],
+            seq2[:j1],
+            seq1_codes[:mid],
+            seq2_codes[:j1],
+            scheme,
+            gap_start,
+            scheme.gap_open,
+            align1,
+            align2,
+        )
+        _myers_miller(
+            seq1[mid:],
+            seq2[j1:],
+            seq1_codes[mid:],
+            seq2_codes[j1:],
+            scheme,
+            scheme.gap_open,
+            gap_end,
+            align1,
+            align2,
+        )
+    else:
+        _myers_miller(
+            seq1[: mid - 1],
+            seq2[:j2],
+            seq1_codes[: mid - 1],
+            seq2_codes[:j2],
+            scheme,
+            gap_start,
+            0,
+            align1,
+            align2,
+        )
+        align1.append(seq1[mid - 1 : mid + 1])
+        align2.append("--")
+        _myers_miller(
+            seq1[mid + 1 :],
+            seq2[j2:],
+            seq1_codes[mid + 1 :],
+            seq2_codes[j2:],
+            scheme,
+            0,
+            gap_end,
+            align1,
+            align2,
+        )
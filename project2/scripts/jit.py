@@ -0,0 +1,182 @@
+import numpy as np
+
+from .helpers import init_C, select_dtype, sentinel
+from .scoring import ScoringScheme, default_scheme
+
+try:
+    import numba
+except ImportError:  # optional, the registry falls back to the numpy engine
+    numba = None
+
+INF = 2**60  # "infinity" of the int64 score-only kernels
+
+
+def _jit(func):
+    # compiled on first call and cached next to the module, plain Python otherwise
+    return numba.njit(cache=True, nogil=True)(func) if numba is not None else func
+
+
+@_jit
+def _score_linear_kernel(seq1_codes, seq2_codes, matrix, gap_open, max_cost):
+    # returns INF as soon as no cell of a row can stay within max_cost, see
+    # helpers.cost_cutoff for the lower bound on the rest of the path
+    n, m = len(seq1_codes), len(seq2_codes)
+    check, reward = max_cost < INF, min(matrix.min(), 0)
+    row = np.arange(m + 1) * gap_open
+    for i in range(1, n + 1):
+        diag, row[0] = row[0], i * gap_open
+        best = row[0] + abs(n - i - m) * gap_open
+        costs = matrix[seq1_codes[i - 1]]
+        for j in range(1, m + 1):
+            up = row[j]
+            row[j] = min(
+                up + gap_open, diag + costs[seq2_codes[j - 1]], row[j - 1] + gap_open
+            )
+            diag = up
+            if check:
+                best = min(best, row[j] + abs(n - i - m + j) * gap_open)
+        if check and best + reward * (n - i) > max_cost:
+            return INF
+    return row[m]
+
+
+@_jit
+def _score_affine_kernel(
+    seq1_codes, seq2_codes, matrix, gap_open, gap_extend, max_cost
+):
+    # S and D of the previous row are overwritten in place, I is a scalar,
+    # a gap left open may continue so only gap_extend counts in the bound
+    n, m = len(seq1_codes), len(seq2_codes)
+    check, reward = max_cost < INF, min(matrix.min(), 0)
+    S = gap_open + np.arange(m + 1) * gap_extend
+    S[0] = 0
+    D = np.full(m + 1, INF)
+    for i in range(1, n + 1):
+        diag = S[0]
+        D[0] = min(S[0] + gap_open + gap_extend, D[0] + gap_extend)
+        S[0], I = D[0], INF
+        best = S[0] + abs(n - i - m) * gap_extend
+        costs = matrix[seq1_codes[i - 1]]
+        for j in range(1, m + 1):
+            d = min(S[j] + gap_open + gap_extend, D[j] + gap_extend)
+            I = min(S[j - 1] + gap_open + gap_extend, I + gap_extend)
+            diag, S[j] = S[j], min(diag + costs[seq2_codes[j - 1]], d, I)
+            D[j] = d
+            if check:
+                best = min(best, S[j] + abs(n - i - m + j) * gap_extend)
+        if check and best + reward * (n - i) > max_cost:
+            return INF
+    return S[m]
+
+
+@_jit
+def _fill_linear_kernel(C, seq1_codes, seq2_codes, matrix, gap_open):
+    # C comes with its first row and column initialized
+    for i in range(1, C.shape[0]):
+        costs = matrix[seq1_codes[i - 1]]
+        for j in range(1, C.shape[1]):
+            C[i, j] = min(
+                C[i - 1, j] + gap_open,
+                C[i, j - 1] + gap_open,
+                C[i - 1, j - 1] + costs[seq2_codes[j - 1]],
+            )
+
+
+@_jit
+def _fill_affine_kernel(S, D, I, seq1_codes, seq2_codes, matrix, gap_open, gap_extend):
+    # S, D and I come filled with the sentinel and S[0, 0] = 0
+    for j in range(1, S.shape[1]):
+        I[0, j] = min(S[0, j - 1] + gap_open + gap_extend, I[0, j - 1] + gap_extend)
+        S[0, j] = I[0, j]
+    for i in range(1, S.shape[0]):
+        D[i, 0] = min(S[i - 1, 0] + gap_open + gap_extend, D[i - 1, 0] + gap_extend)
+        S[i, 0] = D[i, 0]
+        costs = matrix[seq1_codes[i - 1]]
+        for j in range(1, S.shape[1]):
+            D[i, j] = min(S[i - 1, j] + gap_open + gap_extend, D[i - 1, j] + gap_extend)
+            I[i, j] = min(S[i, j - 1] + gap_open + gap_extend, I[i, j - 1] + gap_extend)
+            S[i, j] = min(S[i - 1, j - 1] + costs[seq2_codes[j - 1]], D[i, j], I[i, j])
+
+
+def score_linear_jit(
+    seq1: str,
+    seq2: str,
+    scheme: ScoringScheme | None = None,
+    max_cost: int | None = None,
+) -> int | None:
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    # run along the shorter sequence, the row is the only memory used
+    if len(seq2_codes) > len(seq1_codes):
+        seq1_codes, seq2_codes = seq2_codes, seq1_codes
+        scheme = scheme.transposed()
+    score = _score_linear_kernel(
+        seq1_codes, seq2_codes, scheme.matrix, scheme.gap_open, _cutoff(max_cost)
+    )
+    return _within(score, max_cost)
+
+
+def score_affine_jit(
+    seq1: str,
+    seq2: str,
+    scheme: ScoringScheme | None = None,
+    max_cost: int | None = None,
+) -> int | None:
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    if len(seq2_codes) > len(seq1_codes):
+        seq1_codes, seq2_codes = seq2_codes, seq1_codes
+        scheme = scheme.transposed()
+    score = _score_affine_kernel(
+        seq1_codes,
+        seq2_codes,
+        scheme.matrix,
+        scheme.gap_open,
+        scheme.gap_extend,
+        _cutoff(max_cost),
+    )
+    return _within(score, max_cost)
+
+
+def _cutoff(max_cost: int | None) -> int:
+    return INF if max_cost is None else int(max_cost)
+
+
+def _within(score: int, max_cost: int | None) -> int | None:
+    if max_cost is not None and score > max_cost:
+        return None
+    return int(score)
+
+
+def calc_cost_linear_jit(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> np.ndarray:
+    scheme = scheme or default_scheme()
+    C = init_C(len(seq1) + 1, len(seq2) + 1, scheme)
+    _fill_linear_kernel(
+        C, scheme.encode(seq1), scheme.encode(seq2), scheme.matrix, scheme.gap_open
+    )
+    return C
+
+
+def calc_cost_affine_jit(
+    seq1: str, seq2: str, scheme: ScoringScheme | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    scheme = scheme or default_scheme()
+    shape = (len(seq1) + 1, len(seq2) + 1)
+    dtype = select_dtype(*shape, scheme)
+    S = np.full(shape, sentinel(dtype), dtype=dtype)
+    D = np.full(shape, sentinel(dtype), dtype=dtype)
+    I = np.full(shape, sentinel(dtype), dtype=dtype)
+    S[0, 0] = 0
+    _fill_affine_kernel(
+        S,
+        D,
+        I,
+        scheme.encode(seq1),
+        scheme.encode(seq2),
+        scheme.matrix,
+        scheme.gap_open,
+        scheme.gap_extend,
+    )
+    return S, D, I
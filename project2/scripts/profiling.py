@@ -0,0 +1,117 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, Iterator, TextIO
+
+PHASES = ("read", "fill", "traceback", "score_matrices", "format", "write")
+PROFILE_TOP = 25  # functions listed from the cProfile of the hot phase
+
+_DISABLED = nullcontext()
+
+
+class Profiler:
+    # wall time per phase and counters of the work done in it, every call is
+    # a single attribute check while disabled so the hot paths pay nothing
+    def __init__(self, enabled: bool = False, cprofile_phase: str | None = None):
+        self.enabled = enabled
+        self.cprofile_phase = cprofile_phase
+        self.phases = {}
+        self.counters = {}
+        self.stats = None
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        profile = cProfile.Profile() if name == self.cprofile_phase else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._add_stats(profile)
+            # repeated phases (e.g. one per gap model) accumulate
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def count(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def counted(self, name: str, items: Iterable) -> Iterable:
+        # items passed through lazily, counted as they are consumed
+        if not self.enabled:
+            return items
+        return self._counted(name, items)
+
+    def _counted(self, name: str, items: Iterable) -> Iterator:
+        for item in items:
+            self.count(name)
+            yield item
+
+    def report(self) -> dict:
+        total = sum(self.phases.values())
+        return {
+            "total_seconds": total,
+            "phases": {
+                name: {
+                    "seconds": seconds,
+                    "fraction": seconds / total if total else 0.0,
+                }
+                for name, seconds in self.phases.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, path: str | None = None) -> None:
+        # JSON breakdown to a file, or to stderr to keep stdout for the results
+        report = json.dumps(self.report(), indent=2)
+        if path and path != "-":
+            with open(path, "w") as f:
+                f.write(report + "\n")
+        else:
+            print(report, file=sys.stderr)
+        if self.stats is not None:
+            self.print_stats(sys.stderr)
+
+    def print_stats(self, output: TextIO, top: int = PROFILE_TOP) -> None:
+        print(f"cProfile of the {self.cprofile_phase} phase:", file=output)
+        buffer = io.StringIO()
+        self.stats.stream = buffer
+        self.stats.sort_stats("cumulative").print_stats(top)
+        output.write(buffer.getvalue())
+
+    def clear(self) -> None:
+        self.phases.clear()
+        self.counters.clear()
+        self.stats = None
+
+    def _add_stats(self, profile: cProfile.Profile) -> None:
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+
+PROFILER = Profiler()
+
+
+def configure_profiler(
+    enabled: bool = False, cprofile_phase: str | None = None
+) -> Profiler:
+    # the cProfile hook only runs inside an enabled profiler
+    PROFILER.enabled = enabled or cprofile_phase is not None
+    PROFILER.cprofile_phase = cprofile_phase
+    PROFILER.clear()
+    return PROFILER
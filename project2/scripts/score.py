@@ -0,0 +1,48 @@
+from .banded import banded_score
+from .cache import cached
+from .engines import DEFAULT_ENGINE, get_engine
+from .global_affine import iter_alignments_affine
+from .global_linear import iter_alignments_linear
+from .profiling import PROFILER
+from .scoring import ScoringScheme
+
+
+@cached("score")
+def align_score(
+    seq1: str,
+    seq2: str,
+    gap_model: str = "linear",
+    band: int | str | None = None,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+    max_cost: int | None = None,
+) -> float | None:
+    # score-only alignment, no traceback so memory stays O(min(n, m)),
+    # None when the cost exceeds max_cost
+    if band is not None:
+        score = banded_score(seq1, seq2, gap_model, band, scheme)
+        return None if max_cost is not None and score > max_cost else score
+    return get_engine(engine).score(seq1, seq2, gap_model, scheme, max_cost)
+
+
+@cached("optimal_alignment")
+def optimal_alignment(
+    seq1: str,
+    seq2: str,
+    gap_model: str,
+    scheme: ScoringScheme | None = None,
+    engine: str = DEFAULT_ENGINE,
+) -> tuple[int, tuple[str, str]]:
+    # score and first optimal alignment, only the traceback bits are kept
+    with PROFILER.phase("fill"):
+        *costs, trace = get_engine(engine).cost(
+            seq1, seq2, gap_model, traceback=True, scheme=scheme
+        )
+    PROFILER.count("cells", len(seq1) * len(seq2))
+    with PROFILER.phase("traceback"):
+        if gap_model == "linear":
+            alignment = next(iter_alignments_linear(trace, seq1, seq2, limit=1))
+        else:
+            alignment = next(iter_alignments_affine(trace, seq1, seq2, limit=1))
+    PROFILER.count("alignments")
+    return int(costs[0][-1, -1]), alignment
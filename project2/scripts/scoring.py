@@ -0,0 +1,124 @@
+import csv
+import functools
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+PARAMETERS_DIR = Path(__file__).resolve().parent.parent / "parameters"
+UNKNOWN_CODE = 255  # lookup value of characters outside the alphabet
+
+
+class ScoringScheme:
+    # substitution costs over an arbitrary alphabet (DNA, IUPAC codes, BLOSUM
+    # or PAM for proteins) together with the gap costs, sequences are encoded
+    # to uint8 codes once so the kernels only gather from the matrix
+    def __init__(
+        self, alphabet: str, matrix: np.ndarray, gap_open: int, gap_extend: int
+    ):
+        matrix = np.array(matrix, dtype=np.int64)
+        if matrix.shape != (len(alphabet), len(alphabet)):
+            raise ValueError(
+                f"Score matrix of shape {matrix.shape} does not match the "
+                f"alphabet of {len(alphabet)} symbols"
+            )
+        if len(alphabet) >= UNKNOWN_CODE or len(set(alphabet.upper())) != len(alphabet):
+            raise ValueError(f"Invalid alphabet: {alphabet}")
+
+        matrix.flags.writeable = False
+        self.alphabet = alphabet.upper()
+        self.matrix = matrix
+        self.gap_open = int(gap_open)
+        self.gap_extend = int(gap_extend)
+
+        # both cases of a symbol share its code
+        self.lookup = np.full(256, UNKNOWN_CODE, dtype=np.uint8)
+        for code, symbol in enumerate(self.alphabet):
+            self.lookup[ord(symbol)] = self.lookup[ord(symbol.lower())] = code
+
+        self._matrices = {}
+        self._transposed = None
+
+        digest = hashlib.sha256()
+        digest.update(f"{self.alphabet}:{self.gap_open}:{self.gap_extend}:".encode())
+        digest.update(matrix.tobytes())
+        self.digest = digest.hexdigest()
+
+    @classmethod
+    def load(cls, parameters_dir: str | Path = PARAMETERS_DIR) -> "ScoringScheme":
+        # score_matrix.csv has the alphabet as header, rows may be labelled
+        parameters_dir = Path(parameters_dir)
+        with open(parameters_dir / "score_matrix.csv", newline="") as f:
+            rows = [
+                [cell.strip() for cell in row]
+                for row in csv.reader(f, skipinitialspace=True)
+                if row
+            ]
+        alphabet = "".join(symbol for symbol in rows[0] if symbol)
+        matrix = [
+            [int(cell) for cell in row[len(row) - len(alphabet) :]] for row in rows[1:]
+        ]
+        return cls(
+            alphabet,
+            matrix,
+            _read_cost(parameters_dir / "gapopen"),
+            _read_cost(parameters_dir / "gapextend"),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ScoringScheme(alphabet={self.alphabet!r}, gap_open={self.gap_open}, "
+            f"gap_extend={self.gap_extend}, digest={self.digest[:12]!r})"
+        )
+
+    def encode(self, seq: str) -> np.ndarray:
+        codes = self.lookup[np.frombuffer(str(seq).encode("latin-1"), dtype=np.uint8)]
+        if (codes == UNKNOWN_CODE).any():
+            unknown = sorted(
+                {char for char in str(seq) if char.upper() not in self.alphabet}
+            )
+            raise ValueError(f"Symbols not in the scoring alphabet: {''.join(unknown)}")
+        return codes
+
+    def decode(self, codes: np.ndarray) -> str:
+        symbols = np.frombuffer(self.alphabet.encode("latin-1"), dtype=np.uint8)
+        return symbols[codes].tobytes().decode("latin-1")
+
+    def score_matrix(self, dtype: np.dtype) -> np.ndarray:
+        # the matrix converted once per cost dtype
+        dtype = np.dtype(dtype)
+        if dtype not in self._matrices:
+            self._matrices[dtype] = self.matrix.astype(dtype)
+        return self._matrices[dtype]
+
+    def profile(self, query_codes: np.ndarray, dtype: np.dtype) -> np.ndarray:
+        # profile[c, j] is the cost of aligning symbol c to query_codes[j],
+        # so a whole row of the DP reads its costs with a single gather
+        return self.score_matrix(dtype)[:, query_codes]
+
+    def transposed(self) -> "ScoringScheme":
+        # the same scheme with the roles of the two sequences swapped
+        if self._transposed is None:
+            self._transposed = ScoringScheme(
+                self.alphabet, self.matrix.T, self.gap_open, self.gap_extend
+            )
+            self._transposed._transposed = self
+        return self._transposed
+
+    def max_step(self) -> int:
+        # largest cost a single column of an alignment can add
+        return max(int(np.abs(self.matrix).max()), self.gap_open + self.gap_extend)
+
+    def gap_cost(self, length: int) -> int:
+        return self.gap_open + length * self.gap_extend if length else 0
+
+
+def _read_cost(path: Path) -> int:
+    with open(path) as f:
+        return int(f.read())
+
+
+@functools.cache
+def default_scheme() -> ScoringScheme:
+    # parameters/ next to the package, independent of the working directory
+    return ScoringScheme.load()
@@ -0,0 +1,102 @@
+import math
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+TRACE_BLOCK_BYTES = 4 * 1024**2  # traceback rows copied to memory at once
+TRACE_BLOCKS = 4  # blocks kept, the walks revisit later rows when branching
+# RAM backed directory for matrices shared with worker processes, without
+# it they go to the default temporary directory
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def allocate_matrix(
+    shape: tuple[int, int], dtype: np.dtype, scratch_dir: str | None = None
+) -> np.ndarray:
+    # uninitialized, the fill writes every row once and in order; with a
+    # scratch directory the matrix lives in an unnamed file there, so the
+    # page cache spills it to disk instead of it failing with MemoryError
+    if scratch_dir is None:
+        return np.empty(shape, dtype=dtype)
+    with tempfile.TemporaryFile(dir=scratch_dir) as f:
+        # the mapping keeps its own handle, the file is gone once it is closed
+        return np.memmap(f, dtype=dtype, mode="w+", shape=shape)
+
+
+def shared_matrix(
+    shape: tuple[int, int], dtype: np.dtype, scratch_dir: str | None = None
+) -> np.memmap:
+    # allocate_matrix in a named file, so worker processes can map it with
+    # np.memmap(matrix.filename, ...) and write into it in place; the caller
+    # removes the file once they are done, the mapping outlives it
+    fd, path = tempfile.mkstemp(dir=scratch_dir or SHARED_DIR)
+    try:
+        mode = "w+"
+        if hasattr(os, "posix_fallocate"):
+            # reserved up front, a full tmpfs would otherwise kill the first
+            # process writing to a missing page with SIGBUS
+            size = math.prod(shape) * np.dtype(dtype).itemsize
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError as e:
+                raise MemoryError(
+                    f"No room for a shared {size / 1024**2:.0f} MiB matrix in "
+                    f"{os.path.dirname(path)}, use a scratch directory"
+                ) from e
+            mode = "r+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+    except BaseException:
+        os.unlink(path)
+        raise
+    finally:
+        os.close(fd)
+
+
+class TraceBlocks:
+    # read-only T[i, j] over a memory mapped traceback matrix for the walks
+    # from the last cell back to the first: rows are copied in blocks of
+    # about block_bytes and the few most recent ones are kept, so the disk is
+    # read in large sequential chunks instead of a page fault per visited cell
+    def __init__(
+        self,
+        T: np.ndarray,
+        block_bytes: int = TRACE_BLOCK_BYTES,
+        blocks: int = TRACE_BLOCKS,
+    ):
+        self.T = T
+        self.shape = T.shape
+        self.width = T.shape[1]
+        self.block_rows = max(1, block_bytes // max(self.width * T.itemsize, 1))
+        self.blocks = blocks
+        # every read starts on the page boundary at or before its first row,
+        # so a cached block is at most a page larger than its rows
+        self._flat = T.reshape(-1)
+        self._page_items = max(1, mmap.PAGESIZE // T.itemsize)
+        self._cache = OrderedDict()
+
+    def __getitem__(self, index: tuple[int, int]) -> int:
+        i, j = index
+        block, row = divmod(i, self.block_rows)
+        cached = self._cache.get(block)
+        if cached is None:
+            cached = self._load(block)
+        else:
+            self._cache.move_to_end(block)
+        items, lead = cached
+        return items[lead + row * self.width + j]
+
+    def cached_bytes(self) -> int:
+        return sum(items.nbytes for items, _ in self._cache.values())
+
+    def _load(self, block: int) -> tuple[np.ndarray, int]:
+        start = block * self.block_rows * self.width
+        end = min(start + self.block_rows * self.width, self._flat.size)
+        lead = start % self._page_items
+        cached = np.array(self._flat[start - lead : end]), lead
+        self._cache[block] = cached
+        if len(self._cache) > self.blocks:
+            self._cache.popitem(last=False)
+        return cached
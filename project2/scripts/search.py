@@ -0,0 +1,244 @@
+import argparse
+import heapq
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TextIO
+
+from .batch import batch_scores
+from .helpers import read_sequence
+from .scoring import PARAMETERS_DIR, ScoringScheme, default_scheme
+
+SEARCH_CHUNK = 256  # records scored together, also the unit sent to a worker
+SEARCH_INFLIGHT = 2  # chunks queued per worker before the reader waits
+
+# query and scheme of the pool, sent once per worker process
+_shared = {}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="alignment_plus search",
+        description="Score a query against every record of a FASTA database.",
+    )
+    parser.add_argument(
+        "--query",
+        type=str,
+        required=True,
+        help="Query sequence, it can be either path of the sequence itself (required)",
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        required=True,
+        help="FASTA database, records are streamed so its size is not limited by memory (required)",
+    )
+    parser.add_argument(
+        "--gap-model",
+        choices=["linear", "affine"],
+        default="linear",
+        help="Gap penalty model to use (default: linear)",
+    )
+    parser.add_argument(
+        "--parameters",
+        type=str,
+        default=PARAMETERS_DIR,
+        help="Directory with score_matrix.csv, gapopen and gapextend (default: parameters/ of the package)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of lowest cost hits printed at the end (default: 10)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["tsv", "jsonl"],
+        default="tsv",
+        help="Output format of the hits (default: tsv)",
+    )
+    parser.add_argument(
+        "--hits",
+        type=str,
+        help="Write every scored record to this file as soon as its chunk is done",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes scoring chunks of the database (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=SEARCH_CHUNK,
+        help=f"Records per chunk (default: {SEARCH_CHUNK})",
+    )
+    return parser.parse_args(argv)
+
+
+def iter_records(fasta_path: str) -> Iterator[tuple[str, str]]:
+    from Bio import SeqIO
+
+    for record in SeqIO.parse(fasta_path, "fasta"):
+        yield record.id, str(record.seq)
+
+
+def iter_chunks(records: Iterable, size: int) -> Iterator[list]:
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+def search(
+    query: str,
+    records: Iterable[tuple[str, str]],
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+    workers: int = 1,
+    chunk_size: int = SEARCH_CHUNK,
+    on_skip: Callable[[str, str], None] | None = None,
+) -> Iterator[tuple[str, int, int]]:
+    # (id, length, cost) of every record in database order, at most
+    # SEARCH_INFLIGHT chunks per worker are read ahead of the consumer;
+    # records that cannot be scored are left out and passed to on_skip
+    # with the reason instead of ending the search
+    scheme = scheme or default_scheme()
+    # a query outside the alphabet fails the search before any record is read
+    scheme.encode(query)
+    chunks = iter_chunks(records, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _skipped(_score_chunk(chunk, query, gap_model, scheme), on_skip)
+        return
+
+    with ProcessPoolExecutor(
+        workers, initializer=_attach, initargs=(query, gap_model, scheme)
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_shared_chunk, chunk))
+            # backpressure: wait for the oldest chunk before reading further
+            if len(pending) >= workers * SEARCH_INFLIGHT:
+                yield from _skipped(pending.popleft().result(), on_skip)
+        while pending:
+            yield from _skipped(pending.popleft().result(), on_skip)
+
+
+def top_hits(
+    hits: Iterable[tuple[str, int, int]], top: int
+) -> list[tuple[str, int, int]]:
+    # bounded max-heap on the cost, earlier records win ties
+    heap = []
+    for idx, (record_id, length, cost) in enumerate(hits):
+        item = (-cost, -idx, record_id, length)
+        if len(heap) < top:
+            heapq.heappush(heap, item)
+        elif heap and item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return [
+        (record_id, length, -neg_cost)
+        for neg_cost, _, record_id, length in sorted(heap, reverse=True)
+    ]
+
+
+def write_hit(
+    output: TextIO, record_id: str, length: int, cost: int, fmt: str = "tsv"
+) -> None:
+    if fmt == "jsonl":
+        output.write(json.dumps({"id": record_id, "length": length, "cost": cost}))
+        output.write("\n")
+    else:
+        output.write(f"{record_id}\t{length}\t{cost}\n")
+
+
+def _score_chunk(
+    chunk: list[tuple[str, str]],
+    query: str,
+    gap_model: str,
+    scheme: ScoringScheme,
+) -> tuple[list[tuple[str, int, int]], list[tuple[str, str]]]:
+    # the valid records of a chunk are scored in one batched DP sweep, the
+    # others come back as (id, reason) so one bad record keeps its chunk
+    valid, skipped = [], []
+    for record_id, seq in chunk:
+        try:
+            scheme.encode(seq)
+        except ValueError as e:
+            skipped.append((record_id, str(e)))
+        else:
+            valid.append((record_id, seq))
+    scores = batch_scores(query, [seq for _, seq in valid], gap_model, scheme)
+    hits = [
+        (record_id, len(seq), int(score))
+        for (record_id, seq), score in zip(valid, scores)
+    ]
+    return hits, skipped
+
+
+def _skipped(
+    result: tuple[list[tuple[str, int, int]], list[tuple[str, str]]],
+    on_skip: Callable[[str, str], None] | None,
+) -> list[tuple[str, int, int]]:
+    hits, skipped = result
+    if on_skip is not None:
+        for record_id, reason in skipped:
+            on_skip(record_id, reason)
+    return hits
+
+
+def _attach(query: str, gap_model: str, scheme: ScoringScheme) -> None:
+    _shared.update(query=query, gap_model=gap_model, scheme=scheme)
+
+
+def _score_shared_chunk(
+    chunk: list[tuple[str, str]],
+) -> tuple[list[tuple[str, int, int]], list[tuple[str, str]]]:
+    return _score_chunk(
+        chunk, _shared["query"], _shared["gap_model"], _shared["scheme"]
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    # only counted, the ids are reported as they come so memory stays constant
+    skipped = 0
+
+    def report(record_id: str, reason: str) -> None:
+        nonlocal skipped
+        skipped += 1
+        print(f"Warning: skipped record {record_id}: {reason}", file=sys.stderr)
+
+    try:
+        hits = search(
+            str(read_sequence(args.query)),
+            iter_records(args.db),
+            args.gap_model,
+            ScoringScheme.load(args.parameters),
+            args.workers,
+            args.chunk_size,
+            report,
+        )
+        with open(args.hits, "w") if args.hits else nullcontext() as hits_file:
+            if hits_file is not None:
+                hits = _tee_hits(hits, hits_file, args.format)
+            for hit in top_hits(hits, args.top):
+                write_hit(sys.stdout, *hit, args.format)
+    except Exception as e:
+        # an unreadable database or a query outside the alphabet
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if skipped:
+        print(f"Warning: {skipped} records skipped", file=sys.stderr)
+
+
+def _tee_hits(
+    hits: Iterable[tuple[str, int, int]], output: TextIO, fmt: str
+) -> Iterator[tuple[str, int, int]]:
+    # every hit is written as soon as its chunk is scored
+    for hit in hits:
+        write_hit(output, *hit, fmt)
+        yield hit
@@ -0,0 +1,263 @@
+import argparse
+import io
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from .cache import configure_cache
+from .engines import DEFAULT_ENGINE, ENGINE_NAMES, get_engine
+from .score import align_score, optimal_alignment
+from .scoring import PARAMETERS_DIR, ScoringScheme
+
+SERVE_INFLIGHT = 4  # requests queued per worker before the reader waits
+
+# defaults of the server and the schemes loaded so far, per process
+_shared = {"parameters": PARAMETERS_DIR, "engine": DEFAULT_ENGINE}
+_schemes = {}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="alignment_plus serve",
+        description="Answer JSONL alignment requests from a warm process, one "
+        'request per line, e.g. {"id": 1, "op": "score", "seq1": "acgt", '
+        '"seq2": "agt", "gap_model": "affine"}.',
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="Listen on this Unix socket instead of reading requests from stdin",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of warm processes answering requests, 1 answers them in the server itself (default: 1)",
+    )
+    parser.add_argument(
+        "--parameters",
+        type=str,
+        default=PARAMETERS_DIR,
+        help="Directory with score_matrix.csv, gapopen and gapextend used when a request names none (default: parameters/ of the package)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINE_NAMES,
+        default=DEFAULT_ENGINE,
+        help=f"Backend of the DP kernels used when a request names none (default: {DEFAULT_ENGINE})",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the on-disk alignment cache, shared by the workers (default: in-memory only)",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_client_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="alignment_plus client",
+        description="Send JSONL requests to a running `alignment_plus serve --socket`.",
+    )
+    parser.add_argument(
+        "--socket", type=str, required=True, help="Unix socket of the server"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="File of JSONL requests, the responses are printed in the same order (default: stdin)",
+    )
+    return parser.parse_args(argv)
+
+
+def load_scheme(parameters: str | Path) -> ScoringScheme:
+    # parsed once per directory and process, later requests reuse it; the
+    # path is resolved only the first time a spelling of it is seen
+    if parameters not in _schemes:
+        resolved = Path(parameters).resolve()
+        if resolved not in _schemes:
+            _schemes[resolved] = ScoringScheme.load(resolved)
+        _schemes[parameters] = _schemes[resolved]
+    return _schemes[parameters]
+
+
+def handle(request: dict) -> dict:
+    # ops: score (optionally banded or with max_cost), align (score and one
+    # optimal alignment) and ping; errors are returned, never raised
+    response = {"id": request["id"]} if "id" in request else {}
+    try:
+        op = request.get("op", "score")
+        if op == "ping":
+            response["ok"] = True
+            return response
+
+        seq1, seq2 = request["seq1"], request["seq2"]
+        gap_model = request.get("gap_model", "linear")
+        scheme = load_scheme(request.get("parameters", _shared["parameters"]))
+        engine = request.get("engine", _shared["engine"])
+        if op == "score":
+            score = align_score(
+                seq1,
+                seq2,
+                gap_model,
+                request.get("band"),
+                scheme,
+                engine,
+                request.get("max_cost"),
+            )
+            response["score"] = None if score is None else int(score)
+        elif op == "align":
+            score, alignment = optimal_alignment(seq1, seq2, gap_model, scheme, engine)
+            response["score"], response["alignment"] = score, list(alignment)
+        else:
+            raise ValueError(f"Unknown op: {op}")
+    except KeyError as e:
+        response["error"] = f"Missing field: {e.args[0]}"
+    except Exception as e:
+        response["error"] = str(e)
+    return response
+
+
+def handle_line(line: str) -> str:
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+    except ValueError as e:
+        return json.dumps({"error": f"Invalid request: {e}"})
+    return json.dumps(handle(request))
+
+
+def serve_stream(
+    lines: Iterable[str],
+    output: TextIO,
+    pool: Executor | None = None,
+    inflight: int = SERVE_INFLIGHT,
+) -> None:
+    # one response line per request line, in request order, flushed as soon
+    # as it is ready so interactive clients can wait for each answer
+    if pool is None:
+        for line in lines:
+            if line.strip():
+                output.write(handle_line(line) + "\n")
+                output.flush()
+        return
+
+    # the writer waits on the oldest request while the reader keeps the
+    # pool busy, the bounded queue stops the reader from running ahead
+    pending = queue.Queue(maxsize=inflight)
+    writer = threading.Thread(target=_write_responses, args=(pending, output))
+    writer.start()
+    try:
+        for line in lines:
+            if line.strip():
+                pending.put(pool.submit(handle_line, line))
+    finally:
+        pending.put(None)
+        writer.join()
+
+
+def _write_responses(pending: queue.Queue, output: TextIO) -> None:
+    while (future := pending.get()) is not None:
+        output.write(future.result() + "\n")
+        output.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        lines = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        output = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+        serve_stream(lines, output, self.server.pool, self.server.inflight)
+
+
+class AlignmentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # every connection is a JSONL stream, all of them share the warm pool
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: str,
+        pool: Executor | None = None,
+        inflight: int = SERVE_INFLIGHT,
+    ):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # left behind by a server that was killed
+        self.pool = pool
+        self.inflight = inflight
+        super().__init__(socket_path, _Handler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def request(socket_path: str, requests: Iterable[dict | str]) -> Iterator[dict]:
+    # responses in request order, requests are sent from a separate thread
+    # so neither side blocks on a full socket buffer
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sender = threading.Thread(target=_send_requests, args=(sock, requests))
+        sender.start()
+        with sock.makefile("r", encoding="utf-8") as responses:
+            for line in responses:
+                yield json.loads(line)
+        sender.join()
+
+
+def _send_requests(sock: socket.socket, requests: Iterable[dict | str]) -> None:
+    try:
+        for item in requests:
+            line = item if isinstance(item, str) else json.dumps(item)
+            if line.strip():
+                sock.sendall(line.rstrip("\n").encode() + b"\n")
+    finally:
+        sock.shutdown(socket.SHUT_WR)
+
+
+def _attach(parameters: str, engine: str, cache_dir: str | None) -> None:
+    # warm up a worker: imports, the default scheme and the engine kernels
+    _shared.update(parameters=parameters, engine=engine)
+    configure_cache(cache_dir)
+    get_engine(engine).score("acgt", "acgt", "linear", load_scheme(parameters))
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    _attach(args.parameters, args.engine, args.cache_dir)
+    pool = None
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(
+            args.workers,
+            initializer=_attach,
+            initargs=(args.parameters, args.engine, args.cache_dir),
+        )
+
+    inflight = args.workers * SERVE_INFLIGHT
+    # a terminated server still closes the pool and removes its socket
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with pool or nullcontext():
+        if args.socket is None:
+            return serve_stream(sys.stdin, sys.stdout, pool, inflight)
+        with AlignmentServer(args.socket, pool, inflight) as server:
+            print(f"Listening on {args.socket}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+def client_main(argv: list[str] | None = None) -> None:
+    args = parse_client_args(argv)
+    with open(args.input) if args.input else nullcontext(sys.stdin) as requests:
+        for response in request(args.socket, requests):
+            print(json.dumps(response), flush=True)
@@ -0,0 +1,348 @@
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .constants import (
+    TRACE_D_EXTEND,
+    TRACE_D_OPEN,
+    TRACE_DIAG,
+    TRACE_I_EXTEND,
+    TRACE_I_OPEN,
+    TRACE_LEFT,
+    TRACE_UP,
+)
+from .global_linear import fill_row_linear
+from .helpers import select_dtype, sentinel
+from .scoring import ScoringScheme, default_scheme
+from .scratch import allocate_matrix, shared_matrix
+
+# tiles are short and wide: every row of a tile costs a fixed ~50 us of
+# numpy calls, so narrower tiles spend more on overhead than on the cells
+WAVEFRONT_TILE_ROWS = 256
+WAVEFRONT_MIN_WIDTH = 2048
+# tile columns aimed for per worker, keeps the wavefront busy; tiles never
+# get narrower than WAVEFRONT_MIN_WIDTH, so below WAVEFRONT_TILES * threads
+# of those columns there are fewer tiles and the pool starts one worker per
+# tile column instead of threads
+WAVEFRONT_TILES = 2
+
+# sequences, profile and the matrices written in place, attached once per
+# worker
+_shared = {}
+
+
+def calc_cost_linear_tiled(
+    seq1: str,
+    seq2: str,
+    traceback: bool = False,
+    scheme: ScoringScheme | None = None,
+    scratch_dir: str | None = None,
+    threads: int | None = None,
+    tile: tuple[int, int] | None = None,
+) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
+    # same matrices as calc_cost_linear, filled tile by tile on a pool
+    names = ("C", "T") if traceback else ("C",)
+    _, matrices = wavefront(
+        seq1, seq2, "linear", scheme, threads, names, scratch_dir, tile
+    )
+    return matrices[0] if len(matrices) == 1 else matrices
+
+
+def calc_cost_affine_tiled(
+    seq1: str,
+    seq2: str,
+    traceback: bool = False,
+    scheme: ScoringScheme | None = None,
+    scratch_dir: str | None = None,
+    threads: int | None = None,
+    tile: tuple[int, int] | None = None,
+) -> tuple[np.ndarray, ...]:
+    # same matrices as calc_cost_affine, filled tile by tile on a pool
+    names = ("S", "D", "I", "T") if traceback else ("S", "D", "I")
+    _, matrices = wavefront(
+        seq1, seq2, "affine", scheme, threads, names, scratch_dir, tile
+    )
+    return matrices
+
+
+def wavefront(
+    seq1: str,
+    seq2: str,
+    gap_model: str = "linear",
+    scheme: ScoringScheme | None = None,
+    threads: int | None = None,
+    keep: tuple[str, ...] = (),
+    scratch_dir: str | None = None,
+    tile: tuple[int, int] | None = None,
+) -> tuple[int, tuple[np.ndarray, ...]]:
+    # the optimal cost and the matrices named in keep (C or S/D/I, and T for
+    # the traceback bits); the cells are split into tiles that only exchange
+    # their last row and column, a tile is filled as soon as the tiles above
+    # and left of it are, so the pool works along anti-diagonal wavefronts
+    if gap_model not in ("linear", "affine"):
+        raise ValueError(f"Unknown gap model: {gap_model}")
+    scheme = scheme or default_scheme()
+    seq1_codes, seq2_codes = scheme.encode(seq1), scheme.encode(seq2)
+    n, m = len(seq1_codes), len(seq2_codes)
+    dtype = select_dtype(n + 1, m + 1, scheme)
+    threads = threads or os.cpu_count() or 1
+    height, width = tile or (
+        WAVEFRONT_TILE_ROWS,
+        max(WAVEFRONT_MIN_WIDTH, math.ceil(m / (WAVEFRONT_TILES * threads))),
+    )
+    rows = [(i, min(i + height, n + 1)) for i in range(1, n + 1, height)]
+    cols = [(j, min(j + width, m + 1)) for j in range(1, m + 1, width)]
+    # an anti-diagonal holds at most one tile per row and column
+    workers = min(threads, len(rows), len(cols))
+
+    # the workers write their tiles straight into the kept matrices, mapped
+    # from shared files, only the borders travel back to the parent
+    allocate = shared_matrix if workers > 1 else allocate_matrix
+    matrices = {
+        name: allocate((n + 1, m + 1), np.uint8 if name == "T" else dtype, scratch_dir)
+        for name in keep
+    }
+    first_row, first_col = _borders(n, m, gap_model, scheme, dtype)
+    for name, matrix in matrices.items():
+        matrix[0] = first_row[name]
+        matrix[1:, 0] = first_col[name][1:]
+    if not rows or not cols:
+        # one of the sequences is empty, the alignment is a single border
+        border = first_row if not rows else first_col
+        return int(border[_TOP[gap_model][0]][-1]), tuple(matrices.values())
+
+    # the last row of every tile is the top of the tile below it, the last
+    # column the left of the tile to its right, both dropped once used
+    bottoms, rights = {}, {}
+
+    def inputs(bi: int, bj: int) -> tuple:
+        (i0, i1), (j0, j1) = rows[bi], cols[bj]
+        top = (
+            bottoms.pop((bi - 1, bj))
+            if bi
+            else tuple(first_row[name][j0 - 1 : j1] for name in _TOP[gap_model])
+        )
+        left = (
+            rights.pop((bi, bj - 1))
+            if bj
+            else tuple(first_col[name][i0:i1] for name in _LEFT[gap_model])
+        )
+        return bi, bj, i0, i1, j0, j1, top, left
+
+    def collect(result: tuple) -> None:
+        bi, bj, bottom, right = result
+        bottoms[bi, bj], rights[bi, bj] = bottom, right
+
+    if workers <= 1:
+        _attach(seq1_codes, seq2_codes, scheme, gap_model, dtype, matrices)
+        try:
+            for bi in range(len(rows)):
+                for bj in range(len(cols)):
+                    collect(_fill_tile(inputs(bi, bj)))
+        finally:
+            # the matrices belong to the caller now
+            _shared.clear()
+    else:
+        # the workers map the shared files, the matrices are not pickled
+        files = {name: matrix.filename for name, matrix in matrices.items()}
+        initargs = (seq1_codes, seq2_codes, scheme, gap_model, dtype, files)
+        try:
+            with ProcessPoolExecutor(
+                workers, initializer=_attach, initargs=initargs
+            ) as pool:
+                pending = {pool.submit(_fill_tile, inputs(0, 0))}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        bi, bj, *_ = result = future.result()
+                        collect(result)
+                        # a tile is ready once both of its neighbours are filled
+                        if bi + 1 < len(rows) and (
+                            bj == 0 or (bi + 1, bj - 1) in rights
+                        ):
+                            pending.add(pool.submit(_fill_tile, inputs(bi + 1, bj)))
+                        if bj + 1 < len(cols) and (
+                            bi == 0 or (bi - 1, bj + 1) in bottoms
+                        ):
+                            pending.add(pool.submit(_fill_tile, inputs(bi, bj + 1)))
+        finally:
+            # the mappings stay valid without their files
+            for matrix in matrices.values():
+                os.unlink(matrix.filename)
+
+    score = bottoms[len(rows) - 1, len(cols) - 1][0][-1]
+    return int(score), tuple(matrices.values())
+
+
+# boundary arrays passed between tiles, per gap model
+_TOP = {"linear": ("C",), "affine": ("S", "D")}
+_LEFT = {"linear": ("C",), "affine": ("S", "I")}
+
+
+def _borders(
+    n: int, m: int, gap_model: str, scheme: ScoringScheme, dtype: np.dtype
+) -> tuple[dict, dict]:
+    # row 0 and column 0 of every matrix, with the same values and traceback
+    # bits as calc_cost_linear / calc_cost_affine
+    gap_open, gap_extend = scheme.gap_open, scheme.gap_extend
+    if gap_model == "linear":
+        row = {"C": np.arange(m + 1, dtype=dtype) * gap_open}
+        col = {"C": np.arange(n + 1, dtype=dtype) * gap_open}
+        row["T"] = np.full(m + 1, TRACE_LEFT, dtype=np.uint8)
+        col["T"] = np.full(n + 1, TRACE_UP, dtype=np.uint8)
+        row["T"][0] = col["T"][0] = 0
+        return row, col
+
+    big = sentinel(dtype)
+    row = {name: np.full(m + 1, big, dtype=dtype) for name in "SDI"}
+    row["I"][1:] = gap_open + np.arange(1, m + 1, dtype=dtype) * gap_extend
+    row["S"][0], row["S"][1:] = 0, row["I"][1:]
+    row["T"] = np.zeros(m + 1, dtype=np.uint8)
+    row["T"][1:] = (
+        TRACE_LEFT
+        | (row["I"][1:] == row["S"][:-1] + gap_open + gap_extend) * TRACE_I_OPEN
+        | (row["I"][1:] == row["I"][:-1] + gap_extend) * TRACE_I_EXTEND
+    )
+
+    # the first column only deletes, D[0, 0] is the sentinel and S = D below
+    col = {name: np.full(n + 1, big, dtype=dtype) for name in "SDI"}
+    deletions, deletion, prev = [], big, 0
+    for _ in range(n):
+        deletion = prev = min(prev + gap_open + gap_extend, deletion + gap_extend)
+        deletions.append(deletion)
+    col["D"][1:] = col["S"][1:] = deletions
+    col["S"][0] = 0
+    col["T"] = np.zeros(n + 1, dtype=np.uint8)
+    col["T"][1:] = (
+        TRACE_UP
+        | (col["S"][1:] == col["I"][1:]) * TRACE_LEFT
+        | (col["D"][1:] == col["S"][:-1] + gap_open + gap_extend) * TRACE_D_OPEN
+        | (col["D"][1:] == col["D"][:-1] + gap_extend) * TRACE_D_EXTEND
+    )
+    return row, col
+
+
+def _attach(
+    seq1_codes: np.ndarray,
+    seq2_codes: np.ndarray,
+    scheme: ScoringScheme,
+    gap_model: str,
+    dtype: np.dtype,
+    matrices: dict[str, np.ndarray | str],
+) -> None:
+    _shared["seq1_codes"] = seq1_codes
+    _shared["profile"] = scheme.profile(seq2_codes, dtype)
+    _shared["gap_open"], _shared["gap_extend"] = scheme.gap_open, scheme.gap_extend
+    step = scheme.gap_open if gap_model == "linear" else scheme.gap_extend
+    _shared["steps"] = np.arange(len(seq2_codes) + 1, dtype=dtype) * step
+    _shared["gap_model"], _shared["dtype"] = gap_model, dtype
+    # kept matrices, mapped from their file in a worker process
+    shape = (len(seq1_codes) + 1, len(seq2_codes) + 1)
+    _shared["matrices"] = {
+        name: (
+            np.memmap(
+                matrix,
+                dtype=np.uint8 if name == "T" else dtype,
+                mode="r+",
+                shape=shape,
+            )
+            if isinstance(matrix, str)
+            else matrix
+        )
+        for name, matrix in matrices.items()
+    }
+
+
+def _fill_tile(task: tuple) -> tuple:
+    # rows i0..i1-1 and columns j0..j1-1, every array carries the column left
+    # of the tile (j0 - 1) at index 0 and the row above it at index 0
+    bi, bj, i0, i1, j0, j1, top, left = task
+    codes, profile, dtype = _shared["seq1_codes"], _shared["profile"], _shared["dtype"]
+    gap_open, gap_extend, matrices = (
+        _shared["gap_open"],
+        _shared["gap_extend"],
+        _shared["matrices"],
+    )
+    steps = _shared["steps"][: j1 - j0 + 1]
+    shape = (i1 - i0 + 1, j1 - j0 + 1)
+    # the trace bits of index 0 belong to the left tile and are dropped
+    T = np.empty(shape, dtype=np.uint8) if "T" in matrices else None
+
+    if _shared["gap_model"] == "linear":
+        C = np.empty(shape, dtype=dtype)
+        C[0], C[1:, 0] = top[0], left[0]
+        for r, i in enumerate(range(i0, i1), 1):
+            fill_row_linear(
+                C[r - 1],
+                C[r],
+                profile[codes[i - 1], j0 - 1 : j1 - 1],
+                steps,
+                gap_open,
+                None if T is None else T[r],
+            )
+        blocks = {"C": C}
+        bottom, right = (C[-1].copy(),), (C[1:, -1].copy(),)
+    else:
+        S, D, I = (np.empty(shape, dtype=dtype) for _ in range(3))
+        S[0], D[0], S[1:, 0], I[1:, 0] = top[0], top[1], left[0], left[1]
+        V = np.empty(shape[1], dtype=dtype)
+        for r, i in enumerate(range(i0, i1), 1):
+            _fill_segment_affine(
+                S[r - 1],
+                D[r - 1],
+                S[r],
+                D[r],
+                I[r],
+                V,
+                profile[codes[i - 1], j0 - 1 : j1 - 1],
+                steps,
+                gap_open,
+                gap_extend,
+                None if T is None else T[r],
+            )
+        blocks = {"S": S, "D": D, "I": I}
+        bottom = (S[-1].copy(), D[-1].copy())
+        right = (S[1:, -1].copy(), I[1:, -1].copy())
+
+    blocks["T"] = T
+    for name, matrix in matrices.items():
+        matrix[i0:i1, j0:j1] = blocks[name][1:, 1:]
+    return bi, bj, bottom, right
+
+
+def _fill_segment_affine(
+    prev_S: np.ndarray,
+    prev_D: np.ndarray,
+    S: np.ndarray,
+    D: np.ndarray,
+    I: np.ndarray,
+    V: np.ndarray,
+    match_costs: np.ndarray,
+    steps: np.ndarray,
+    gap_open: int,
+    gap_extend: int,
+    trace_row: np.ndarray | None = None,
+) -> None:
+    # fill_row_affine for a part of a row: S[0] and I[0] hold the cells left
+    # of it, an insertion either continues I[0] or opens after any S before
+    D[1:] = np.minimum(prev_S[1:] + gap_open + gap_extend, prev_D[1:] + gap_extend)
+    V[0] = S[0]
+    V[1:] = np.minimum(D[1:], prev_S[:-1] + match_costs)
+    I[1:] = np.minimum(
+        np.minimum.accumulate(V[:-1] - steps[:-1]) + gap_open + steps[1:],
+        I[0] + steps[1:],
+    )
+    S[1:] = np.minimum(V[1:], I[1:])
+
+    if trace_row is not None:
+        trace_row[1:] = (
+            (S[1:] == D[1:]) * TRACE_UP
+            | (S[1:] == I[1:]) * TRACE_LEFT
+            | (D[1:] == prev_S[1:] + gap_open + gap_extend) * TRACE_D_OPEN
+            | (D[1:] == prev_D[1:] + gap_extend) * TRACE_D_EXTEND
+            | (S[1:] == prev_S[:-1] + match_costs) * TRACE_DIAG
+            | (I[1:] == S[:-1] + gap_open + gap_extend) * TRACE_I_OPEN
+            | (I[1:] == I[:-1] + gap_extend) * TRACE_I_EXTEND
+        )
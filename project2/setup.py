@@ -12,4 +12,7 @@ setup(
     install_requires=[
         "numpy",
     ],
+    extras_require={
+        "jit": ["numba"],
+    },
 )
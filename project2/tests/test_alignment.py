@@ -0,0 +1,131 @@
+import gzip
+import io
+
+import pytest
+
+from ..scripts.alignment import (
+    Alignment,
+    encode_cigar,
+    output_format,
+    write_cigar,
+    write_fasta,
+)
+from ..scripts.global_affine import (
+    calc_cost_affine,
+    iter_alignments_affine,
+    iter_transcripts_affine,
+)
+from ..scripts.global_linear import (
+    calc_cost_linear,
+    iter_alignments_linear,
+    iter_transcripts_linear,
+)
+from ..scripts.helpers import save_result
+
+ALIGNMENTS = [
+    (("", ""), ""),
+    (("acgt", "acgt"), "4M"),
+    (("ac-gt", "acagt"), "2M1I2M"),
+    (("acggt", "ac--t"), "2M2D1M"),
+    (("--a-", "cg-t"), "2I1D1I"),
+    (("a" * 70 + "-", "c" * 71), "70M1I"),
+]
+
+
+@pytest.mark.parametrize("gapped,cigar", ALIGNMENTS)
+def test_from_gapped_round_trip(gapped, cigar):
+    alignment = Alignment.from_gapped(*gapped)
+    assert alignment.cigar == cigar
+    assert alignment.render() == gapped
+    assert tuple(alignment) == gapped
+    assert sum(length for length, _ in alignment.ops()) == len(gapped[0])
+
+
+def test_encode_cigar_skips_empty_operations():
+    assert encode_cigar(["M", "", "M", "I", "", "I", "D"]) == "2M2I1D"
+    assert encode_cigar([]) == ""
+
+
+def test_alignment_equality_and_offsets():
+    alignment = Alignment("xxacgt", "acgt", "4M", start1=2)
+    assert alignment.render() == ("acgt", "acgt")
+    assert alignment == Alignment("xxacgt", "acgt", "4M", start1=2)
+    assert alignment != Alignment("xxacgt", "acgt", "4M")
+    assert len({alignment, Alignment("xxacgt", "acgt", "4M", start1=2)}) == 1
+    assert repr(alignment) == "Alignment(cigar='4M', start1=2, start2=0)"
+
+
+@pytest.mark.parametrize(
+    "calc_cost,iter_alignments,iter_transcripts",
+    [
+        (calc_cost_linear, iter_alignments_linear, iter_transcripts_linear),
+        (calc_cost_affine, iter_alignments_affine, iter_transcripts_affine),
+    ],
+)
+@pytest.mark.parametrize(
+    "seq1,seq2",
+    [("", ""), ("", "acg"), ("tca", ""), ("aaaa", "aa"), ("acgtgtcaac", "acgtcgta")],
+)
+def test_transcripts_render_to_alignments(
+    calc_cost, iter_alignments, iter_transcripts, seq1, seq2
+):
+    T = calc_cost(seq1, seq2, traceback=True)[-1]
+    transcripts = list(iter_transcripts(T, seq1, seq2))
+    assert [t.render() for t in transcripts] == list(iter_alignments(T, seq1, seq2))
+    assert len(set(transcripts)) == len(transcripts)
+    assert list(iter_transcripts(T, seq1, seq2, limit=1)) == transcripts[:1]
+
+
+def test_write_fasta_matches_biopython():
+    SeqIO = pytest.importorskip("Bio.SeqIO")
+    from Bio.Seq import Seq
+    from Bio.SeqRecord import SeqRecord
+
+    gapped = [alignment for alignment, _ in ALIGNMENTS if alignment[0]]
+    expected = io.StringIO()
+    SeqIO.write(
+        (
+            SeqRecord(Seq(seq), id=f"alignment_{idx}_seq{n}", description=title)
+            for idx, pair in enumerate(gapped, 1)
+            for n, seq, title in zip(
+                (1, 2), pair, ("First sequence", "Second sequence")
+            )
+        ),
+        expected,
+        "fasta",
+    )
+    output = io.StringIO()
+    alignments = [Alignment.from_gapped(*pair) for pair in gapped]
+    assert write_fasta(output, alignments) == len(gapped)
+    assert output.getvalue() == expected.getvalue()
+
+
+def test_write_cigar():
+    output = io.StringIO()
+    alignments = [("ac-gt", "acagt"), Alignment("gacgt", "acgt", "4M", start1=1)]
+    assert write_cigar(output, iter(alignments)) == 2
+    assert output.getvalue() == "alignment_1\t0\t0\t2M1I2M\nalignment_2\t1\t0\t4M\n"
+
+
+@pytest.mark.parametrize(
+    "name,fmt",
+    [
+        ("out.fasta", "fasta"),
+        ("out.fa.gz", "fasta"),
+        ("out", "fasta"),
+        ("out.tsv", "cigar"),
+        ("out.CIGAR.gz", "cigar"),
+    ],
+)
+def test_save_result_formats(tmp_path, name, fmt):
+    path = tmp_path / "nested" / name
+    alignments = [Alignment.from_gapped("ac-gt", "acagt")]
+    assert output_format(str(path)) == fmt
+    assert save_result(iter(alignments), str(path)) == 1
+
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        content = f.read()
+    expected = io.StringIO()
+    (write_fasta if fmt == "fasta" else write_cigar)(expected, alignments)
+    assert content == expected.getvalue()
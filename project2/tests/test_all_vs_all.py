@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts import banded
+from ..scripts.all_vs_all import GAP_MODELS, all_vs_all, score_both
+from ..scripts.scoring import default_scheme
+from ..scripts.score import align_score
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "length1,length2", [(0, 0), (0, 7), (7, 0), (13, 21), (40, 25)]
+)
+def test_score_both(seed, length1, length2):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choices("acgt", k=length1))
+    seq2 = "".join(rng.choices("acgt", k=length2))
+    scheme = default_scheme()
+    assert score_both(scheme.encode(seq1), scheme.encode(seq2), scheme) == (
+        align_score(seq1, seq2, "linear"),
+        align_score(seq1, seq2, "affine"),
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_all_vs_all(workers):
+    rng = random.Random(workers)
+    sequences = ["".join(rng.choices("acgt", k=rng.randint(0, 30))) for _ in range(6)]
+    matrices = all_vs_all(sequences, workers)
+    for gap_model, matrix in matrices.items():
+        expected = np.array(
+            [
+                [align_score(seq1, seq2, gap_model) for seq2 in sequences]
+                for seq1 in sequences
+            ]
+        )
+        np.fill_diagonal(expected, 0)
+        assert np.array_equal(matrix, expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_all_vs_all_max_cost(workers):
+    rng = random.Random(workers)
+    related = "".join(rng.choices("acgt", k=40))
+    sequences = [related, related[:35] + "gg", related[3:]] + [
+        "".join(rng.choices("acgt", k=rng.randint(10, 40))) for _ in range(3)
+    ]
+    max_cost = 40
+    matrices = all_vs_all(sequences, workers, max_cost=max_cost)
+    for gap_model, matrix in matrices.items():
+        expected = all_vs_all(sequences, 1)[gap_model]
+        # pairs above the cutoff are missing, all others are exact
+        assert np.array_equal(np.isnan(matrix), expected > max_cost)
+        assert np.array_equal(matrix[~np.isnan(matrix)], expected[expected <= max_cost])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("max_cost", [None, 40])
+def test_all_vs_all_banded(monkeypatch, workers, max_cost):
+    # a narrow start makes the band double on the unrelated pairs
+    monkeypatch.setattr(banded, "BAND_START", 2)
+    rng = random.Random(workers)
+    related = "".join(rng.choices("acgt", k=60))
+    sequences = [related, related[:50] + "gg", related[7:], "", "acg"] + [
+        "".join(rng.choices("acgt", k=rng.randint(10, 60))) for _ in range(3)
+    ]
+    matrices = all_vs_all(sequences, workers, max_cost=max_cost, band="auto")
+    expected = all_vs_all(sequences, 1, max_cost=max_cost)
+    for gap_model in GAP_MODELS:
+        assert np.array_equal(matrices[gap_model], expected[gap_model], equal_nan=True)
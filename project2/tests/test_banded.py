@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from ..scripts import banded
+from ..scripts.banded import banded_score
+from ..scripts.score import align_score
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+@pytest.mark.parametrize("band_start", [1, 4, banded.BAND_START])
+@pytest.mark.parametrize("seed", range(5))
+def test_banded_auto_is_optimal(monkeypatch, gap_model, band_start, seed):
+    monkeypatch.setattr(banded, "BAND_START", band_start)
+    rng = random.Random(seed)
+    for _ in range(20):
+        seq1 = "".join(rng.choices("acgt", k=rng.randint(0, 50)))
+        seq2 = "".join(rng.choices("acgt", k=rng.randint(0, 50)))
+        assert banded_score(seq1, seq2, gap_model) == align_score(seq1, seq2, gap_model)
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+@pytest.mark.parametrize("width", [0, 1, 3, 100])
+def test_banded_fixed_width_is_upper_bound(gap_model, width):
+    rng = random.Random(width)
+    seq1 = "".join(rng.choices("acgt", k=60))
+    seq2 = "".join(rng.choices("acgt", k=45))
+    score = align_score(seq1, seq2, gap_model, band=width)
+    assert score >= align_score(seq1, seq2, gap_model)
+    if width >= 60:
+        assert score == align_score(seq1, seq2, gap_model)
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_banded_similar_sequences(gap_model):
+    rng = random.Random(0)
+    seq1 = "".join(rng.choices("acgt", k=2000))
+    seq2 = list(seq1)
+    for _ in range(20):
+        seq2[rng.randrange(len(seq2))] = rng.choice("acgt")
+    seq2 = "".join(seq2[:700] + seq2[705:])
+    assert align_score(seq1, seq2, gap_model, band="auto") == align_score(
+        seq1, seq2, gap_model
+    )
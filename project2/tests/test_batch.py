@@ -0,0 +1,76 @@
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ..scripts.batch import batch_scores, length_buckets
+from ..scripts.score import align_score
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+@pytest.mark.parametrize("batch_cells", [50, 1000, 2**20])
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_scores(gap_model, batch_cells, seed):
+    rng = random.Random(seed)
+    query = "".join(rng.choices("acgt", k=rng.randint(0, 40)))
+    targets = ["".join(rng.choices("acgt", k=rng.randint(0, 60))) for _ in range(50)]
+    expected = [align_score(query, target, gap_model) for target in targets]
+    assert (
+        batch_scores(query, targets, gap_model, batch_cells=batch_cells).tolist()
+        == expected
+    )
+
+
+@pytest.mark.parametrize("batch_cells", [10, 100, 10_000])
+def test_length_buckets(batch_cells):
+    rng = random.Random(0)
+    lengths = [rng.randint(0, 50) for _ in range(200)]
+    buckets = length_buckets(lengths, batch_cells)
+    assert sorted(idx for bucket in buckets for idx in bucket) == list(range(200))
+    for bucket in buckets:
+        longest = max(lengths[idx] for idx in bucket)
+        assert len(bucket) == 1 or len(bucket) * (longest + 1) <= batch_cells
+
+
+def test_batch_scores_empty():
+    assert batch_scores("acgt", []).shape == (0,)
+    assert np.array_equal(batch_scores("", ["", "ac"]), [0, 10])
+
+
+def _run_targets(tmp_path, *args):
+    targets = tmp_path / "targets.fasta"
+    targets.write_text(">near\nacgt\n>far\ntttttttttttt\n")
+    return subprocess.run(
+        [sys.executable, str(MAIN), "--seq1", "acgt", "--targets", str(targets), *args],
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_targets_max_cost(tmp_path):
+    near, far = (align_score("acgt", target) for target in ("acgt", "tttttttttttt"))
+    max_cost = (near + far) // 2
+    result = _run_targets(tmp_path, "--max-cost", str(max_cost))
+    assert result.returncode == 0
+    assert result.stdout == f"near\t{near}\nfar\t>{max_cost}\n"
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--band", "auto"],
+        ["--mode", "hirschberg"],
+        ["--output-path", "out.fasta"],
+        ["--scratch-dir", "scratch"],
+        ["--threads", "2"],
+    ],
+)
+def test_targets_reject_pairwise_options(tmp_path, args):
+    result = _run_targets(tmp_path, *args)
+    assert result.returncode == 2
+    assert f"{args[0]}" in result.stderr and "--targets" in result.stderr
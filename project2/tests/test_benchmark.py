@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ..scripts.benchmark import (
+    PATHS,
+    compare_results,
+    format_comparison,
+    format_report,
+    measure,
+    peak_rss,
+    run_benchmark,
+)
+from ..scripts.engines import get_engine
+
+
+def test_measure():
+    calls = []
+    stats = measure(
+        lambda: bytearray(1024**2), repeats=4, setup=lambda: calls.append(1)
+    )
+    # warm-up, timed runs and the traced run all get a fresh setup
+    assert len(calls) == 6
+    assert len(stats["times"]) == 4
+    assert stats["min"] <= stats["p50"] <= stats["p90"] <= stats["max"]
+    assert stats["peak_bytes"] >= 1024**2
+    assert stats["peak_rss_bytes"] is None or stats["peak_rss_bytes"] >= 1024**2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_peak_rss_per_case():
+    allocated = 128 * 1024**2
+    large = peak_rss(lambda: np.ones(allocated // 8))
+    # a later small case does not report the peak of the large one
+    small = peak_rss(lambda: None)
+    assert large - small >= allocated // 2
+    assert small < large
+
+
+def test_run_benchmark():
+    results = run_benchmark(get_engine("numpy"), lengths=[20], repeats=2, seed=3)
+    # the results are the JSON baseline of later runs
+    results = json.loads(json.dumps(results))
+    assert results["metadata"]["engine"] == "numpy"
+    assert {case["path"] for case in results["results"]} == set(PATHS)
+    assert len({case["name"] for case in results["results"]}) == len(results["results"])
+    for case in results["results"]:
+        assert case["p50"] > 0
+        assert ("gcups" in case) == (case["unit"] == "cells")
+        assert case["peak_rss_bytes"] is None or case["peak_rss_bytes"] > 0
+    assert "| fill/linear/20 |" in format_report(results)
+
+
+@pytest.mark.parametrize(
+    "before,after,regression", [(1.0, 1.05, False), (1.0, 1.2, True), (1.0, 0.5, False)]
+)
+def test_compare_results(before, after, regression):
+    baseline = {"results": [{"name": "score/linear/100", "p50": before}]}
+    current = {
+        "results": [
+            {"name": "score/linear/100", "p50": after},
+            {"name": "score/linear/200", "p50": after},
+        ]
+    }
+    comparison = compare_results(current, baseline, threshold=0.1)
+    # cases missing from the baseline are not compared
+    assert [row["name"] for row in comparison] == ["score/linear/100"]
+    assert comparison[0]["regression"] == regression
+    assert ("REGRESSION" in format_comparison(comparison)) == regression
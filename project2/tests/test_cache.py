@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from ..scripts import cache
+from ..scripts.cache import AlignmentCache, cache_key, cached, result_size
+
+
+def test_cache_key():
+    key = cache_key("score", "acgt", "agt", "linear")
+    assert key == cache_key("score", "acgt", "agt", "linear")
+    assert key != cache_key("score", "acgt", "agt", "affine")
+    assert key != cache_key("score", "agt", "acgt", "linear")
+    assert key != cache_key("score", "acg", "tagt", "linear")
+    assert key != cache_key("pairwise_linear", "acgt", "agt", "linear")
+
+
+def test_memory_lru():
+    store = AlignmentCache(max_entries=2)
+    store.put("a", 1)
+    store.put("b", 2)
+    assert store.get("a") == 1
+    store.put("c", 3)
+    # b was the least recently used
+    assert store.get("b") is None
+    assert store.get("a") == 1 and store.get("c") == 3
+    assert store.stats() == {
+        "hits": 3,
+        "disk_hits": 0,
+        "misses": 1,
+        "entries": 2,
+        "bytes": 2 * sys.getsizeof(1),
+    }
+
+
+def test_memory_budget(tmp_path):
+    matrix = np.zeros((100, 100), dtype=np.int64)
+    store = AlignmentCache(
+        cache_dir=str(tmp_path), memory_budget=2 * result_size((matrix, ["a-", "ac"]))
+    )
+    for key in "abc":
+        store.put(key, (matrix.copy(), ["a-", "ac"]))
+    # a third matrix does not fit, the least recently used one is dropped
+    assert list(store.memory) == ["b", "c"]
+    assert store.memory_bytes <= store.memory_budget
+    # results over the whole budget are only kept on disk
+    store.put("big", np.zeros((300, 300)))
+    assert "big" not in store.memory and list(store.memory) == ["b", "c"]
+    assert store.get("big").shape == (300, 300)
+    assert store.get("a")[0].shape == (100, 100) and store.disk_hits == 2
+    store.close()
+
+
+def test_result_size():
+    matrix = np.zeros((10, 10), dtype=np.int64)
+    assert result_size(matrix) >= matrix.nbytes
+    assert result_size(matrix[1:]) >= matrix[1:].nbytes
+    assert result_size((matrix, matrix)) > 2 * matrix.nbytes
+
+
+def test_disk_hits_touch_in_batches(tmp_path):
+    store = AlignmentCache(max_entries=1, cache_dir=str(tmp_path))
+    store.put_many([("a", 1), ("b", 2)])
+    store.db.execute("UPDATE results SET accessed = 0")
+    store.db.commit()
+    assert store.get("a") == 1
+    # the hit is not written before the next batch, flush or close
+    assert not store.db.in_transaction and list(store.touched) == ["a"]
+    store.close()
+
+    store = AlignmentCache(cache_dir=str(tmp_path))
+    (after,) = store.db.execute(
+        "SELECT accessed FROM results WHERE key = 'a'"
+    ).fetchone()
+    assert after > 0
+    store.close()
+
+
+def test_disk_store(tmp_path):
+    store = AlignmentCache(cache_dir=str(tmp_path))
+    store.put("pair", (22, ("acgt-", "a-gtc")))
+    store.close()
+
+    store = AlignmentCache(cache_dir=str(tmp_path))
+    assert store.get("pair") == (22, ("acgt-", "a-gtc"))
+    assert store.get("pair") == (22, ("acgt-", "a-gtc"))
+    assert (store.disk_hits, store.hits, store.misses) == (1, 1, 0)
+    store.close()
+
+
+def test_disk_eviction(tmp_path):
+    store = AlignmentCache(max_entries=1, cache_dir=str(tmp_path), disk_budget=2000)
+    for i in range(10):
+        store.put(str(i), "x" * 500)
+    (total,) = store.db.execute("SELECT SUM(size) FROM results").fetchone()
+    assert total <= 2000
+    # the oldest results are evicted first
+    assert store.get("0") is None
+    assert store.get("9") == "x" * 500
+    store.close()
+
+
+def test_cached(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE", AlignmentCache())
+    calls = []
+
+    @cached("test")
+    def score(seq1, seq2, gap_model="linear"):
+        calls.append((seq1, seq2, gap_model))
+        return len(seq1) + len(seq2)
+
+    assert score("acgt", "agt") == 7
+    assert score("acgt", "agt", "linear") == 7
+    assert score("acgt", "agt", gap_model="affine") == 7
+    assert calls == [("acgt", "agt", "linear"), ("acgt", "agt", "affine")]
+    assert cache.CACHE.stats()["hits"] == 1
+
+
+def test_disk_store_threads(tmp_path):
+    store = AlignmentCache(max_entries=4, cache_dir=str(tmp_path))
+
+    def work(thread):
+        for i in range(50):
+            store.put(f"{thread}:{i}", i)
+            assert store.get(f"{thread}:{i // 2}") == i // 2
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(work, range(4)))
+    assert store.get("3:49") == 49
+    store.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_opens_own_connection(tmp_path, monkeypatch):
+    store = AlignmentCache(cache_dir=str(tmp_path))
+    monkeypatch.setattr(cache, "CACHE", store)
+    store.put("parent", 1)
+    context = multiprocessing.get_context("fork")
+    with context.Pool(1) as pool:
+        # the child reads and writes through a connection of its own
+        assert pool.apply(_child_put, ("child", 2)) == 1
+    assert store.get("child") == 2 and store.get("parent") == 1
+    store.close()
+
+
+def _child_put(key, value):
+    cache.CACHE.put(key, value)
+    cache.CACHE.memory.clear()
+    return cache.CACHE.get("parent")
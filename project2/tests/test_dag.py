@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts.dag import AlignmentDAG
+from ..scripts.global_affine import (
+    calc_cost_affine,
+    count_alignments_affine,
+    iter_transcripts_affine,
+    traceback_dag_affine,
+)
+from ..scripts.global_linear import (
+    calc_cost_linear,
+    count_alignments_linear,
+    iter_transcripts_linear,
+    traceback_dag_linear,
+)
+from ..scripts.helpers import save_result
+
+MODELS = [
+    (
+        calc_cost_linear,
+        iter_transcripts_linear,
+        traceback_dag_linear,
+        count_alignments_linear,
+    ),
+    (
+        calc_cost_affine,
+        iter_transcripts_affine,
+        traceback_dag_affine,
+        count_alignments_affine,
+    ),
+]
+PAIRS = [
+    ("", ""),
+    ("", "acg"),
+    ("tca", ""),
+    ("aaaa", "aa"),
+    ("acgtgtcaac", "acgtcgta"),
+    ("acacacac", "cacacaca"),
+]
+
+
+@pytest.mark.parametrize("calc_cost,iter_transcripts,traceback_dag,count", MODELS)
+@pytest.mark.parametrize("seq1,seq2", PAIRS)
+def test_dag_matches_traceback(
+    calc_cost, iter_transcripts, traceback_dag, count, seq1, seq2
+):
+    T = calc_cost(seq1, seq2, traceback=True)[-1]
+    dag = traceback_dag(T, seq1, seq2)
+    expected = list(iter_transcripts(T, seq1, seq2))
+    assert list(dag) == expected
+    assert list(dag.transcripts(limit=2)) == expected[:2]
+    assert dag.count() == count(T) == len(expected)
+    assert [dag.alignment(k) for k in range(len(expected))] == expected
+    with pytest.raises(IndexError):
+        dag.alignment(len(expected))
+
+
+@pytest.mark.parametrize("calc_cost,iter_transcripts,traceback_dag,count", MODELS)
+def test_dag_grows_with_branch_points(
+    calc_cost, iter_transcripts, traceback_dag, count
+):
+    rng = random.Random(7)
+    seq1, seq2 = ("".join(rng.choices("ac", k=300)) for _ in range(2))
+    T = calc_cost(seq1, seq2, traceback=True)[-1]
+    dag = traceback_dag(T, seq1, seq2)
+    assert dag.count() == count(T) > 10**6
+    # every reachable cell lies on at most a single edge
+    assert len(dag.ops) <= 3 * T.size
+    assert dag.alignment(dag.count() - 1).render()[0].replace("-", "") == seq1
+
+
+@pytest.mark.parametrize("calc_cost,iter_transcripts,traceback_dag,count", MODELS)
+@pytest.mark.parametrize("seq1,seq2", PAIRS)
+def test_dag_save_load(
+    tmp_path, calc_cost, iter_transcripts, traceback_dag, count, seq1, seq2
+):
+    T = calc_cost(seq1, seq2, traceback=True)[-1]
+    dag = traceback_dag(T, seq1, seq2)
+    path = tmp_path / "out" / "alignments.dag"
+    assert save_result(dag, str(path)) == dag.count()
+
+    loaded = AlignmentDAG.load(str(path))
+    assert (loaded.seq1, loaded.seq2) == (seq1, seq2)
+    for name in ("nodes", "edge_index", "targets", "ops_index", "ops"):
+        assert np.array_equal(getattr(loaded, name), getattr(dag, name))
+    assert list(loaded) == list(dag)
+
+
+def test_save_result_dag_needs_traceback(tmp_path):
+    with pytest.raises(ValueError):
+        save_result([("ac", "ac")], str(tmp_path / "alignments.dag"))
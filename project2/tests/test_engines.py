@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts.all_vs_all import all_vs_all
+from ..scripts.cache import CACHE
+from ..scripts.engines import DEFAULT_ENGINE, ENGINE_NAMES, get_engine
+from ..scripts.scoring import ScoringScheme
+
+
+@pytest.mark.parametrize("engine", ENGINE_NAMES)
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "length1,length2", [(0, 0), (0, 7), (7, 0), (13, 21), (40, 25)]
+)
+def test_engine_matches_numpy(engine, gap_model, seed, length1, length2):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choices("acgt", k=length1))
+    seq2 = "".join(rng.choices("acgt", k=length2))
+    expected = get_engine(DEFAULT_ENGINE).cost(seq1, seq2, gap_model, traceback=True)
+    costs = get_engine(engine).cost(seq1, seq2, gap_model, traceback=True)
+    assert len(costs) == len(expected)
+    for matrix, expected_matrix in zip(costs, expected):
+        assert np.array_equal(matrix, expected_matrix)
+    assert get_engine(engine).score(seq1, seq2, gap_model) == expected[0][-1, -1]
+
+
+@pytest.mark.parametrize("engine", ENGINE_NAMES)
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_engine_asymmetric_scheme(engine, gap_model):
+    # the score-only kernels may swap the sequences, so the matrix is transposed
+    scheme = ScoringScheme("ARN", [[0, 1, 9], [5, 0, 2], [1, 7, 0]], 4, 2)
+    rng = random.Random(0)
+    for _ in range(20):
+        seq1 = "".join(rng.choices("ARN", k=rng.randint(0, 15)))
+        seq2 = "".join(rng.choices("ARN", k=rng.randint(0, 15)))
+        expected = get_engine(DEFAULT_ENGINE).score(seq1, seq2, gap_model, scheme)
+        assert get_engine(engine).score(seq1, seq2, gap_model, scheme) == expected
+
+
+@pytest.mark.parametrize("engine", ENGINE_NAMES)
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_engine_max_cost(engine, gap_model):
+    # negative substitution costs make the lower bound of the early exit weaker
+    scheme = ScoringScheme("ACGT", np.full((4, 4), 2) - 4 * np.eye(4), 3, 1)
+    rng = random.Random(2)
+    for _ in range(50):
+        seq1 = "".join(rng.choices("ACGT", k=rng.randint(0, 25)))
+        seq2 = "".join(rng.choices("ACGT", k=rng.randint(0, 25)))
+        score = get_engine(DEFAULT_ENGINE).score(seq1, seq2, gap_model, scheme)
+        for max_cost in (score - 5, score - 1, score, score + 5):
+            expected = score if score <= max_cost else None
+            got = get_engine(engine).score(seq1, seq2, gap_model, scheme, max_cost)
+            assert got == expected
+
+
+@pytest.mark.parametrize("engine", ENGINE_NAMES)
+def test_all_vs_all_engine(engine):
+    rng = random.Random(1)
+    sequences = ["".join(rng.choices("acgt", k=rng.randint(0, 30))) for _ in range(5)]
+    expected = all_vs_all(sequences, 1)
+    # the cached pairs would otherwise never reach the engine
+    CACHE.clear()
+    matrices = all_vs_all(sequences, 1, engine=engine)
+    for gap_model in expected:
+        assert np.array_equal(matrices[gap_model], expected[gap_model])
+
+
+def test_get_engine_unknown():
+    with pytest.raises(ValueError):
+        get_engine("cuda")
+    with pytest.raises(ValueError):
+        get_engine(DEFAULT_ENGINE).score("acgt", "acgt", "convex")
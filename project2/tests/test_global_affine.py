@@ -1,6 +1,16 @@
+import random
+
+import numpy as np
 import pytest
 
-from ..scripts.global_affine import pairwise_alignment_affine
+from ..scripts.global_affine import (
+    calc_cost_affine,
+    calc_cost_affine_reference,
+    count_alignments_affine,
+    iter_alignments_affine,
+    pairwise_alignment_affine,
+    sample_alignment_affine,
+)
 
 
 @pytest.mark.parametrize(
@@ -42,3 +52,43 @@ def test_pairwise_alignment_linear(seq1, seq2, expected_score, expected_alignmen
         assert alignment in expected_alignments
         expected_alignments.remove(alignment)
     assert not expected_alignments
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "length1,length2", [(0, 0), (0, 7), (7, 0), (13, 21), (40, 25)]
+)
+def test_calc_cost_affine_matches_reference(seed, length1, length2):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("acgtACGT") for _ in range(length1))
+    seq2 = "".join(rng.choice("acgtACGT") for _ in range(length2))
+    for matrix, expected in zip(
+        calc_cost_affine(seq1, seq2), calc_cost_affine_reference(seq1, seq2)
+    ):
+        np.testing.assert_array_equal(matrix, expected)
+
+
+def test_iter_alignments_affine_is_lazy_and_iterative():
+    rng = random.Random(0)
+    seq1 = "".join(rng.choice("acgt") for _ in range(1500))
+    seq2 = "".join(rng.choice("acgt") for _ in range(1400))
+    *_, T = calc_cost_affine(seq1, seq2, traceback=True)
+
+    alignments = list(iter_alignments_affine(T, seq1, seq2, limit=1))
+    assert len(alignments) == 1
+    align1, align2 = alignments[0]
+    assert align1.replace("-", "") == seq1
+    assert align2.replace("-", "") == seq2
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_count_and_sample_alignments_affine(seed):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("ac") for _ in range(rng.randint(0, 12)))
+    seq2 = "".join(rng.choice("ac") for _ in range(rng.randint(0, 12)))
+    *_, T = calc_cost_affine(seq1, seq2, traceback=True)
+    alignments = pairwise_alignment_affine(seq1, seq2)[1]
+
+    assert count_alignments_affine(T) == len(alignments)
+    for _ in range(10):
+        assert sample_alignment_affine(T, seq1, seq2, rng=rng) in alignments
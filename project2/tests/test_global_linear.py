@@ -1,6 +1,17 @@
+import math
+import random
+
+import numpy as np
 import pytest
 
-from ..scripts.global_linear import pairwise_alignment_linear
+from ..scripts.global_linear import (
+    calc_cost_linear,
+    calc_cost_linear_reference,
+    count_alignments_linear,
+    iter_alignments_linear,
+    pairwise_alignment_linear,
+    sample_alignment_linear,
+)
 
 
 @pytest.mark.parametrize(
@@ -42,3 +53,49 @@ def test_pairwise_alignment_linear(seq1, seq2, expected_score, expected_alignmen
         assert alignment in expected_alignments
         expected_alignments.remove(alignment)
     assert not expected_alignments
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "length1,length2", [(0, 0), (0, 7), (7, 0), (13, 21), (40, 25)]
+)
+def test_calc_cost_linear_matches_reference(seed, length1, length2):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("acgtACGT") for _ in range(length1))
+    seq2 = "".join(rng.choice("acgtACGT") for _ in range(length2))
+    np.testing.assert_array_equal(
+        calc_cost_linear(seq1, seq2), calc_cost_linear_reference(seq1, seq2)
+    )
+
+
+def test_iter_alignments_linear_is_lazy_and_iterative():
+    rng = random.Random(0)
+    seq1 = "".join(rng.choice("acgt") for _ in range(1500))
+    seq2 = "".join(rng.choice("acgt") for _ in range(1400))
+    _, T = calc_cost_linear(seq1, seq2, traceback=True)
+
+    alignments = list(iter_alignments_linear(T, seq1, seq2, limit=1))
+    assert len(alignments) == 1
+    align1, align2 = alignments[0]
+    assert align1.replace("-", "") == seq1
+    assert align2.replace("-", "") == seq2
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_count_and_sample_alignments_linear(seed):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("ac") for _ in range(rng.randint(0, 12)))
+    seq2 = "".join(rng.choice("ac") for _ in range(rng.randint(0, 12)))
+    _, T = calc_cost_linear(seq1, seq2, traceback=True)
+    alignments = pairwise_alignment_linear(seq1, seq2)[1]
+
+    assert count_alignments_linear(T) == len(alignments)
+    for _ in range(10):
+        assert sample_alignment_linear(T, seq1, seq2, rng=rng) in alignments
+
+
+def test_count_alignments_linear_without_enumeration():
+    # any 30 of the 60 characters can be deleted, C(60, 30) alignments
+    seq1, seq2 = "a" * 60, "a" * 30
+    _, T = calc_cost_linear(seq1, seq2, traceback=True)
+    assert count_alignments_linear(T) == math.comb(60, 30)
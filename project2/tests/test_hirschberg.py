@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from ..scripts.helpers import score_alignment
+from ..scripts.hirschberg import hirschberg_affine, hirschberg_linear
+from ..scripts.score import align_score
+
+
+@pytest.mark.parametrize(
+    "hirschberg,gap_model",
+    [(hirschberg_linear, "linear"), (hirschberg_affine, "affine")],
+)
+@pytest.mark.parametrize("seed", range(20))
+def test_hirschberg_is_optimal(hirschberg, gap_model, seed):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("acgt") for _ in range(rng.randint(0, 40)))
+    seq2 = "".join(rng.choice("acgt") for _ in range(rng.randint(0, 40)))
+    align1, align2 = hirschberg(seq1, seq2)
+
+    assert len(align1) == len(align2)
+    assert align1.replace("-", "") == seq1
+    assert align2.replace("-", "") == seq2
+    assert score_alignment(align1, align2, gap_model) == align_score(
+        seq1, seq2, gap_model
+    )
+
+
+@pytest.mark.parametrize(
+    "seq1,seq2,expected",
+    [
+        (
+            "aataat",
+            "aagg",
+            {("aataat", "aagg--"), ("aataat", "aa--gg"), ("aataat", "a--agg")},
+        ),
+        ("tccagaga", "tcgat", {("tccagaga", "tc---gat")}),
+    ],
+)
+def test_hirschberg_affine_examples(seq1, seq2, expected):
+    assert hirschberg_affine(seq1, seq2) in expected
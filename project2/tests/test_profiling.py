@@ -0,0 +1,47 @@
+import json
+
+from ..scripts.global_linear import calc_cost_linear, iter_alignments_linear
+from ..scripts.profiling import PROFILER, Profiler, configure_profiler
+
+
+def test_profiler_disabled():
+    profiler = Profiler()
+    items = [1, 2, 3]
+    with profiler.phase("fill"):
+        profiler.count("cells", 10)
+    # nothing is recorded and iterables are passed through untouched
+    assert profiler.counted("alignments", items) is items
+    assert profiler.report() == {"total_seconds": 0, "phases": {}, "counters": {}}
+
+
+def test_profiler_phases_and_counters(tmp_path):
+    profiler = Profiler(enabled=True, cprofile_phase="fill")
+    for _ in range(2):
+        with profiler.phase("fill"):
+            calc_cost_linear("acgtgtcaacgt", "acgtcgtagcta")
+        profiler.count("cells", 144)
+    with profiler.phase("write"):
+        assert list(profiler.counted("alignments", "ab")) == ["a", "b"]
+
+    report = profiler.report()
+    assert list(report["phases"]) == ["fill", "write"]
+    assert report["counters"] == {"cells": 288, "alignments": 2}
+    assert abs(sum(p["fraction"] for p in report["phases"].values()) - 1) < 1e-9
+    # only the requested phase is run under cProfile
+    assert profiler.stats is not None
+
+    path = tmp_path / "profile.json"
+    profiler.dump(str(path))
+    assert json.loads(path.read_text())["counters"]["cells"] == 288
+
+
+def test_traceback_nodes_counted():
+    configure_profiler(enabled=True)
+    try:
+        _, T = calc_cost_linear("aataat", "aagg", traceback=True)
+        alignments = list(iter_alignments_linear(T, "aataat", "aagg"))
+        nodes = PROFILER.report()["counters"]["traceback_nodes"]
+        # every alignment visits at least one node per column
+        assert nodes >= sum(len(align1) for align1, _ in alignments)
+    finally:
+        configure_profiler(enabled=False)
@@ -0,0 +1,66 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts.global_affine import calc_cost_affine
+from ..scripts.global_linear import calc_cost_linear
+from ..scripts.helpers import estimate_memory, select_dtype
+from ..scripts.score import align_score
+
+
+@pytest.mark.parametrize(
+    "seq1,seq2,gap_model,expected_score",
+    [
+        ("acgtgtcaacgt", "acgtcgtagcta", "linear", 22),
+        ("aataat", "aagg", "linear", 14),
+        ("tccagaga", "tcgat", "linear", 20),
+        ("acgtgtcaacgt", "acgtcgtagcta", "affine", 24),
+        ("aataat", "aagg", "affine", 22),
+        ("tccagaga", "tcgat", "affine", 29),
+    ],
+)
+def test_align_score(seq1, seq2, gap_model, expected_score):
+    assert align_score(seq1, seq2, gap_model) == expected_score
+    assert align_score(seq2, seq1, gap_model) == expected_score
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "length1,length2", [(0, 0), (0, 7), (7, 0), (13, 21), (40, 25)]
+)
+def test_align_score_matches_full_matrix(seed, length1, length2):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("acgt") for _ in range(length1))
+    seq2 = "".join(rng.choice("acgt") for _ in range(length2))
+    assert align_score(seq1, seq2, "linear") == calc_cost_linear(seq1, seq2)[-1, -1]
+    assert align_score(seq1, seq2, "affine") == calc_cost_affine(seq1, seq2)[0][-1, -1]
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_align_score_max_cost(seed, gap_model):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choice("acgt") for _ in range(rng.randint(0, 40)))
+    seq2 = seq1[: rng.randint(0, len(seq1))] + "".join(
+        rng.choice("acgt") for _ in range(rng.randint(0, 10))
+    )
+    score = align_score(seq1, seq2, gap_model)
+    # the early exit must never drop a pair within the cutoff
+    for max_cost in range(max(score - 15, 0), score + 15):
+        expected = score if score <= max_cost else None
+        assert align_score(seq1, seq2, gap_model, max_cost=max_cost) == expected
+        assert align_score(seq1, seq2, gap_model, "auto", max_cost=max_cost) == expected
+
+
+def test_align_score_unknown_gap_model():
+    with pytest.raises(ValueError):
+        align_score("acgt", "acgt", "convex")
+
+
+def test_select_dtype_and_memory_estimate():
+    assert select_dtype(100, 100) == np.int16
+    assert select_dtype(100_000, 100_000) == np.int32
+    # int16 costs plus the traceback byte, three matrices for affine
+    assert estimate_memory(99, 99, "linear") == 100 * 100 * 3
+    assert estimate_memory(99, 99, "affine") == 100 * 100 * 7
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from ..scripts.global_affine import calc_cost_affine
+from ..scripts.global_linear import calc_cost_linear
+from ..scripts.hirschberg import hirschberg_affine, hirschberg_linear
+from ..scripts.helpers import score_alignment
+from ..scripts.score import align_score
+from ..scripts.scoring import ScoringScheme, default_scheme
+
+
+def test_default_scheme():
+    scheme = default_scheme()
+    assert scheme.alphabet == "ACGT"
+    assert (scheme.gap_open, scheme.gap_extend) == (5, 5)
+    assert scheme.encode("acgTA").tolist() == [0, 1, 2, 3, 0]
+    assert scheme.encode("acgt").dtype == np.uint8
+    with pytest.raises(ValueError, match="N"):
+        scheme.encode("acgN")
+
+
+def test_load_labelled_matrix(tmp_path):
+    # protein style matrix with row labels
+    (tmp_path / "score_matrix.csv").write_text(
+        " , A, R, N\nA, 0, 3, 2\nR, 3, 0, 1\nN, 2, 1, 0\n"
+    )
+    (tmp_path / "gapopen").write_text("4\n")
+    (tmp_path / "gapextend").write_text("1\n")
+    scheme = ScoringScheme.load(tmp_path)
+    assert scheme.alphabet == "ARN"
+    assert scheme.matrix.tolist() == [[0, 3, 2], [3, 0, 1], [2, 1, 0]]
+    assert align_score("ARN", "ANN", "linear", scheme=scheme) == 1
+    assert align_score("ARN", "AN", "affine", scheme=scheme) == 5
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_schemes_side_by_side(gap_model):
+    # IUPAC N matches everything for free, next to the default DNA scheme
+    matrix = np.full((5, 5), 5)
+    np.fill_diagonal(matrix, 0)
+    matrix[4, :] = matrix[:, 4] = 0
+    iupac = ScoringScheme("ACGTN", matrix, 3, 1)
+
+    seq1, seq2 = "acgtnnacgt", "aggtcaacct"
+    for scheme in (default_scheme(), iupac):
+        if "N" not in scheme.alphabet:
+            seq1 = seq1.replace("n", "a")
+        score = align_score(seq1, seq2, gap_model, scheme=scheme)
+        if gap_model == "linear":
+            costs = calc_cost_linear(seq1, seq2, scheme=scheme)
+            alignment = hirschberg_linear(seq1, seq2, scheme)
+        else:
+            costs = calc_cost_affine(seq1, seq2, scheme=scheme)[0]
+            alignment = hirschberg_affine(seq1, seq2, scheme)
+        assert score == costs[-1, -1]
+        assert score == score_alignment(*alignment, gap_model, scheme)
+        assert score == align_score(seq1, seq2, gap_model, band="auto", scheme=scheme)
+    assert align_score("acgtnnacgt", seq2, gap_model, scheme=iupac) < align_score(
+        "acgtaaacgt", seq2, gap_model
+    )
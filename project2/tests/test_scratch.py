@@ -0,0 +1,108 @@
+import mmap
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts.engines import get_engine
+from ..scripts.global_affine import (
+    calc_cost_affine,
+    iter_alignments_affine,
+    path_counts_affine,
+    sample_alignment_affine,
+)
+from ..scripts.global_linear import (
+    calc_cost_linear,
+    iter_alignments_linear,
+    path_counts_linear,
+    sample_alignment_linear,
+)
+from ..scripts.scratch import TraceBlocks, allocate_matrix
+
+
+@pytest.mark.parametrize("calc_cost", [calc_cost_linear, calc_cost_affine])
+@pytest.mark.parametrize(
+    "seq1,seq2",
+    [("", ""), ("", "acg"), ("tca", ""), ("acgtgtcaacgt", "acgtcgtagcta")],
+)
+def test_scratch_matrices_match_memory(tmp_path, calc_cost, seq1, seq2):
+    expected = calc_cost(seq1, seq2, traceback=True)
+    matrices = calc_cost(seq1, seq2, traceback=True, scratch_dir=str(tmp_path))
+    for matrix, expected_matrix in zip(matrices, expected):
+        assert isinstance(matrix, np.memmap)
+        assert np.array_equal(matrix, expected_matrix)
+    # the backing files have no name, nothing is left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "calc_cost,iter_alignments,path_counts,sample_alignment",
+    [
+        (
+            calc_cost_linear,
+            iter_alignments_linear,
+            path_counts_linear,
+            sample_alignment_linear,
+        ),
+        (
+            calc_cost_affine,
+            iter_alignments_affine,
+            path_counts_affine,
+            sample_alignment_affine,
+        ),
+    ],
+)
+@pytest.mark.parametrize("seed", range(3))
+def test_trace_blocks_walks(
+    tmp_path, calc_cost, iter_alignments, path_counts, sample_alignment, seed
+):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choices("acgt", k=rng.randint(20, 60)))
+    seq2 = "".join(rng.choices("acgt", k=rng.randint(20, 60)))
+    *_, T = calc_cost(seq1, seq2, traceback=True, scratch_dir=str(tmp_path))
+    # tiny blocks, so the walks cross many of them and evict some
+    blocks = TraceBlocks(T, block_bytes=1, blocks=2)
+    expected = list(iter_alignments(T, seq1, seq2, limit=200))
+    assert list(iter_alignments(blocks, seq1, seq2, limit=200)) == expected
+
+    counts = path_counts(np.array(T))
+    for sample_seed in range(5):
+        assert sample_alignment(
+            blocks, seq1, seq2, counts, random.Random(sample_seed)
+        ) == sample_alignment(T, seq1, seq2, counts, random.Random(sample_seed))
+
+
+@pytest.mark.parametrize("width", [300, 4097, 50_001])
+def test_trace_blocks_bounded(tmp_path, width):
+    # odd widths never line rows up with pages, the blocks stay block_bytes
+    # large and only their reads are moved back to a page boundary
+    block_bytes, rows = 64 * 1024, 40
+    T = allocate_matrix((rows, width), np.uint8, str(tmp_path))
+    T[:] = np.arange(rows * width, dtype=np.uint64).reshape(rows, width) % 251
+    blocks = TraceBlocks(T, block_bytes=block_bytes, blocks=2)
+    for i in range(rows - 1, -1, -1):
+        for j in (width - 1, width // 2, 0):
+            assert blocks[i, j] == T[i, j]
+        assert blocks.cached_bytes() <= 2 * max(block_bytes, width) + 2 * mmap.PAGESIZE
+    # the reads start on page boundaries
+    for block, (_, lead) in blocks._cache.items():
+        assert (block * blocks.block_rows * width - lead) % mmap.PAGESIZE == 0
+
+
+def test_allocate_matrix(tmp_path):
+    assert not isinstance(allocate_matrix((3, 4), np.int16), np.memmap)
+    matrix = allocate_matrix((3, 4), np.int16, str(tmp_path))
+    assert isinstance(matrix, np.memmap)
+    assert matrix.shape == (3, 4) and matrix.dtype == np.int16
+
+
+@pytest.mark.parametrize("engine", ["reference", "numpy"])
+def test_engine_scratch_dir(tmp_path, engine):
+    if engine == "numpy":
+        C, T = get_engine(engine).cost(
+            "acgt", "agt", traceback=True, scratch_dir=tmp_path
+        )
+        assert isinstance(T, np.memmap)
+    else:
+        with pytest.raises(ValueError):
+            get_engine(engine).cost("acgt", "agt", traceback=True, scratch_dir=tmp_path)
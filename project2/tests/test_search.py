@@ -0,0 +1,85 @@
+import json
+import random
+
+import pytest
+
+from ..scripts.score import align_score
+from ..scripts.search import iter_records, main, search, top_hits
+
+
+def write_db(path, records):
+    path.write_text("".join(f">{record_id}\n{seq}\n" for record_id, seq in records))
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+@pytest.mark.parametrize("workers,chunk_size", [(1, 1), (1, 7), (2, 5)])
+def test_search(gap_model, workers, chunk_size):
+    rng = random.Random(chunk_size)
+    query = "".join(rng.choices("acgt", k=25))
+    records = [
+        (f"r{idx}", "".join(rng.choices("acgt", k=rng.randint(0, 40))))
+        for idx in range(30)
+    ]
+    hits = list(
+        search(query, iter(records), gap_model, workers=workers, chunk_size=chunk_size)
+    )
+    assert hits == [
+        (record_id, len(seq), align_score(query, seq, gap_model))
+        for record_id, seq in records
+    ]
+
+
+def test_top_hits():
+    hits = [("a", 1, 30), ("b", 1, 10), ("c", 1, 20), ("d", 1, 10), ("e", 1, 5)]
+    assert top_hits(iter(hits), 3) == [("e", 1, 5), ("b", 1, 10), ("d", 1, 10)]
+    assert top_hits(iter(hits), 0) == []
+    assert len(top_hits(iter(hits), 10)) == 5
+
+
+def test_main(tmp_path, capsys):
+    db, hits = tmp_path / "db.fasta", tmp_path / "hits.tsv"
+    write_db(db, [("far", "ttttttttt"), ("same", "acgtacgt"), ("near", "acgtacg")])
+    assert list(iter_records(str(db)))[1] == ("same", "acgtacgt")
+
+    main(["--query", "acgtacgt", "--db", str(db), "--top", "2", "--hits", str(hits)])
+    assert capsys.readouterr().out == "same\t8\t0\nnear\t7\t5\n"
+    assert hits.read_text().splitlines() == ["far\t9\t29", "same\t8\t0", "near\t7\t5"]
+
+    main(["--query", "acgtacgt", "--db", str(db), "--top", "1", "--format", "jsonl"])
+    assert json.loads(capsys.readouterr().out) == {"id": "same", "length": 8, "cost": 0}
+
+
+@pytest.mark.parametrize("workers,chunk_size", [(1, 2), (2, 2)])
+def test_search_skips_invalid_records(workers, chunk_size):
+    records = [("a", "acgt"), ("n", "acnt"), ("b", "agt"), ("x", "xyz"), ("c", "")]
+    skipped = []
+    hits = search(
+        "acgt",
+        iter(records),
+        workers=workers,
+        chunk_size=chunk_size,
+        on_skip=lambda record_id, reason: skipped.append((record_id, reason)),
+    )
+    assert [hit[0] for hit in hits] == ["a", "b", "c"]
+    assert [record_id for record_id, _ in skipped] == ["n", "x"]
+    assert "N" in skipped[0][1].upper() and "xyz" in skipped[1][1]
+
+
+def test_main_reports_invalid_input(tmp_path, capsys):
+    db = tmp_path / "db.fasta"
+    write_db(db, [("bad", "acgnnt"), ("same", "acgtacgt")])
+    main(["--query", "acgtacgt", "--db", str(db), "--top", "2"])
+    captured = capsys.readouterr()
+    assert captured.out == "same\t8\t0\n"
+    assert "skipped record bad" in captured.err and "1 records skipped" in captured.err
+
+    # a query outside the alphabet and a missing database end the search
+    missing = str(tmp_path / "missing.fasta")
+    for args in (
+        ["--query", "acgxacgt", "--db", str(db)],
+        ["--query", "acgt", "--db", missing],
+    ):
+        with pytest.raises(SystemExit) as exit_info:
+            main(args)
+        assert exit_info.value.code == 1
+        assert capsys.readouterr().err.startswith("Error: ")
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import pytest
+
+from ..scripts.score import align_score
+from ..scripts.server import AlignmentServer, handle, request, serve_stream
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+REQUESTS = [
+    {"id": 1, "seq1": "acgtgtcaacgt", "seq2": "acgtcgtagcta"},
+    {"id": 2, "op": "score", "seq1": "aataat", "seq2": "aagg", "gap_model": "affine"},
+    {"id": 3, "op": "align", "seq1": "aataat", "seq2": "aagg"},
+    {"id": 4, "seq1": "tccagaga", "seq2": "tcgat", "max_cost": 10},
+    {"id": 5, "op": "ping"},
+]
+RESPONSES = [
+    {"id": 1, "score": 22},
+    {"id": 2, "score": 22},
+    {"id": 3, "score": 14, "alignment": ["aataat", "aa-gg-"]},
+    {"id": 4, "score": None},
+    {"id": 5, "ok": True},
+]
+
+
+@pytest.mark.parametrize("request_,expected", list(zip(REQUESTS, RESPONSES)))
+def test_handle(request_, expected):
+    assert handle(request_) == expected
+
+
+@pytest.mark.parametrize(
+    "request_,error",
+    [
+        ({"id": 1, "seq1": "acgt"}, "Missing field: seq2"),
+        ({"op": "sort", "seq1": "acgt", "seq2": "acgt"}, "Unknown op: sort"),
+        ({"seq1": "acgt", "seq2": "acgt", "gap_model": "convex"}, "Unknown gap"),
+    ],
+)
+def test_handle_errors(request_, error):
+    response = handle(request_)
+    assert response["error"].startswith(error)
+    assert response.get("id") == request_.get("id")
+
+
+@pytest.mark.parametrize("workers", [0, 3])
+def test_serve_stream(workers):
+    lines = [json.dumps(item) + "\n" for item in REQUESTS] + ["\n", "[1, 2]\n"]
+    output = io.StringIO()
+    with ThreadPoolExecutor(workers) if workers else nullcontext() as pool:
+        serve_stream(lines, output, pool, inflight=2)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    # blank lines are skipped, every other line gets a response in order
+    assert responses[:-1] == RESPONSES
+    assert responses[-1]["error"].startswith("Invalid request")
+
+
+def test_socket_round_trip(tmp_path):
+    socket_path = str(tmp_path / "alignment.sock")
+    with AlignmentServer(socket_path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            many = [
+                {"id": idx, "seq1": "acgt" * (idx % 7), "seq2": "agt" * (idx % 5)}
+                for idx in range(500)
+            ]
+            responses = list(request(socket_path, REQUESTS + many))
+        finally:
+            server.shutdown()
+            thread.join()
+    assert responses[: len(REQUESTS)] == RESPONSES
+    assert [response["score"] for response in responses[len(REQUESTS) :]] == [
+        align_score(item["seq1"], item["seq2"]) for item in many
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_socket_with_cache_dir(tmp_path, workers):
+    # the connection of the disk cache is opened by the main thread, used by
+    # the handler threads and reopened by every forked worker
+    socket_path = str(tmp_path / "alignment.sock")
+    server = subprocess.Popen(
+        [sys.executable, str(MAIN), "serve", "--socket", socket_path]
+        + ["--cache-dir", str(tmp_path / "cache"), "--workers", str(workers)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        # the server reports once it is listening
+        assert server.stderr.readline().startswith("Listening on")
+        for _ in range(2):
+            # the second pass is answered from the cache
+            with ThreadPoolExecutor(4) as clients:
+                results = list(
+                    clients.map(
+                        lambda _: list(request(socket_path, REQUESTS)), range(4)
+                    )
+                )
+            assert results == [RESPONSES] * 4
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,70 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ..scripts.helpers import format_matrix
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+# modules that take longer to import than a small alignment takes to run
+HEAVY_MODULES = ("pandas", "Bio", "numba", "matplotlib")
+STARTUP_RUNS = 3
+STARTUP_BUDGET = 3.0  # times the startup of a bare `import numpy`
+
+
+def _wall_time(args: list[str]) -> float:
+    # fastest of a few runs, so a busy machine does not fail the budget
+    times = []
+    for _ in range(STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["--seq1", "acgt", "--seq2", "agt"],
+        ["--seq1", "acgt", "--seq2", "agt", "--gap-model", "affine", "--score-only"],
+    ],
+)
+def test_small_runs_skip_heavy_imports(args):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MAIN), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imported = {
+        line.split("|")[-1].strip().split(".")[0]
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    assert not imported & set(HEAVY_MODULES)
+
+
+def test_startup_budget():
+    baseline = _wall_time(["-c", "import numpy"])
+    elapsed = _wall_time([str(MAIN), "--seq1", "acgt", "--seq2", "agt"])
+    assert elapsed < STARTUP_BUDGET * baseline
+
+
+@pytest.mark.parametrize(
+    "matrix,labels",
+    [
+        ([[0, 5, 2, 5], [5, 0, 5, 2], [2, 5, 0, 5], [5, 2, 5, 0]], "ACGT"),
+        ([[0, -5, 12], [5, 0, -100], [1, 2, 3]], "ARN"),
+        ([[7]], "X"),
+        (np.arange(100).reshape(10, 10) * 23 - 1000, "ARNDCQEGHI"),
+    ],
+)
+def test_format_matrix_matches_pandas(matrix, labels):
+    matrix = np.array(matrix)
+    expected = pd.DataFrame(matrix, index=list(labels), columns=list(labels))
+    assert format_matrix(matrix, labels) == str(expected)
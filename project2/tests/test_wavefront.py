@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from ..scripts.global_affine import calc_cost_affine
+from ..scripts.global_linear import calc_cost_linear
+from ..scripts.scoring import ScoringScheme
+from ..scripts.wavefront import (
+    calc_cost_affine_tiled,
+    calc_cost_linear_tiled,
+    wavefront,
+)
+
+SCHEMES = [
+    None,
+    # negative costs and a free gap opening
+    ScoringScheme("ACGT", np.full((4, 4), 2) - 4 * np.eye(4), 3, 1),
+    ScoringScheme(
+        "ACGT", [[0, 1, 9, 3], [5, 0, 2, 2], [1, 7, 0, 4], [2, 2, 2, 0]], 0, 2
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "tiled,serial",
+    [
+        (calc_cost_linear_tiled, calc_cost_linear),
+        (calc_cost_affine_tiled, calc_cost_affine),
+    ],
+)
+@pytest.mark.parametrize("scheme", SCHEMES)
+@pytest.mark.parametrize("seed", range(10))
+def test_tiled_matches_serial(tiled, serial, scheme, seed):
+    rng = random.Random(seed)
+    seq1 = "".join(rng.choices("acgt", k=rng.randint(0, 30)))
+    seq2 = "".join(rng.choices("acgt", k=rng.randint(0, 30)))
+    tile = (rng.randint(1, 7), rng.randint(1, 7))
+    expected = serial(seq1, seq2, traceback=True, scheme=scheme)
+    matrices = tiled(seq1, seq2, traceback=True, scheme=scheme, threads=1, tile=tile)
+    assert len(matrices) == len(expected)
+    for matrix, expected_matrix in zip(matrices, expected):
+        assert matrix.dtype == expected_matrix.dtype
+        assert np.array_equal(matrix, expected_matrix)
+
+
+@pytest.mark.parametrize("gap_model", ["linear", "affine"])
+def test_wavefront_pool(tmp_path, gap_model):
+    rng = random.Random(3)
+    seq1 = "".join(rng.choices("acgt", k=90))
+    seq2 = "".join(rng.choices("acgt", k=70))
+    serial = calc_cost_linear if gap_model == "linear" else calc_cost_affine
+    *costs, T = serial(seq1, seq2, traceback=True)
+    # the tiles are spread over the pool, in any order along the wavefront
+    score, (tiled_T,) = wavefront(
+        seq1, seq2, gap_model, threads=3, keep=("T",), scratch_dir=tmp_path, tile=(8, 9)
+    )
+    assert score == costs[0][-1, -1]
+    assert isinstance(tiled_T, np.memmap)
+    assert np.array_equal(tiled_T, T)
+    assert wavefront(seq1, seq2, gap_model, threads=3, tile=(16, 5))[0] == score
+    # the workers wrote into the mapped files, which are gone once filled
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "tiled,serial",
+    [
+        (calc_cost_linear_tiled, calc_cost_linear),
+        (calc_cost_affine_tiled, calc_cost_affine),
+    ],
+)
+def test_wavefront_pool_shared_matrices(tiled, serial):
+    rng = random.Random(5)
+    seq1 = "".join(rng.choices("acgt", k=60))
+    seq2 = "".join(rng.choices("acgt", k=75))
+    expected = serial(seq1, seq2, traceback=True)
+    matrices = tiled(seq1, seq2, traceback=True, threads=4, tile=(7, 6))
+    for matrix, expected_matrix in zip(matrices, expected):
+        assert matrix.dtype == expected_matrix.dtype
+        assert np.array_equal(matrix, expected_matrix)
+
+
+def test_wavefront_unknown_gap_model():
+    with pytest.raises(ValueError):
+        wavefront("acgt", "acgt", "convex")